@@ -0,0 +1,394 @@
+import functools
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from logging_setup import get_logger
+from similarity import normalize_rows, top_k
+
+logger = get_logger(__name__)
+
+INDEX_KINDS = ("exact", "hnsw", "ivf")
+
+
+def _synchronized(method):
+    """
+    Run `method` under the index's own lock. Store searches read a snapshot
+    without the store lock, but hnswlib graphs and IVF lists are updated in
+    place, so index reads and writes still take turns here (briefly).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class VectorIndex:
+    """
+    Approximate nearest-neighbor index over L2-normalized vectors.
+
+    Vectors are labelled with the store's stable tool ids, so deletes and
+    swaps in the embeddings matrix never invalidate the index. Scores are
+    inner products, i.e. cosine similarities for normalized input.
+    """
+
+    kind: str = ""
+
+    def __init__(self):
+        # Re-entrant: build() resets and adds, and an IVF add removes replaced ids
+        self._lock = threading.RLock()
+
+    @_synchronized
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        """Replace the index contents with `vectors` labelled by `ids`"""
+        self.reset()
+        self.add(ids, vectors)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def remove(self, ids: List[int]):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the approximate top-k, best first"""
+        raise NotImplementedError
+
+    def save(self, path: Path):
+        raise NotImplementedError
+
+    def load(self, path: Path) -> bool:
+        """Load a saved index; returns False if nothing usable was found"""
+        raise NotImplementedError
+
+    def ids(self) -> np.ndarray:
+        """Labels of the vectors currently in the index, in no particular order"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class HNSWIndex(VectorIndex):
+    """Hierarchical navigable small world graph backed by hnswlib"""
+
+    kind = "hnsw"
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("The 'hnsw' index requires hnswlib (pip install hnswlib)") from e
+        super().__init__()
+        self._hnswlib = hnswlib
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self._ids = set()
+        # Labels marked deleted that the graph may still hold under that label
+        self._deleted = set()
+
+    def _ensure_capacity(self, dim: int, extra: int):
+        if self._index is None:
+            self._index = self._hnswlib.Index(space="ip", dim=dim)
+            self._index.init_index(
+                max_elements=max(1024, extra),
+                ef_construction=self.ef_construction,
+                M=self.m,
+                allow_replace_deleted=True,
+            )
+            self._index.set_ef(self.ef_search)
+            return
+        needed = self._index.get_current_count() + extra
+        capacity = self._index.get_max_elements()
+        if needed > capacity:
+            self._index.resize_index(max(needed, capacity * 2))
+
+    @_synchronized
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        if len(ids) == 0:
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # The last vector given for an id wins, as in the store
+        latest = {tool_id: i for i, tool_id in enumerate(ids.tolist())}
+        if len(latest) < len(ids):
+            positions = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+            ids, vectors = ids[positions], vectors[positions]
+        self._ensure_capacity(vectors.shape[1], len(ids))
+        # A label the graph already holds is updated in place. Letting hnswlib put it in
+        # another deleted slot would leave the old element under the same label
+        known = np.zeros(len(ids), dtype=bool)
+        for i, tool_id in enumerate(ids.tolist()):
+            if tool_id in self._ids:
+                known[i] = True
+            elif tool_id in self._deleted:
+                try:
+                    # hnswlib only updates live elements in place
+                    self._index.unmark_deleted(tool_id)
+                    known[i] = True
+                except RuntimeError:
+                    # Its slot was already reused by another label
+                    pass
+        if known.any():
+            self._index.add_items(vectors[known], ids[known], replace_deleted=False)
+        if not known.all():
+            self._index.add_items(vectors[~known], ids[~known], replace_deleted=True)
+        self._ids.update(ids.tolist())
+        self._deleted.difference_update(ids.tolist())
+
+    @_synchronized
+    def remove(self, ids: List[int]):
+        for tool_id in ids:
+            if tool_id in self._ids:
+                self._index.mark_deleted(tool_id)
+                self._ids.discard(tool_id)
+                self._deleted.add(tool_id)
+
+    @_synchronized
+    def reset(self):
+        self._index = None
+        self._ids = set()
+        self._deleted = set()
+
+    @_synchronized
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self._ids))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self._index.set_ef(max(self.ef_search, k))
+        labels, distances = self._index.knn_query(query.reshape(1, -1), k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    @_synchronized
+    def save(self, path: Path):
+        if self._index is None:
+            return
+        self._index.save_index(str(path))
+        # hnswlib needs the dimension before it can load a graph, and does not track live labels
+        with open(self._sidecar_path(path), "wb") as f:
+            np.savez(f, dim=self._index.dim, ids=np.fromiter(self._ids, dtype=np.int64))
+
+    @_synchronized
+    def load(self, path: Path) -> bool:
+        sidecar_path = self._sidecar_path(path)
+        if not path.exists() or not sidecar_path.exists():
+            return False
+        with np.load(sidecar_path) as sidecar:
+            dim, ids = int(sidecar["dim"]), sidecar["ids"]
+        self._index = self._hnswlib.Index(space="ip", dim=dim)
+        self._index.load_index(str(path), allow_replace_deleted=True)
+        self._index.set_ef(self.ef_search)
+        self._ids = set(ids.tolist())
+        self._deleted = set(self._index.get_ids_list()) - self._ids
+        return True
+
+    @staticmethod
+    def _sidecar_path(path: Path) -> Path:
+        return path.with_name(path.name + ".ids.npz")
+
+    @_synchronized
+    def ids(self) -> np.ndarray:
+        return np.fromiter(self._ids, dtype=np.int64, count=len(self._ids))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted file index: vectors are bucketed by their nearest k-means centroid
+    and a query only scores the `nprobe` closest buckets.
+
+    Until `train_size` vectors have been added there are too few to train the
+    centroids on, so the index holds a flat list and searches it exactly.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist: int = 256, nprobe: int = 16, train_size: Optional[int] = None, iterations: int = 10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 39
+        self.iterations = iterations
+        super().__init__()
+        self.reset()
+
+    @_synchronized
+    def reset(self):
+        self.centroids: Optional[np.ndarray] = None
+        self._list_ids: List[np.ndarray] = []
+        self._list_vectors: List[np.ndarray] = []
+        self._where: Dict[int, int] = {}
+        self._flat_ids = np.empty(0, dtype=np.int64)
+        self._flat_vectors: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @_synchronized
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        if len(ids) == 0:
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Re-adding an id replaces its vector
+        if self.trained:
+            self.remove([tool_id for tool_id in ids.tolist() if tool_id in self._where])
+        elif len(self._flat_ids):
+            self.remove(ids[np.isin(ids, self._flat_ids)].tolist())
+
+        if not self.trained:
+            self._flat_ids = np.concatenate([self._flat_ids, ids])
+            self._flat_vectors = vectors if self._flat_vectors is None else np.vstack([self._flat_vectors, vectors])
+            if len(self._flat_ids) >= self.train_size:
+                self._train()
+            return
+
+        assignments = self._assign(vectors)
+        for list_no in np.unique(assignments):
+            mask = assignments == list_no
+            self._list_ids[list_no] = np.concatenate([self._list_ids[list_no], ids[mask]])
+            self._list_vectors[list_no] = np.vstack([self._list_vectors[list_no], vectors[mask]])
+        self._where.update(zip(ids.tolist(), assignments.tolist()))
+
+    @_synchronized
+    def remove(self, ids: List[int]):
+        if not ids:
+            return
+        if not self.trained:
+            keep = ~np.isin(self._flat_ids, ids)
+            self._flat_ids = self._flat_ids[keep]
+            if self._flat_vectors is not None:
+                self._flat_vectors = self._flat_vectors[keep]
+            return
+
+        by_list: Dict[int, List[int]] = {}
+        for tool_id in ids:
+            list_no = self._where.pop(tool_id, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(tool_id)
+        for list_no, list_ids in by_list.items():
+            keep = ~np.isin(self._list_ids[list_no], list_ids)
+            self._list_ids[list_no] = self._list_ids[list_no][keep]
+            self._list_vectors[list_no] = self._list_vectors[list_no][keep]
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train(self):
+        """Spherical k-means on (a sample of) the flat vectors, then bucket everything"""
+        vectors, ids = self._flat_vectors, self._flat_ids
+        rng = np.random.default_rng(0)
+        nlist = min(self.nlist, len(vectors))
+        sample = vectors
+        if len(vectors) > nlist * 256:
+            sample = vectors[rng.choice(len(vectors), nlist * 256, replace=False)]
+
+        self.centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignments = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty buckets with random points
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            self.centroids = normalize_rows(sums)
+
+        assignments = self._assign(vectors)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        self._list_ids = [ids[order[bounds[i]:bounds[i + 1]]] for i in range(nlist)]
+        self._list_vectors = [vectors[order[bounds[i]:bounds[i + 1]]] for i in range(nlist)]
+        self._where = dict(zip(ids.tolist(), assignments.tolist()))
+        self._flat_ids = np.empty(0, dtype=np.int64)
+        self._flat_vectors = None
+        logger.info(f"Trained IVF index with {nlist} lists over {len(ids)} vectors")
+
+    @_synchronized
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.trained:
+            if not len(self._flat_ids):
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            scores = self._flat_vectors @ query
+            top = top_k(scores, k)
+            return self._flat_ids[top], scores[top]
+
+        probes = top_k(self.centroids @ query, self.nprobe)
+        candidate_ids = np.concatenate([self._list_ids[p] for p in probes])
+        if not len(candidate_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.vstack([self._list_vectors[p] for p in probes]) @ query
+        top = top_k(scores, k)
+        return candidate_ids[top], scores[top]
+
+    @_synchronized
+    def save(self, path: Path):
+        with open(path, "wb") as f:
+            if not self.trained:
+                np.savez(f, flat_ids=self._flat_ids, flat_vectors=self._flat_vectors
+                         if self._flat_vectors is not None else np.empty((0, 0), dtype=np.float32))
+                return
+            sizes = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+            np.savez(
+                f,
+                centroids=self.centroids,
+                sizes=sizes,
+                ids=np.concatenate(self._list_ids),
+                vectors=np.vstack(self._list_vectors),
+            )
+
+    @_synchronized
+    def load(self, path: Path) -> bool:
+        if not path.exists():
+            return False
+        self.reset()
+        with np.load(path) as data:
+            if "centroids" not in data:
+                self._flat_ids = data["flat_ids"]
+                self._flat_vectors = data["flat_vectors"] if len(self._flat_ids) else None
+                return True
+            self.centroids = data["centroids"]
+            bounds = np.concatenate([[0], np.cumsum(data["sizes"])])
+            ids, vectors = data["ids"], data["vectors"]
+        self._list_ids = [ids[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+        self._list_vectors = [vectors[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+        self._where = {
+            int(tool_id): list_no
+            for list_no, list_ids in enumerate(self._list_ids)
+            for tool_id in list_ids
+        }
+        return True
+
+    @_synchronized
+    def ids(self) -> np.ndarray:
+        return np.concatenate([self._flat_ids, np.fromiter(self._where, dtype=np.int64, count=len(self._where))])
+
+    def __len__(self) -> int:
+        return len(self._flat_ids) + len(self._where)
+
+
+def create_index(kind: str) -> Optional[VectorIndex]:
+    """Return a new index for `kind`, or None for exact (brute-force) search"""
+    if kind == "exact":
+        return None
+    if kind == "hnsw":
+        return HNSWIndex()
+    if kind == "ivf":
+        return IVFIndex()
+    raise ValueError(f"Unknown index '{kind}'. Choose from {', '.join(INDEX_KINDS)}.")
@@ -1,85 +1,269 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi import FastAPI, File, Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import List, Optional
 import json
 
+import metrics
+from logging_setup import get_logger
 from models import (
     ToolsInput,
     SearchQuery,
+    BatchSearchQuery,
     DeleteToolsInput,
     SearchResult,
+    BatchSearchResult,
     DeleteResult,
     UploadResult,
+    JobStatus,
     StatsResult,
+    ReloadResult,
+    NamespaceInfo,
     ClearResult,
 )
-from tools_store import get_store
+from tools_store import get_store, configure_default_store
+from executor import (
+    ExecutorBusyError,
+    configure_executor,
+    get_executor,
+    DEFAULT_WORKER_THREADS,
+    DEFAULT_MAX_QUEUE_DEPTH,
+)
+from batcher import batched_search, search_many, configure_batching, queue_depth, DEFAULT_BATCH_MAX_SIZE, DEFAULT_BATCH_MAX_WAIT_MS
+from stream_ingest import ToolStreamParser, ingest_stream, ingest_chunks, DEFAULT_INGEST_CHUNK_SIZE
+from ingest_jobs import get_job_manager
+from namespaces import (
+    InvalidNamespaceError,
+    UnknownNamespaceError,
+    configure_namespaces,
+    get_namespaces,
+    namespace_store,
+    DEFAULT_NAMESPACE_DIR,
+    DEFAULT_NAMESPACE_MEMORY_MB,
+)
+from router import ShardError, ShardRouter, configure_router, DEFAULT_SHARD_TIMEOUT
+
+# Bytes read from an uploaded file at a time
+UPLOAD_READ_SIZE = 1024 * 1024
+
+logger = get_logger(__name__)
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body is produced while the request body is still
+    being read. StreamingResponse normally listens for a disconnect while it
+    streams, which would consume the request body messages.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
 
 
-def create_app(mcp, storage_path: str = "tool_embeddings.json"):
+def create_app(
+    mcp,
+    storage_path: str = "tool_embeddings.json",
+    worker_threads: int = DEFAULT_WORKER_THREADS,
+    max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH,
+    batch_max_size: int = DEFAULT_BATCH_MAX_SIZE,
+    batch_max_wait_ms: float = DEFAULT_BATCH_MAX_WAIT_MS,
+    ingest_chunk_size: int = DEFAULT_INGEST_CHUNK_SIZE,
+    namespace_dir: str = DEFAULT_NAMESPACE_DIR,
+    namespace_memory_mb: float = DEFAULT_NAMESPACE_MEMORY_MB,
+    shards: Optional[List[str]] = None,
+    shard_timeout: float = DEFAULT_SHARD_TIMEOUT,
+    **store_options,
+):
     """Create and configure the FastAPI application"""
+    if shards:
+        # Router mode: no store or model here, every request is forwarded to the shards
+        return create_router_app(mcp, configure_router(shards, shard_timeout), ingest_chunk_size)
+
     api = FastAPI(title="API Tools with MCP", version="1.0.0")
 
-    store_instance = get_store(storage_path)
+    # The MCP tools resolve the same default store; it is loaded here so a bad store fails startup
+    configure_default_store(storage_path, **store_options)
+    get_store()
+    # Other namespaces are loaded on first use; they share the model the default store warms up
+    configure_namespaces(namespace_dir, namespace_memory_mb, **{**store_options, "warm_up": False})
+
+    # Encode, search and persist work runs on a bounded pool, off the event loop
+    configure_executor(worker_threads, max_queue_depth)
+    # Concurrent searches are coalesced into batched encodes
+    configure_batching(batch_max_size, batch_max_wait_ms)
+
+    # REST request latency by route; MCP tool calls are timed in mcp_tools
+    api.add_middleware(metrics.RequestMetricsMiddleware)
+
+    @api.exception_handler(ExecutorBusyError)
+    async def executor_busy_handler(request, exc: ExecutorBusyError):
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+    @api.exception_handler(InvalidNamespaceError)
+    async def invalid_namespace_handler(request, exc: InvalidNamespaceError):
+        return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+    @api.exception_handler(UnknownNamespaceError)
+    async def unknown_namespace_handler(request, exc: UnknownNamespaceError):
+        return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+    # Every /api/tools endpoint takes ?namespace=<name>; without it the default store is used
 
     # Basic status endpoint
     @api.get("/api/status")
-    def status():
-        return {"status": "ok", "total_tools": len(store_instance.tools)}
+    async def status(namespace: Optional[str] = None):
+        async with namespace_store(namespace) as store:
+            return {"status": "ok", "total_tools": store.count}
+
+    # Namespaces endpoint
+    @api.get("/api/namespaces", response_model=List[NamespaceInfo])
+    async def list_namespaces():
+        """Namespaces on disk or in memory, with the size of the loaded ones"""
+        return [NamespaceInfo(**info) for info in get_namespaces().list()]
 
     # Tool post endpoint to upload tools in JSON format
     @api.post("/api/tools/upload-json", response_model=UploadResult)
-    async def upload_tools_json(tools_input: ToolsInput):
+    async def upload_tools_json(tools_input: ToolsInput, namespace: Optional[str] = None):
         tools = tools_input.tools
         if not tools:
             raise HTTPException(status_code=400, detail="No tools provided")
-        initial_count = len(store_instance.tools)
-        store_instance.add_tools(tools)
-        added = len(store_instance.tools) - initial_count
+        async with namespace_store(namespace, create=True) as store:
+            if tools_input.background:
+                return queue_job(store, namespace, tools, tools_input.upsert)
+            ingest = await get_executor().run(store.add_tools, tools, upsert=tools_input.upsert)
+            total_tools = store.count
         return UploadResult(
-            message=f"Successfully added {added} tools",
-            total_tools=len(store_instance.tools),
+            message=f"Successfully added {ingest['added']} tools",
+            total_tools=total_tools,
+            added=ingest["added"],
+            tools_per_sec=round(ingest["tools_per_sec"], 2),
+            updated=ingest["updated"],
+            unchanged=ingest["unchanged"],
         )
 
     # Tool upload endpoint to upload tools in file format
     @api.post("/api/tools/upload-file", response_model=UploadResult)
-    async def upload_tools_file(file: UploadFile = File(...)):
-        if not file.filename.lower().endswith(".json"):
-            raise HTTPException(status_code=400, detail="Only .json files are supported")
-        try:
-            content = await file.read()
-            data = json.loads(content)
-            tools = data if isinstance(data, list) else [data]
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON file")
+    async def upload_tools_file(
+        file: UploadFile = File(...), upsert: bool = False, background: bool = False, namespace: Optional[str] = None
+    ):
+        if not file.filename.lower().endswith((".json", ".ndjson", ".jsonl")):
+            raise HTTPException(status_code=400, detail="Only .json, .ndjson and .jsonl files are supported")
+        get_namespaces().resolve(namespace)
 
-        if not tools:
+        async def file_chunks():
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                yield chunk
+
+        if background:
+            # The whole file is parsed before the job is queued, so a malformed file queues nothing
+            parser = ToolStreamParser()
+            tools: List[dict] = []
+            try:
+                async for chunk in file_chunks():
+                    tools.extend(parser.feed(chunk))
+                tools.extend(parser.close())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON file: {e}")
+            if not tools:
+                raise HTTPException(status_code=400, detail="No tools provided")
+            async with namespace_store(namespace, create=True) as store:
+                return queue_job(store, namespace, tools, upsert)
+
+        # Parsed and added in chunks, so the file is never held in memory as a whole
+        result = None
+        async with namespace_store(namespace, create=True) as store:
+            async for result in ingest_stream(store, file_chunks(), upsert, ingest_chunk_size):
+                pass
+        if result["event"] == "error":
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid JSON file: {result['detail']} ({result['received']} tools before the error were added)",
+            )
+        if not result["received"]:
             raise HTTPException(status_code=400, detail="No tools provided")
+        return UploadResult(
+            message=f"Successfully added {result['added']} tools",
+            total_tools=result["total_tools"],
+            added=result["added"],
+            tools_per_sec=result["tools_per_sec"],
+            updated=result["updated"],
+            unchanged=result["unchanged"],
+        )
 
-        initial_count = len(store_instance.tools)
-        store_instance.add_tools(tools)
-        added = len(store_instance.tools) - initial_count
+    def queue_job(store, namespace: Optional[str], tools: List[dict], upsert: bool) -> UploadResult:
+        # The job holds its own pin, so the namespace is not evicted before the job finishes
+        manager = get_namespaces()
+        manager.acquire_loaded(namespace)
+        job = get_job_manager().submit(
+            store, tools, upsert,
+            namespace=manager.resolve(namespace),
+            on_finish=lambda: manager.release(namespace),
+        )
         return UploadResult(
-            message=f"Successfully added {added} tools",
-            total_tools=len(store_instance.tools),
+            message=f"Queued {len(tools)} tools as ingest job {job.job_id}",
+            total_tools=store.count,
+            job_id=job.job_id,
         )
 
+    # Background ingest jobs
+    @api.get("/api/jobs", response_model=List[JobStatus])
+    async def list_jobs():
+        """Status of the queued, running and recently finished ingest jobs, oldest first"""
+        return [JobStatus(**job.to_dict()) for job in get_job_manager().list()]
+
+    @api.get("/api/jobs/{job_id}", response_model=JobStatus)
+    async def get_job(job_id: str):
+        """Progress, throughput and outcome of one ingest job"""
+        job = get_job_manager().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown ingest job '{job_id}'")
+        return JobStatus(**job.to_dict())
+
+    # Streaming upload: NDJSON or a JSON array in the request body, added chunk by chunk
+    @api.post("/api/tools/upload-stream")
+    async def upload_tools_stream(request: Request, upsert: bool = False, namespace: Optional[str] = None):
+        """
+        Stream tools as NDJSON (one tool per line) or a JSON array. Tools are
+        parsed as they arrive and added every `ingest_chunk_size` tools; the
+        response is NDJSON with one progress event per added chunk and a
+        final "done" (or "error") event.
+        """
+        # Rejected before the response starts streaming
+        get_namespaces().resolve(namespace)
+
+        async def events():
+            async with namespace_store(namespace, create=True) as store:
+                try:
+                    async for event in ingest_stream(store, request.stream(), upsert, ingest_chunk_size):
+                        yield json.dumps(event) + "\n"
+                except ClientDisconnect:
+                    logger.warning(f"Streaming upload client disconnected; chunks already added are kept ({store.count} tools)")
+
+        return RequestStreamingResponse(events(), media_type="application/x-ndjson")
+
     # Tool search endpoint
     @api.post("/api/tools/search", response_model=SearchResult)
-    async def search_tools(query: SearchQuery):
+    async def search_tools(query: SearchQuery, namespace: Optional[str] = None):
         """
         Search for similar OpenAPI tools using natural language query.
         Returns top k most similar tools based on cosine similarity.
         """
-        if not store_instance.tools:
-            return SearchResult(
-                query=query.query,
-                k=query.k,
-                total_results=0,
-                results=[],
-            )
+        async with namespace_store(namespace) as store:
+            if store.shared:
+                # Another worker process may have written since this one last looked
+                await get_executor().run(store.refresh)
+            if not store.count:
+                return SearchResult(
+                    query=query.query,
+                    k=query.k,
+                    total_results=0,
+                    results=[],
+                )
 
-        results = store_instance.search(query.query, query.k)
+            try:
+                results = await batched_search(store, query.query, query.k, query.filters, query.mode)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         return SearchResult(
             query=query.query,
             k=query.k,
@@ -87,33 +271,102 @@ def create_app(mcp, storage_path: str = "tool_embeddings.json"):
             results=results,
         )
 
+    # Batch search endpoint
+    @api.post("/api/tools/search-batch", response_model=BatchSearchResult)
+    async def search_tools_batch(batch: BatchSearchQuery, namespace: Optional[str] = None):
+        """
+        Search several natural language queries in one call.
+        The queries are encoded together and scored with a single matrix product;
+        results are returned per query, optionally de-duplicated across queries.
+        """
+        async with namespace_store(namespace) as store:
+            try:
+                per_query = await search_many(store, batch.queries, batch.k, batch.filters, batch.mode, batch.dedupe)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        return BatchSearchResult(
+            k=batch.k,
+            dedupe=batch.dedupe,
+            total_results=sum(len(results) for results in per_query),
+            results=[
+                SearchResult(query=query, k=batch.k, total_results=len(results), results=results)
+                for query, results in zip(batch.queries, per_query)
+            ],
+        )
+
     # Get stats endpoint
     @api.get("/api/tools/stats", response_model=StatsResult)
-    async def get_stats():
+    async def get_stats(namespace: Optional[str] = None):
         """Get statistics about stored tools"""
-        return StatsResult(
-            total_tools=len(store_instance.tools),
-            storage_path=str(store_instance.storage_path.absolute()),
-            model=store_instance.model_name,
+        async with namespace_store(namespace) as store:
+            return StatsResult(
+                namespace=get_namespaces().resolve(namespace),
+                total_tools=store.count,
+                storage_path=str(store.storage_path.absolute()),
+                model=store.model_name,
+                backend=store.backend,
+                needs_reembed=store.needs_reembed,
+                cache=store.cache_stats(),
+                memory=store.memory_stats(),
+            )
+
+    # Prometheus metrics endpoint
+    @api.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        """Stage and request latency histograms plus per-namespace store and cache gauges and queue gauges in the Prometheus text format"""
+        namespaces = get_namespaces()
+        metrics.record_stores(namespaces.loaded_stores())
+        metrics.EXECUTOR_PENDING.set(get_executor().pending)
+        metrics.BATCH_QUEUE_DEPTH.set(queue_depth())
+        jobs = [job.status for job in get_job_manager().list()]
+        for status in ("queued", "running", "succeeded", "failed"):
+            metrics.INGEST_JOBS.set(jobs.count(status), status=status)
+        metrics.NAMESPACES_LOADED.set(namespaces.loaded_count)
+        metrics.NAMESPACE_MEMORY_BYTES.set(namespaces.memory_bytes())
+        metrics.NAMESPACE_EVICTIONS.set(namespaces.evictions)
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Reload endpoint
+    @api.post("/api/tools/reload", response_model=ReloadResult)
+    async def reload_tools(namespace: Optional[str] = None):
+        """
+        Load the snapshot currently at the storage path (e.g. regenerated offline)
+        and swap it in; searches are served from the old tools until the swap
+        """
+        try:
+            async with namespace_store(namespace) as store:
+                result = await get_executor().run(store.reload)
+        except (InvalidNamespaceError, UnknownNamespaceError, ExecutorBusyError):
+            raise
+        except Exception as e:
+            logger.error(f"Reload failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Reload failed, the current tools are kept: {e}")
+        return ReloadResult(
+            message=f"Reloaded {result['total_tools']} tools from snapshot generation {result['generation']}",
+            total_tools=result["total_tools"],
+            previous_tools=result["previous_tools"],
+            generation=result["generation"],
+            version=result["version"],
+            seconds=round(result["seconds"], 3),
         )
 
     # Clear tools endpoint
     @api.delete("/api/tools/clear", response_model=ClearResult)
-    async def clear_tools():
+    async def clear_tools(namespace: Optional[str] = None):
         """Clear all stored tools"""
-        store_instance.tools = []
-        store_instance.embeddings = None
-        store_instance.save_to_disk()
+        async with namespace_store(namespace) as store:
+            await get_executor().run(store.clear_tools)
         return ClearResult(message="All tools cleared")
 
     # Delete specific tools endpoint
     @api.delete("/api/tools/delete", response_model=DeleteResult)
-    async def delete_tools(delete_input: DeleteToolsInput):
+    async def delete_tools(delete_input: DeleteToolsInput, namespace: Optional[str] = None):
         """Delete specific tools by their names"""
         if not delete_input.tool_names:
             raise HTTPException(status_code=400, detail="No tool names provided")
 
-        result = store_instance.delete_tools(delete_input.tool_names)
+        async with namespace_store(namespace) as store:
+            result = await get_executor().run(store.delete_tools, delete_input.tool_names)
         return DeleteResult(
             deleted_count=result["deleted_count"],
             not_found=result["not_found"],
@@ -124,3 +377,165 @@ def create_app(mcp, storage_path: str = "tool_embeddings.json"):
     api.mount("/mcp", mcp.http_app())
 
     return api
+
+
+def create_router_app(mcp, router: ShardRouter, ingest_chunk_size: int = DEFAULT_INGEST_CHUNK_SIZE):
+    """
+    Create the FastAPI application of a router: the same /api/tools endpoints,
+    scattered to the shards and gathered. Ingest jobs and reloads are per
+    shard; call the shards for those.
+    """
+    api = FastAPI(title="API Tools with MCP (router)", version="1.0.0")
+
+    api.add_middleware(metrics.RequestMetricsMiddleware)
+
+    @api.exception_handler(ShardError)
+    async def shard_error_handler(request, exc: ShardError):
+        content = {"detail": str(exc)}
+        if exc.failed_shards:
+            content["failed_shards"] = exc.failed_shards
+        return JSONResponse(status_code=exc.status_code, content=content)
+
+    # Basic status endpoint
+    @api.get("/api/status")
+    async def status(namespace: Optional[str] = None):
+        return {"status": "ok", "total_tools": await router.count(namespace), "shards": router.shards}
+
+    # Namespaces endpoint
+    @api.get("/api/namespaces", response_model=List[NamespaceInfo])
+    async def list_namespaces():
+        """Namespaces of all shards, with their sizes summed"""
+        return [NamespaceInfo(**info) for info in await router.namespaces()]
+
+    def upload_result(ingest: dict) -> UploadResult:
+        return UploadResult(
+            message=f"Successfully added {ingest['added']} tools",
+            total_tools=ingest["total_tools"],
+            added=ingest["added"],
+            tools_per_sec=round(ingest["tools_per_sec"], 2),
+            updated=ingest["updated"],
+            unchanged=ingest["unchanged"],
+        )
+
+    # Tool post endpoint to upload tools in JSON format
+    @api.post("/api/tools/upload-json", response_model=UploadResult)
+    async def upload_tools_json(tools_input: ToolsInput, namespace: Optional[str] = None):
+        if not tools_input.tools:
+            raise HTTPException(status_code=400, detail="No tools provided")
+        if tools_input.background:
+            raise HTTPException(status_code=400, detail="Background uploads go to the shards directly, not through the router")
+        return upload_result(await router.add_tools(tools_input.tools, tools_input.upsert, namespace))
+
+    def chunked_ingest(chunks, upsert: bool, namespace: Optional[str]):
+        async def add(batch: List[dict]) -> dict:
+            return await router.add_tools(batch, upsert, namespace)
+
+        async def count() -> int:
+            return await router.count(namespace)
+
+        return ingest_chunks(add, count, chunks, ingest_chunk_size)
+
+    # Tool upload endpoint to upload tools in file format
+    @api.post("/api/tools/upload-file", response_model=UploadResult)
+    async def upload_tools_file(
+        file: UploadFile = File(...), upsert: bool = False, background: bool = False, namespace: Optional[str] = None
+    ):
+        if not file.filename.lower().endswith((".json", ".ndjson", ".jsonl")):
+            raise HTTPException(status_code=400, detail="Only .json, .ndjson and .jsonl files are supported")
+        if background:
+            raise HTTPException(status_code=400, detail="Background uploads go to the shards directly, not through the router")
+
+        async def file_chunks():
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                yield chunk
+
+        result = None
+        async for result in chunked_ingest(file_chunks(), upsert, namespace):
+            pass
+        if result["event"] == "error":
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid JSON file: {result['detail']} ({result['received']} tools before the error were added)",
+            )
+        if not result["received"]:
+            raise HTTPException(status_code=400, detail="No tools provided")
+        return upload_result(result)
+
+    # Streaming upload: each chunk is split by shard as it is parsed
+    @api.post("/api/tools/upload-stream")
+    async def upload_tools_stream(request: Request, upsert: bool = False, namespace: Optional[str] = None):
+        """Stream tools as NDJSON or a JSON array, as on a shard; progress events count all shards"""
+        async def events():
+            try:
+                async for event in chunked_ingest(request.stream(), upsert, namespace):
+                    yield json.dumps(event) + "\n"
+            except ShardError as e:
+                logger.error(f"Streaming upload through the router failed: {e}")
+                yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+            except ClientDisconnect:
+                logger.warning("Streaming upload client disconnected; chunks already added are kept")
+
+        return RequestStreamingResponse(events(), media_type="application/x-ndjson")
+
+    # Tool search endpoint
+    @api.post("/api/tools/search", response_model=SearchResult)
+    async def search_tools(query: SearchQuery, namespace: Optional[str] = None):
+        """Search every shard and merge their top k by score"""
+        results, failed = await router.search(query.query, query.k, query.filters, query.mode, namespace)
+        return SearchResult(
+            query=query.query,
+            k=query.k,
+            total_results=len(results),
+            results=results,
+            failed_shards=failed or None,
+        )
+
+    # Batch search endpoint
+    @api.post("/api/tools/search-batch", response_model=BatchSearchResult)
+    async def search_tools_batch(batch: BatchSearchQuery, namespace: Optional[str] = None):
+        """Search every shard with all queries at once and merge each query's top k by score"""
+        per_query, failed = await router.search_many(
+            batch.queries, batch.k, batch.filters, batch.mode, batch.dedupe, namespace
+        )
+        return BatchSearchResult(
+            k=batch.k,
+            dedupe=batch.dedupe,
+            total_results=sum(len(results) for results in per_query),
+            results=[
+                SearchResult(query=query, k=batch.k, total_results=len(results), results=results)
+                for query, results in zip(batch.queries, per_query)
+            ],
+            failed_shards=failed or None,
+        )
+
+    # Get stats endpoint
+    @api.get("/api/tools/stats", response_model=StatsResult)
+    async def get_stats(namespace: Optional[str] = None):
+        """Tool count of every shard and their total"""
+        return StatsResult(**await router.stats(namespace))
+
+    # Prometheus metrics endpoint
+    @api.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        """Request and per-shard latency histograms in the Prometheus text format"""
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Clear tools endpoint
+    @api.delete("/api/tools/clear", response_model=ClearResult)
+    async def clear_tools(namespace: Optional[str] = None):
+        """Clear all stored tools on every shard"""
+        await router.clear_tools(namespace)
+        return ClearResult(message="All tools cleared")
+
+    # Delete specific tools endpoint
+    @api.delete("/api/tools/delete", response_model=DeleteResult)
+    async def delete_tools(delete_input: DeleteToolsInput, namespace: Optional[str] = None):
+        """Delete specific tools by their names on the shards that own them"""
+        if not delete_input.tool_names:
+            raise HTTPException(status_code=400, detail="No tool names provided")
+        return DeleteResult(**await router.delete_tools(delete_input.tool_names, namespace))
+
+    # Mount MCP at /mcp; its tools route to the shards too
+    api.mount("/mcp", mcp.http_app())
+
+    return api
@@ -0,0 +1,218 @@
+import asyncio
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from logging_setup import get_logger
+from executor import ExecutorBusyError, get_executor
+from tools_store import SEARCH_MODES
+
+logger = get_logger(__name__)
+
+DEFAULT_BATCH_MAX_SIZE = 32
+DEFAULT_BATCH_MAX_WAIT_MS = 2.0
+
+
+class SearchBatcher:
+    """
+    Coalesces concurrent search queries for one store.
+
+    Queries submitted within `max_wait_ms` of the first one in a batch, up to
+    `max_batch`, are dispatched to the store executor as a single
+    `ToolsStore.search_batch` call: one batched encode and one matrix-matrix
+    similarity. Each caller gets its own results back through a Future.
+
+    Collection happens on a dedicated thread so callers from any event loop
+    (HTTP and stdio MCP run on different loops in dual transport mode) share
+    the same batches.
+    """
+
+    def __init__(self, store, max_batch: int = DEFAULT_BATCH_MAX_SIZE, max_wait_ms: float = DEFAULT_BATCH_MAX_WAIT_MS, max_pending: int = 1024):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        # (query, k, filters, mode, transport, future)
+        self._queue: "queue.Queue[Tuple[str, int, Optional[Dict[str, Any]], str, str, Future]]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, k: int, filters: Optional[Dict[str, Any]] = None, mode: str = "semantic") -> Future:
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((query, k, filters, mode, metrics.TRANSPORT.get(), future))
+        except queue.Full:
+            raise ExecutorBusyError("Server busy: too many searches waiting to be batched")
+        return future
+
+    def close(self):
+        """Stop collecting once the searches already queued are dispatched"""
+        # Blocks while the queue is full rather than dropping the sentinel
+        self._queue.put(None)
+
+    @property
+    def queue_depth(self) -> int:
+        """Searches waiting to be collected into a batch"""
+        return self._queue.qsize()
+
+    def _collect(self) -> Tuple[List[Tuple[str, int, Optional[Dict[str, Any]], str, str, Future]], bool]:
+        """The next batch, and whether close() was called"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            if not batch:
+                continue
+            queries = [query for query, _, _, _, _, _ in batch]
+            ks = [k for _, k, _, _, _, _ in batch]
+            filters = [query_filters for _, _, query_filters, _, _, _ in batch]
+            modes = [mode for _, _, _, mode, _, _ in batch]
+            transports = {transport for _, _, _, _, transport, _ in batch}
+            futures = [future for _, _, _, _, _, future in batch]
+            # The executor runs the batch in this thread's context, so label it with its callers' transport
+            token = metrics.TRANSPORT.set(transports.pop() if len(transports) == 1 else "mixed")
+            try:
+                job = get_executor().submit(self.store.search_batch, queries, ks, filters, modes)
+            except Exception as e:
+                for future in futures:
+                    self._settle(future, error=e)
+                continue
+            finally:
+                metrics.TRANSPORT.reset(token)
+            job.add_done_callback(lambda done, futures=futures: self._fan_out(done, futures))
+
+    @staticmethod
+    def _fan_out(done: Future, futures: List[Future]):
+        if done.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+        error = done.exception()
+        if error is not None:
+            for future in futures:
+                SearchBatcher._settle(future, error=error)
+            return
+        for future, results in zip(futures, done.result()):
+            SearchBatcher._settle(future, results)
+
+    @staticmethod
+    def _settle(future: Future, results: Any = None, error: Optional[BaseException] = None):
+        """Complete one caller's future; a caller that gave up (cancelled) must not strand the rest of the batch"""
+        if future.done():
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results)
+        except InvalidStateError:
+            # Cancelled between the check and the call
+            pass
+
+
+_settings: Dict[str, Any] = {"max_batch": DEFAULT_BATCH_MAX_SIZE, "max_wait_ms": DEFAULT_BATCH_MAX_WAIT_MS}
+_batchers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_batchers_lock = threading.Lock()
+
+
+def configure_batching(max_batch: int = DEFAULT_BATCH_MAX_SIZE, max_wait_ms: float = DEFAULT_BATCH_MAX_WAIT_MS):
+    """Set the coalescing limits; a max_wait_ms of 0 disables batching"""
+    _settings["max_batch"] = max_batch
+    _settings["max_wait_ms"] = max_wait_ms
+    logger.info(f"Search batching: max_batch={max_batch}, max_wait_ms={max_wait_ms}")
+
+
+def queue_depth() -> int:
+    """Searches waiting to be batched, over all stores"""
+    with _batchers_lock:
+        return sum(batcher.queue_depth for batcher in _batchers.values())
+
+
+def discard_batcher(store):
+    """Stop the batcher of `store`, if any; its collector thread would otherwise keep the store alive"""
+    with _batchers_lock:
+        batcher = _batchers.pop(store, None)
+    if batcher is not None:
+        batcher.close()
+
+
+def _get_batcher(store) -> SearchBatcher:
+    with _batchers_lock:
+        batcher = _batchers.get(store)
+        if batcher is None:
+            batcher = SearchBatcher(store, _settings["max_batch"], _settings["max_wait_ms"])
+            _batchers[store] = batcher
+        return batcher
+
+
+async def batched_search(
+    store, query: str, k: int, filters: Optional[Dict[str, Any]] = None, mode: str = "semantic"
+) -> List[Dict[str, Any]]:
+    """Search `store`, coalescing with concurrent callers when batching is enabled"""
+    # Reject invalid filters here rather than failing every query batched with this one
+    store.filter_key(filters)
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Choose from {', '.join(SEARCH_MODES)}.")
+    # Keyword-only lookups do not encode, so there is nothing to gain from waiting for a batch
+    if mode == "lexical" or _settings["max_wait_ms"] <= 0 or _settings["max_batch"] <= 1:
+        return await get_executor().run(store.search, query, k, filters, mode)
+    return await asyncio.wrap_future(_get_batcher(store).submit(query, k, filters, mode))
+
+
+async def search_many(
+    store,
+    queries: List[str],
+    k: int,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: str = "semantic",
+    dedupe: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search several queries in one `search_batch` call: one batched encode and
+    one query-matrix x embedding-matrix product. With `dedupe`, a tool is only
+    returned for the first query that ranks it in its top `k`; later queries
+    get their next best tools instead.
+    """
+    store.filter_key(filters)
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Choose from {', '.join(SEARCH_MODES)}.")
+    # Deep enough that every query still fills k slots after earlier queries took theirs
+    depth = k * len(queries) if dedupe else k
+    results = await get_executor().run(store.search_batch, queries, depth, filters, mode)
+    if not dedupe:
+        return results
+    seen = set()
+    unique = []
+    for query_results in results:
+        kept = []
+        for result in query_results:
+            # Results of one call share the stored tool objects
+            if id(result["tool"]) in seen:
+                continue
+            seen.add(id(result["tool"]))
+            kept.append(result)
+            if len(kept) == k:
+                break
+        unique.append(kept)
+    return unique
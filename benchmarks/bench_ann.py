@@ -0,0 +1,83 @@
+"""
+Recall vs latency of the ANN index backends against exact search.
+
+Embeddings are synthetic but clustered (a Gaussian mixture on the unit sphere),
+which is closer to real tool catalogs than uniform noise. Queries are drawn
+from the same mixture. Recall@k is the overlap with the exact top-k.
+
+Usage:
+    python benchmarks/bench_ann.py --size 200000 --queries 200 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity import normalize_rows, cosine_top_k  # noqa: E402
+from ann_index import HNSWIndex, IVFIndex  # noqa: E402
+
+
+def clustered(rng, n, dim, clusters, spread=0.6):
+    """Points around random unit centers; `spread` is the expected norm of the noise"""
+    centers = normalize_rows(rng.standard_normal((clusters, dim), dtype=np.float32))
+    labels = rng.integers(0, clusters, n)
+    noise = rng.standard_normal((n, dim), dtype=np.float32) * (spread / np.sqrt(dim))
+    return normalize_rows(centers[labels] + noise)
+
+
+def evaluate(name, search, queries, truth, k):
+    timings, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids, _ = search(q, k)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += len(set(np.asarray(ids).tolist()) & expected)
+    recall = hits / (len(queries) * k)
+    print(f"{name:<24} | {recall:>8.3f} | {np.percentile(timings, 50):>8.3f} | {np.percentile(timings, 99):>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall vs latency against exact search")
+    parser.add_argument("--size", type=int, default=200000, help="Number of vectors (default: 200000)")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (default: 384)")
+    parser.add_argument("--clusters", type=int, default=1000, help="Mixture components (default: 1000)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries (default: 200)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, args.size, args.dim, args.clusters)
+    queries = clustered(rng, args.queries, args.dim, args.clusters)
+    ids = np.arange(args.size, dtype=np.int64)
+    truth = [set(cosine_top_k(vectors, q, args.k)[0].tolist()) for q in queries]
+
+    print(f"{'backend':<24} | {'recall':>8} | {'p50 ms':>8} | {'p99 ms':>8}")
+    evaluate("exact", lambda q, k: cosine_top_k(vectors, q, k), queries, truth, args.k)
+
+    ivf = IVFIndex()
+    start = time.perf_counter()
+    ivf.build(ids, vectors)
+    print(f"(ivf build {time.perf_counter() - start:.1f}s)")
+    for nprobe in (4, 16, 64):
+        ivf.nprobe = nprobe
+        evaluate(f"ivf nprobe={nprobe}", ivf.search, queries, truth, args.k)
+
+    try:
+        hnsw = HNSWIndex()
+    except ImportError as e:
+        print(f"(skipping hnsw: {e})")
+        return
+    start = time.perf_counter()
+    hnsw.build(ids, vectors)
+    print(f"(hnsw build {time.perf_counter() - start:.1f}s)")
+    for ef in (32, 64, 200):
+        hnsw.ef_search = ef
+        evaluate(f"hnsw ef_search={ef}", hnsw.search, queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
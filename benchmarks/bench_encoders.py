@@ -0,0 +1,99 @@
+"""
+Encode latency and search quality of the embedding backends.
+
+Every backend encodes the same tool catalog and the same queries. Latency is
+timed per single query (the search path) and per upload-sized batch. Quality
+is measured against the torch backend: the mean cosine between each tool's
+embeddings from both backends, and recall@k of each backend's top-k against
+torch's for every query.
+
+Tools come from a JSON file of tool specs (default: test_specs.json) and are
+serialized like ToolsStore does with the default template. Queries are the tool descriptions
+unless --queries_file gives one query per line.
+
+Usage:
+    python benchmarks/bench_encoders.py --backends torch,onnx,onnx-int8 --repeat 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoders import load_encoder  # noqa: E402
+from similarity import normalize_rows, top_k  # noqa: E402
+from serialization import ToolSerializer  # noqa: E402
+
+
+def encode(model, texts, batch_size):
+    return normalize_rows(model.encode(texts, batch_size=batch_size, convert_to_numpy=True)).reshape(len(texts), -1)
+
+
+def percentiles(timings):
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode latency and search quality per embedding backend")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help="Comma-separated backends, torch first")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model (default: all-MiniLM-L6-v2)")
+    parser.add_argument("--tools_file", default="test_specs.json", help="JSON list of tool specs (default: test_specs.json)")
+    parser.add_argument("--queries_file", default=None, help="Text file with one query per line (default: tool descriptions)")
+    parser.add_argument("--repeat", type=int, default=200, help="Single-query encodes timed per backend (default: 200)")
+    parser.add_argument("--batch_size", type=int, default=64, help="Upload batch size (default: 64)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query for recall (default: 5)")
+    args = parser.parse_args()
+
+    with open(args.tools_file) as f:
+        specs = json.load(f)
+    serializer = ToolSerializer()
+    texts = [serializer.serialize(tool) for tool in specs]
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [tool.get("description", tool.get("name", "")) for tool in specs]
+    # Repeat the catalog so batch timings are not dominated by fixed overhead
+    batch = (texts * (args.batch_size // max(len(texts), 1) + 1))[:args.batch_size]
+
+    backends = args.backends.split(",")
+    reference = None
+    print(f"{'backend':<10} | {'load s':>7} | {'query p50 ms':>12} | {'query p99 ms':>12} | "
+          f"{'batch p50 ms':>12} | {'batch p99 ms':>12} | {'cosine':>7} | {'recall@k':>8}")
+    for backend in backends:
+        start = time.perf_counter()
+        model = load_encoder(args.model, backend)
+        load_seconds = time.perf_counter() - start
+
+        encode(model, ["warm up"], 1)
+        query_timings = []
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            encode(model, [queries[i % len(queries)]], 1)
+            query_timings.append((time.perf_counter() - start) * 1000)
+        batch_timings = []
+        for _ in range(max(args.repeat // 10, 5)):
+            start = time.perf_counter()
+            encode(model, batch, args.batch_size)
+            batch_timings.append((time.perf_counter() - start) * 1000)
+
+        tool_embeddings = encode(model, texts, args.batch_size)
+        query_embeddings = encode(model, queries, args.batch_size)
+        rankings = [set(top_k(scores, args.k).tolist()) for scores in query_embeddings @ tool_embeddings.T]
+        if reference is None:
+            reference = (tool_embeddings, rankings)
+        cosine = float(np.mean(np.sum(tool_embeddings * reference[0], axis=1)))
+        recall = np.mean([len(got & expected) / len(expected) for got, expected in zip(rankings, reference[1])])
+
+        q50, q99 = percentiles(query_timings)
+        b50, b99 = percentiles(batch_timings)
+        print(f"{backend:<10} | {load_seconds:>7.2f} | {q50:>12.2f} | {q99:>12.2f} | "
+              f"{b50:>12.2f} | {b99:>12.2f} | {cosine:>7.4f} | {recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory, recall and latency of quantized stored embeddings against float32.
+
+Uses the clustered synthetic embeddings of bench_ann.py. Every encoding is
+scanned in full, then the top `k * rescore_factor` candidates are rescored
+against the float32 rows exactly like ToolsStore does. Recall@k is the
+overlap with the exact float32 top-k. Synthetic vectors have no
+Matryoshka structure, so truncated dimensions understate what a model
+trained for truncation achieves.
+
+Usage:
+    python benchmarks/bench_quantization.py --size 1000000 --encodings float16,int8,int8-192
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ann import clustered  # noqa: E402
+from quantization import Quantizer  # noqa: E402
+from similarity import cosine_top_k, top_k  # noqa: E402
+
+
+def parse_encoding(encoding):
+    dtype, _, dim = encoding.partition("-")
+    return Quantizer(dtype, int(dim or 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized embedding memory, recall and latency")
+    parser.add_argument("--size", type=int, default=200000, help="Number of vectors (default: 200000)")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (default: 384)")
+    parser.add_argument("--clusters", type=int, default=1000, help="Mixture components (default: 1000)")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries (default: 100)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--encodings", default="float16,int8,float16-192,int8-192",
+                        help="Comma-separated dtype[-dim] encodings (default: float16,int8,float16-192,int8-192)")
+    parser.add_argument("--rescore_factors", default="0,4", help="Comma-separated rescore factors (default: 0,4)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, args.size, args.dim, args.clusters)
+    queries = clustered(rng, args.queries, args.dim, args.clusters)
+    truth = [set(cosine_top_k(vectors, q, args.k)[0].tolist()) for q in queries]
+
+    print(f"{'encoding':<14} | {'rescore':>7} | {'MB':>8} | {'x smaller':>9} | {'recall':>7} | {'p50 ms':>8}")
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        cosine_top_k(vectors, q, args.k)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{'float32':<14} | {'-':>7} | {vectors.nbytes / 2**20:>8.1f} | {1.0:>9.1f} | {1.0:>7.3f} | "
+          f"{np.percentile(timings, 50):>8.2f}")
+
+    for encoding in args.encodings.split(","):
+        quantizer = parse_encoding(encoding)
+        codes, scales = quantizer.encode(vectors)
+        size = codes.nbytes + (0 if scales is None else scales.nbytes)
+        for factor in (int(f) for f in args.rescore_factors.split(",")):
+            timings, hits = [], 0
+            for q, expected in zip(queries, truth):
+                start = time.perf_counter()
+                scores = quantizer.scores(quantizer.truncate(q[None]), codes, scales)[0]
+                if factor > 0:
+                    candidates = top_k(scores, args.k * factor)
+                    found = candidates[top_k(vectors[candidates] @ q, args.k)]
+                else:
+                    found = top_k(scores, args.k)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += len(set(found.tolist()) & expected)
+            print(f"{quantizer.name:<14} | {factor:>7} | {size / 2**20:>8.1f} | {vectors.nbytes / size:>9.1f} | "
+                  f"{hits / (len(queries) * args.k):>7.3f} | {np.percentile(timings, 50):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
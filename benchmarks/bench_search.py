@@ -0,0 +1,72 @@
+"""
+Micro-benchmark for the ToolsStore search hot path.
+
+Compares the previous approach (re-normalizing a float64 matrix on every query
+and fully sorting all scores) with the current one (pre-normalized float32
+matrix, one dot product and argpartition top-k) on random embeddings.
+No model is loaded; only the similarity and selection steps are timed.
+
+Usage:
+    python benchmarks/bench_search.py --sizes 1000,10000,100000,1000000 --queries 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity import normalize_rows, cosine_top_k  # noqa: E402
+
+
+def legacy_search(embeddings: np.ndarray, query: np.ndarray, k: int):
+    """Equivalent of sklearn cosine_similarity + full argsort on float64"""
+    matrix = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    q = query / np.linalg.norm(query)
+    scores = matrix @ q
+    indices = np.argsort(scores)[::-1][:k]
+    return indices, scores[indices]
+
+
+def time_queries(fn, queries, k):
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query search latency by store size")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated tool counts")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (default: 384)")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per size (default: 50)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query (default: 5)")
+    parser.add_argument("--skip_legacy", action="store_true", help="Only time the current search path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'tools':>10} | {'legacy p50 ms':>13} | {'legacy p99 ms':>13} | {'current p50 ms':>14} | {'current p99 ms':>14}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        raw = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        legacy = ("-", "-")
+        if not args.skip_legacy:
+            raw64 = raw.astype(np.float64)
+            p50, p99 = time_queries(lambda q, k: legacy_search(raw64, q.astype(np.float64), k), queries, args.k)
+            legacy = (f"{p50:.3f}", f"{p99:.3f}")
+            del raw64
+
+        embeddings = normalize_rows(raw)
+        del raw
+        normalized_queries = normalize_rows(queries)
+        p50, p99 = time_queries(lambda q, k: cosine_top_k(embeddings, q, k), normalized_queries, args.k)
+        print(f"{size:>10} | {legacy[0]:>13} | {legacy[1]:>13} | {p50:>14.3f} | {p99:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
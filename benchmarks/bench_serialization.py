@@ -0,0 +1,83 @@
+"""
+Encode cost and search quality of tool serialization settings.
+
+Every setting serializes the same tool catalog (default: test_specs.json)
+and encodes it, multi-vector chunks included. Cost is the mean and max
+approximate tokens per tool and the encode time. Quality is recall@k for
+queries that describe a single parameter of a tool (its description, else
+its name), so the tool's own row has to carry its parameters to be found;
+multi-vector settings score each tool by its best chunk, like ToolsStore.
+
+Settings are `template[:max_tokens][:multi]`, e.g. `compact:128:multi`.
+
+Usage:
+    python benchmarks/bench_serialization.py --tools_file specs.json --settings default,compact:128,compact:128:multi
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoders import load_encoder  # noqa: E402
+from serialization import ToolSerializer, count_tokens, flatten_parameters  # noqa: E402
+from similarity import normalize_rows, top_k  # noqa: E402
+
+
+def parse_setting(setting):
+    template, _, rest = setting.partition(":")
+    budget, _, multi = rest.partition(":")
+    return ToolSerializer(template, int(budget or 0), multi == "multi")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization encode cost and parameter-query recall")
+    parser.add_argument("--settings", default="default,compact,compact:128,compact:128:multi",
+                        help="Comma-separated template[:max_tokens][:multi] settings (default: default,compact,compact:128,compact:128:multi)")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model (default: all-MiniLM-L6-v2)")
+    parser.add_argument("--backend", default="torch", help="Embedding backend (default: torch)")
+    parser.add_argument("--tools_file", default="test_specs.json", help="JSON list of tool specs (default: test_specs.json)")
+    parser.add_argument("--batch_size", type=int, default=64, help="Encode batch size (default: 64)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query for recall (default: 5)")
+    args = parser.parse_args()
+
+    with open(args.tools_file) as f:
+        specs = json.load(f)
+    queries, expected = [], []
+    for tool_row, tool in enumerate(specs):
+        schema = next((tool[field] for field in ("parameters", "input_schema", "inputSchema") if field in tool), None)
+        for name, line, _ in flatten_parameters(schema):
+            queries.append(line.split(": ", 1)[1] if ": " in line else name)
+            expected.append(tool_row)
+    model = load_encoder(args.model, args.backend)
+    query_embeddings = normalize_rows(model.encode(queries, batch_size=args.batch_size, convert_to_numpy=True))
+    expected = np.array(expected)
+
+    print(f"{'setting':<24} | {'tokens avg':>10} | {'tokens max':>10} | {'chunks':>6} | {'encode s':>8} | {'recall@k':>8}")
+    for setting in args.settings.split(","):
+        serializer = parse_setting(setting)
+        texts = [serializer.serialize(tool) for tool in specs]
+        chunk_texts = [serializer.chunks(tool) for tool in specs]
+        owners = np.array(list(range(len(specs))) + [row for row, chunks in enumerate(chunk_texts) for _ in chunks])
+        all_texts = texts + [text for chunks in chunk_texts for text in chunks]
+        tokens = [count_tokens(text) for text in texts]
+        start = time.perf_counter()
+        embeddings = normalize_rows(model.encode(all_texts, batch_size=args.batch_size, convert_to_numpy=True))
+        encode_seconds = time.perf_counter() - start
+        hits = 0
+        for query, tool_row in zip(query_embeddings, expected):
+            # Max-pool every tool's row and chunk scores
+            scores = np.full(len(specs), -np.inf, dtype=np.float32)
+            np.maximum.at(scores, owners, embeddings @ query)
+            hits += tool_row in top_k(scores, args.k)
+        recall = hits / len(queries) if queries else 0.0
+        print(f"{setting:<24} | {np.mean(tokens):>10.1f} | {max(tokens):>10} | {len(all_texts) - len(texts):>6} | "
+              f"{encode_seconds:>8.2f} | {recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
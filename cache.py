@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from logging_setup import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = get_logger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU cache with an optional per-entry TTL.
+    A `maxsize` of 0 disables the cache; a `ttl` of None or 0 never expires entries.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is not self._MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of tool embeddings keyed by the content hash of the
+    serialized tool text, for a single embedding model (one file per model).
+
+    The file is a small header (magic, dimension, generation) followed by
+    fixed-size records (16-byte hash, float32 vector). New embeddings are
+    appended to it as they are computed and read back through a memory map,
+    so only the hash -> record index is held in memory. Once it holds more
+    than `max_entries` records the newest ones are copied to a new file that
+    is renamed over it with the generation bumped; other processes keep
+    reading their mapping of the old file until their next write sees the new
+    generation and maps the new one. Appends and rewrites hold an exclusive
+    lock on `<file>.lock`, so worker processes serving the same store can
+    share the cache. A `max_entries` of 0 disables the cache.
+    """
+
+    MAGIC = b"TEMBC1"
+    HEADER_SIZE = 16
+    KEY_SIZE = 16
+
+    def __init__(self, path: Path, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.max_entries = max_entries
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._generation: Optional[int] = None
+        self._count = 0
+        self._rows: Dict[bytes, int] = {}
+        self._mapped: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        if max_entries > 0 and self.path.exists():
+            with self._lock, self._file_lock():
+                self._sync()
+
+    def _record_dtype(self, dim: int) -> np.dtype:
+        return np.dtype([("key", f"V{self.KEY_SIZE}"), ("vector", "<f4", (dim,))])
+
+    def _header(self, dim: int, generation: int) -> bytes:
+        return (self.MAGIC + np.array([dim, generation], dtype="<u4").tobytes()).ljust(self.HEADER_SIZE, b"\0")
+
+    def _sync(self):
+        """
+        Map the records another writer added since the last look, or the
+        whole file again if it was rewritten. Called with the file lock held.
+        """
+        try:
+            with open(self.path, "r+b") as f:
+                header = f.read(self.HEADER_SIZE)
+                if len(header) < self.HEADER_SIZE or not header.startswith(self.MAGIC):
+                    raise ValueError("unrecognized header")
+                dim, generation = (int(v) for v in np.frombuffer(header, dtype="<u4", count=2, offset=len(self.MAGIC)))
+                dtype = self._record_dtype(dim)
+                size = os.fstat(f.fileno()).st_size
+                count = (size - self.HEADER_SIZE) // dtype.itemsize
+                if size != self.HEADER_SIZE + count * dtype.itemsize:
+                    # A torn final record from a crash; drop it so appends stay aligned
+                    f.truncate(self.HEADER_SIZE + count * dtype.itemsize)
+        except FileNotFoundError:
+            self._forget()
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable embedding cache {self.path}: {e}")
+            self.path.unlink(missing_ok=True)
+            self._forget()
+            return
+        if (dim, generation) != (self.dim, self._generation):
+            self._forget()
+            self.dim, self._generation = dim, generation
+        if count > self._count:
+            self._mapped = np.memmap(self.path, dtype=dtype, mode="r", offset=self.HEADER_SIZE, shape=(count,))
+            keys = self._mapped["key"][self._count:]
+            self._rows.update((key.tobytes(), row) for row, key in enumerate(keys, self._count))
+            self._count = count
+
+    def _forget(self):
+        self.dim = None
+        self._generation = None
+        self._count = 0
+        self._rows = {}
+        self._mapped = None
+
+    def get_many(self, hashes: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached embeddings for hex content hashes, None for misses"""
+        if self.max_entries <= 0:
+            return [None] * len(hashes)
+        found = []
+        with self._lock:
+            for content_hash in hashes:
+                row = self._rows.get(bytes.fromhex(content_hash))
+                found.append(None if row is None else np.array(self._mapped[row]["vector"]))
+            hits = sum(vector is not None for vector in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def put_many(self, hashes: List[str], vectors: np.ndarray):
+        """Append embeddings for hex content hashes to the file"""
+        if self.max_entries <= 0 or not hashes:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        try:
+            with self._lock, self._file_lock():
+                self._sync()
+                if self.dim != dim:
+                    # No file yet, or the model changed shape under the same name; start over
+                    self._rewrite(np.empty(0, dtype=self._record_dtype(dim)), dim)
+                new = {}
+                for content_hash, vector in zip(hashes, vectors):
+                    key = bytes.fromhex(content_hash)
+                    if key not in self._rows and key not in new:
+                        new[key] = vector
+                if not new:
+                    return
+                records = np.empty(len(new), dtype=self._record_dtype(dim))
+                records["key"] = [np.void(key) for key in new]
+                records["vector"] = np.vstack(list(new.values()))
+                with open(self.path, "ab") as f:
+                    f.write(records.tobytes())
+                self._sync()
+                if self._count > self.max_entries + self.max_entries // 4:
+                    self._rewrite(self._mapped[-self.max_entries:], dim)
+                    logger.info(f"Shrunk embedding cache {self.path.name} to {self._count} entries")
+        except OSError as e:
+            logger.warning(f"Could not write embedding cache {self.path}: {e}")
+
+    def _rewrite(self, records: np.ndarray, dim: int, block: int = 4096):
+        """
+        Replace the file with `records` under the next generation and map it.
+        Called with the file lock held; copies in blocks so a mapped source is
+        never read into memory whole.
+        """
+        generation = ((self._generation or 0) + 1) % 2**32
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(self._header(dim, generation))
+            for start in range(0, len(records), block):
+                f.write(np.ascontiguousarray(records[start:start + block]).tobytes())
+        os.replace(tmp_path, self.path)
+        self._sync()
+
+    def _file_lock(self):
+        """Exclusive lock shared by every process using the cache file, released on exit"""
+        lock_file = open(self.lock_path, "ab")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
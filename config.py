@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import argparse
-from dataclasses import dataclass
+import json
+from dataclasses import asdict, dataclass
 from typing import Set
 
+# Environment variable carrying the configuration into uvicorn worker processes
+WORKER_CONFIG_ENV = "ONE_MCP_WORKER_CONFIG"
+
 @dataclass
 class ServerConfig:
     """Configuration for the MCP server."""
@@ -11,6 +15,34 @@ class ServerConfig:
     port: int
     host: str
     storage_path: str
+    encode_batch_size: int = 64
+    compact_threshold_mb: int = 64
+    index: str = "exact"
+    query_cache_size: int = 1024
+    result_cache_size: int = 0
+    cache_ttl: float = 3600
+    embedding_cache_size: int = 100_000
+    warm_up_model: bool = False
+    backend: str = "torch"
+    reembed: bool = False
+    http_workers: int = 1
+    embedding_dtype: str = "float32"
+    embedding_dim: int = 0
+    rescore_factor: int = 4
+    filter_fields: str = "type,tags,source,namespace"
+    worker_threads: int = 4
+    max_queue_depth: int = 64
+    batch_max_size: int = 32
+    batch_max_wait_ms: float = 2.0
+    ingest_chunk_size: int = 1000
+    reload_interval: float = 0
+    namespace_dir: str = "namespaces"
+    namespace_memory_mb: float = 0
+    shards: str = ""
+    shard_timeout: float = 5.0
+    serialization_template: str = "default"
+    max_tool_tokens: int = 0
+    multi_vector: bool = False
     
     @classmethod
     def from_args(cls, args) -> ServerConfig:
@@ -26,9 +58,94 @@ class ServerConfig:
             transports=set(raw_transports),
             port=args.port,
             host=args.host,
-            storage_path=args.storage_path
+            storage_path=args.storage_path,
+            encode_batch_size=args.encode_batch_size,
+            compact_threshold_mb=args.compact_threshold_mb,
+            index=args.index,
+            query_cache_size=args.query_cache_size,
+            result_cache_size=args.result_cache_size,
+            cache_ttl=args.cache_ttl,
+            embedding_cache_size=args.embedding_cache_size,
+            warm_up_model=args.warm_up_model,
+            backend=args.backend,
+            reembed=args.reembed,
+            http_workers=args.http_workers,
+            embedding_dtype=args.embedding_dtype,
+            embedding_dim=args.embedding_dim,
+            rescore_factor=args.rescore_factor,
+            filter_fields=args.filter_fields,
+            worker_threads=args.worker_threads,
+            max_queue_depth=args.max_queue_depth,
+            batch_max_size=args.batch_max_size,
+            batch_max_wait_ms=args.batch_max_wait_ms,
+            ingest_chunk_size=args.ingest_chunk_size,
+            reload_interval=args.reload_interval,
+            namespace_dir=args.namespace_dir,
+            namespace_memory_mb=args.namespace_memory_mb,
+            shards=args.shards,
+            shard_timeout=args.shard_timeout,
+            serialization_template=args.serialization_template,
+            max_tool_tokens=args.max_tool_tokens,
+            multi_vector=args.multi_vector
         )
     
+    def store_options(self) -> dict:
+        """Keyword options passed through to the ToolsStore."""
+        return {
+            "encode_batch_size": self.encode_batch_size,
+            "compact_threshold_mb": self.compact_threshold_mb,
+            "index": self.index,
+            "query_cache_size": self.query_cache_size,
+            "result_cache_size": self.result_cache_size,
+            "cache_ttl": self.cache_ttl,
+            "embedding_cache_size": self.embedding_cache_size,
+            "warm_up": self.warm_up_model,
+            "backend": self.backend,
+            "reembed": self.reembed,
+            # Worker processes share the storage files, so every process coordinates writes
+            "shared": self.http_workers > 1,
+            "embedding_dtype": self.embedding_dtype,
+            "embedding_dim": self.embedding_dim,
+            "rescore_factor": self.rescore_factor,
+            "filter_fields": [field.strip() for field in self.filter_fields.split(",") if field.strip()],
+            "reload_interval": self.reload_interval,
+            "serialization_template": self.serialization_template,
+            "max_tool_tokens": self.max_tool_tokens,
+            "multi_vector": self.multi_vector,
+        }
+    
+    def shard_urls(self) -> list:
+        """Base URLs of the shards this instance routes to; empty unless it is a router."""
+        return [url.strip() for url in self.shards.split(",") if url.strip()]
+    
+    def app_options(self) -> dict:
+        """Keyword options passed to create_app: executor, batching, namespace and shard settings plus the store options."""
+        return {
+            "worker_threads": self.worker_threads,
+            "max_queue_depth": self.max_queue_depth,
+            "batch_max_size": self.batch_max_size,
+            "batch_max_wait_ms": self.batch_max_wait_ms,
+            "ingest_chunk_size": self.ingest_chunk_size,
+            "namespace_dir": self.namespace_dir,
+            "namespace_memory_mb": self.namespace_memory_mb,
+            "shards": self.shard_urls(),
+            "shard_timeout": self.shard_timeout,
+            **self.store_options(),
+        }
+    
+    def to_json(self) -> str:
+        """Serialize for handing the configuration to worker processes."""
+        data = asdict(self)
+        data["transports"] = sorted(self.transports)
+        return json.dumps(data)
+    
+    @classmethod
+    def from_json(cls, payload: str) -> ServerConfig:
+        """Inverse of to_json."""
+        data = json.loads(payload)
+        data["transports"] = set(data["transports"])
+        return cls(**data)
+    
     @classmethod
     def default(cls) -> ServerConfig:
         """Create default configuration."""
@@ -64,4 +181,168 @@ def create_argument_parser() -> argparse.ArgumentParser:
         default="tool_embeddings.json", 
         help="Path to store tool embeddings (default: tool_embeddings.json)"
     )
+    parser.add_argument(
+        "--encode_batch_size", 
+        type=int, 
+        default=64, 
+        help="Number of tools encoded per model batch during uploads (default: 64)"
+    )
+    parser.add_argument(
+        "--compact_threshold_mb", 
+        type=int, 
+        default=64, 
+        help="Write-ahead log size in MB that triggers a background snapshot compaction (default: 64)"
+    )
+    parser.add_argument(
+        "--index", 
+        default="exact", 
+        choices=["exact", "hnsw", "ivf"], 
+        help="Search index: exact brute force, hnsw (requires hnswlib) or ivf (default: exact)"
+    )
+    parser.add_argument(
+        "--query_cache_size", 
+        type=int, 
+        default=1024, 
+        help="Number of query embeddings kept in the LRU cache, 0 to disable (default: 1024)"
+    )
+    parser.add_argument(
+        "--result_cache_size", 
+        type=int, 
+        default=0, 
+        help="Number of (query, k) search results kept in the LRU cache, 0 to disable (default: 0)"
+    )
+    parser.add_argument(
+        "--cache_ttl", 
+        type=float, 
+        default=3600, 
+        help="Seconds before a cached query embedding or result expires, 0 for no expiry (default: 3600)"
+    )
+    parser.add_argument(
+        "--embedding_cache_size", 
+        type=int, 
+        default=100_000, 
+        help="Tool embeddings kept on disk by content hash to skip re-encoding unchanged tools, 0 to disable (default: 100000)"
+    )
+    parser.add_argument(
+        "--warm_up_model", 
+        action="store_true", 
+        help="Load the embedding model in the background at startup instead of on the first upload or search (default: off)"
+    )
+    parser.add_argument(
+        "--backend", 
+        default="torch", 
+        choices=["torch", "onnx", "onnx-int8"], 
+        help="Embedding model inference backend; onnx and onnx-int8 need sentence-transformers[onnx] (default: torch)"
+    )
+    parser.add_argument(
+        "--reembed", 
+        action="store_true", 
+        help="Re-encode stored tools in the background if their embeddings are incompatible with --backend or the serialization settings (default: off)"
+    )
+    parser.add_argument(
+        "--http_workers", 
+        type=int, 
+        default=1, 
+        help="HTTP worker processes sharing one memory-mapped store; >1 coordinates writes across processes (default: 1)"
+    )
+    parser.add_argument(
+        "--embedding_dtype", 
+        default="float32", 
+        choices=["float32", "float16", "int8"], 
+        help="Precision of the embedding copy scanned by exact search; float16/int8 results are rescored at full precision (default: float32)"
+    )
+    parser.add_argument(
+        "--embedding_dim", 
+        type=int, 
+        default=0, 
+        help="Keep only the first N embedding dimensions in the scanned copy, 0 for all (default: 0)"
+    )
+    parser.add_argument(
+        "--rescore_factor", 
+        type=int, 
+        default=4, 
+        help="Candidates per requested result rescored at full precision after a quantized scan, 0 to skip (default: 4)"
+    )
+    parser.add_argument(
+        "--filter_fields", 
+        default="type,tags,source,namespace", 
+        help="Comma-separated top-level tool fields indexed for search filters (default: type,tags,source,namespace)"
+    )
+    parser.add_argument(
+        "--worker_threads", 
+        type=int, 
+        default=4, 
+        help="Threads running encode, search and persist work off the event loop (default: 4)"
+    )
+    parser.add_argument(
+        "--max_queue_depth", 
+        type=int, 
+        default=64, 
+        help="Requests allowed to wait for a worker thread before returning 503 (default: 64)"
+    )
+    parser.add_argument(
+        "--batch_max_size", 
+        type=int, 
+        default=32, 
+        help="Maximum number of concurrent search queries coalesced into one batch (default: 32)"
+    )
+    parser.add_argument(
+        "--batch_max_wait_ms", 
+        type=float, 
+        default=2.0, 
+        help="How long a search waits for others to batch with, 0 to disable batching (default: 2.0)"
+    )
+    parser.add_argument(
+        "--ingest_chunk_size", 
+        type=int, 
+        default=1000, 
+        help="Tools parsed and added per chunk by the streaming and file uploads (default: 1000)"
+    )
+    parser.add_argument(
+        "--reload_interval", 
+        type=float, 
+        default=0, 
+        help="Seconds between checks of the storage file for a new snapshot to hot reload, 0 to disable (default: 0)"
+    )
+    parser.add_argument(
+        "--namespace_dir", 
+        type=str, 
+        default="namespaces", 
+        help="Directory holding one subdirectory of storage files per tool namespace (default: namespaces)"
+    )
+    parser.add_argument(
+        "--namespace_memory_mb", 
+        type=float, 
+        default=0, 
+        help="Embedding memory all loaded namespaces may use before the least recently used are unloaded, 0 for no limit (default: 0)"
+    )
+    parser.add_argument(
+        "--shards", 
+        type=str, 
+        default="", 
+        help="Comma-separated base URLs of one-mcp shard instances; when set, this instance only routes searches and uploads to them (default: none)"
+    )
+    parser.add_argument(
+        "--shard_timeout", 
+        type=float, 
+        default=5.0, 
+        help="Seconds a shard has to answer a search before the router leaves it out (default: 5.0)"
+    )
+    parser.add_argument(
+        "--serialization_template", 
+        type=str, 
+        default="default", 
+        help="Tool fields embedded, in order: 'default' (name, description, other fields as JSON), 'compact' (name, description, flattened parameters) or a comma-separated list where * stands for the unlisted fields (default: default)"
+    )
+    parser.add_argument(
+        "--max_tool_tokens", 
+        type=int, 
+        default=0, 
+        help="Approximate tokens of serialized tool text embedded, later fields are cut first; 0 for no limit (default: 0)"
+    )
+    parser.add_argument(
+        "--multi_vector", 
+        action="store_true", 
+        help="Also embed the parameters and enum values of tools over the token limit as separate chunks and score each tool by its best match (default: off)"
+    )
     return parser
@@ -0,0 +1,70 @@
+import platform
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# One instance per (model, backend) for the whole process, with its load time in seconds
+_encoders: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+_encoders_lock = threading.Lock()
+
+
+def int8_onnx_file() -> str:
+    """Pre-quantized ONNX export (published in the model repo) that suits this CPU"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def encoder_id(model_name: str, backend: str) -> str:
+    """Identifies which model and backend produced an embedding; torch keeps the bare model name"""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def load_encoder(model_name: str, backend: str = "torch"):
+    """
+    Load `model_name` for the given inference backend. All backends return a
+    SentenceTransformer, so `encode` works the same way:
+
+    - torch: full-precision PyTorch (the default)
+    - onnx: the model's ONNX export run by ONNX Runtime
+    - onnx-int8: a dynamically int8-quantized ONNX export
+
+    The ONNX backends need sentence-transformers>=3.2 with its onnx extra.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from {', '.join(BACKENDS)}.")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    try:
+        if backend == "onnx":
+            return SentenceTransformer(model_name, backend="onnx")
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": int8_onnx_file()})
+    except TypeError as e:
+        raise ImportError(
+            f"The '{backend}' backend requires sentence-transformers>=3.2 "
+            "(pip install 'sentence-transformers[onnx]')"
+        ) from e
+
+
+def get_encoder(model_name: str, backend: str = "torch") -> Tuple[Any, float]:
+    """
+    The process-wide instance of `model_name` on `backend`, loaded on first
+    use and shared by every store (and so every namespace). Returns the
+    model and the seconds its load took.
+    """
+    key = (model_name, backend)
+    with _encoders_lock:
+        if key not in _encoders:
+            start = time.perf_counter()
+            model = load_encoder(model_name, backend)
+            _encoders[key] = (model, time.perf_counter() - start)
+            logger.info(f"Loaded embedding model '{model_name}' ({backend} backend) in {_encoders[key][1]:.2f}s")
+        return _encoders[key]
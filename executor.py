@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_WORKER_THREADS = 4
+DEFAULT_MAX_QUEUE_DEPTH = 64
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the store executor already holds the maximum number of pending jobs"""
+
+
+class StoreExecutor:
+    """
+    Dedicated thread pool for encode, search and persist work so that blocking,
+    CPU-bound model inference never runs on the asyncio event loop.
+
+    At most `max_workers + max_queue_depth` jobs may be running or waiting at
+    once; further submissions fail fast with ExecutorBusyError instead of
+    queueing without bound. Model inference releases the GIL, so threads give
+    real parallelism while sharing the in-memory store.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKER_THREADS, max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tools-store")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Jobs currently running or waiting for a worker"""
+        return self._pending
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Submit `fn` to the pool from any thread; raises ExecutorBusyError when full"""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError(
+                f"Server busy: {self.max_workers + self.max_queue_depth} requests already in progress"
+            )
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            # Run in the caller's context so per-request context (e.g. the metrics transport) carries over
+            future = self._pool.submit(contextvars.copy_context().run, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # Free the slot when the job itself finishes, even if the caller stops waiting
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn` on the pool and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _release(self, _future):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[StoreExecutor] = None
+
+
+def configure_executor(max_workers: int = DEFAULT_WORKER_THREADS, max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH):
+    """Replace the shared executor (called by create_app with the server configuration)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = StoreExecutor(max_workers, max_queue_depth)
+    logger.info(f"Store executor: {max_workers} worker threads, queue depth {max_queue_depth}")
+    return _executor
+
+
+def get_executor() -> StoreExecutor:
+    """Return the shared executor, creating one with default limits on first use"""
+    global _executor
+    if _executor is None:
+        _executor = StoreExecutor()
+    return _executor
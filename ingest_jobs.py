@@ -0,0 +1,173 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+# Finished jobs kept for polling; the oldest are forgotten first
+DEFAULT_MAX_FINISHED_JOBS = 100
+
+
+class IngestJob:
+    """
+    One background upload: its tools, progress counters and outcome.
+    Counters are updated by the job thread and read by pollers without a
+    lock; every field is replaced atomically, so a poll sees a consistent
+    enough snapshot.
+    """
+
+    def __init__(
+        self,
+        store,
+        tools: List[Dict[str, Any]],
+        upsert: bool,
+        namespace: Optional[str] = None,
+        on_finish: Optional[Callable[[], None]] = None,
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.store = store
+        self.namespace = namespace
+        # Called once the job is done with the store, e.g. to unpin its namespace
+        self._on_finish = on_finish
+        self.tools: Optional[List[Dict[str, Any]]] = tools
+        self.upsert = upsert
+        self.status = "queued"
+        self.total = len(tools)
+        self.processed = 0
+        self.result: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._start = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def _progress(self, processed: int):
+        self.processed = processed
+
+    def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        status = "failed"
+        try:
+            self.result = self.store.add_tools(self.tools, upsert=self.upsert, progress=self._progress)
+            self.processed = self.total
+            status = "succeeded"
+        except Exception as e:
+            logger.error(f"Ingest job {self.job_id} failed after {self.processed}/{self.total} tools: {e}")
+            self.error = str(e)
+        finally:
+            # The tools are in the store (or rejected) now; don't keep a second copy around
+            self.tools = None
+            # Set before the status: a poll that sees a finished job reads finished_at
+            self.finished_at = time.time()
+            self.status = status
+            if self._on_finish is not None:
+                self._on_finish()
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.finished:
+            elapsed = self.finished_at - self.started_at
+        elif self.started_at is not None:
+            elapsed = time.perf_counter() - self._start
+        else:
+            elapsed = 0.0
+        return {
+            "job_id": self.job_id,
+            "namespace": self.namespace,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "added": self.result.get("added"),
+            "updated": self.result.get("updated"),
+            "unchanged": self.result.get("unchanged"),
+            "seconds": round(elapsed, 3),
+            "tools_per_sec": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "error": self.error,
+            "total_tools": self.store.count,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobManager:
+    """
+    Runs uploads in the background, one job at a time in submission order,
+    on a dedicated thread so the store executor stays free for searches.
+
+    A job encodes all of its tools before committing them in a single
+    write, so searches keep seeing the previous consistent set of tools
+    until the whole job lands.
+    """
+
+    def __init__(self, max_finished: int = DEFAULT_MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[IngestJob]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        store,
+        tools: List[Dict[str, Any]],
+        upsert: bool = False,
+        namespace: Optional[str] = None,
+        on_finish: Optional[Callable[[], None]] = None,
+    ) -> IngestJob:
+        """Queue `tools` to be added to `store`; returns the job right away"""
+        job = IngestJob(store, tools, upsert, namespace, on_finish)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._queue.put(job)
+        logger.info(f"Queued ingest job {job.job_id} with {job.total} tools ({self._queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        """All known jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.run()
+            result = job.to_dict()
+            logger.info(
+                f"Ingest job {job.job_id} {job.status}: {result['processed']}/{job.total} tools "
+                f"in {result['seconds']:.2f}s ({result['tools_per_sec']:.1f} tools/sec)"
+            )
+
+
+_manager: Optional[IngestJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> IngestJobManager:
+    """Return the shared job manager, starting its thread on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = IngestJobManager()
+        return _manager
@@ -0,0 +1,150 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Constant of reciprocal rank fusion: a result at rank r contributes 1 / (RRF_K + r)
+RRF_K = 60
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased terms of `text`. Identifiers are kept whole and also split
+    into their snake_case / camelCase parts, so "convert_currency" matches
+    both the exact tool name and the words "convert" and "currency".
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        whole = word.strip("_").lower()
+        if not whole:
+            continue
+        tokens.append(whole)
+        parts = _PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring over tool texts, keyed by matrix row.
+
+    Posting lists are append-only: removing a document only updates the
+    corpus statistics, and its postings are skipped by searches until the
+    index is remapped (when the store vacuums). So a search can run without
+    locks against the state of an earlier moment by passing that moment's
+    row count, dead-row mask and statistics, while writers keep adding.
+    A search only visits the postings of the query's terms.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._removed: Set[int] = set()
+        # Of the documents that have not been removed
+        self.documents = 0
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return self.documents
+
+    def stats(self) -> Tuple[int, int]:
+        """(documents, total length) to search against later with the corpus as it is now"""
+        return self.documents, self.total_length
+
+    def add(self, row: int, text: str):
+        """Index `text` as the document of `row` (which must not be indexed yet)"""
+        counts = Counter(tokenize(text))
+        for term, count in counts.items():
+            self._postings.setdefault(term, []).append((row, count))
+        length = sum(counts.values())
+        self._lengths[row] = length
+        self.documents += 1
+        self.total_length += length
+
+    def remove(self, row: int):
+        """Skip the document of `row` from now on; its postings stay until `remap`"""
+        length = self._lengths.get(row)
+        if length is None or row in self._removed:
+            return
+        self._removed.add(row)
+        self.documents -= 1
+        self.total_length -= length
+
+    def remap(self, rows: np.ndarray) -> "BM25Index":
+        """A new index with row r renumbered to rows[r], dropping the rows mapped to -1"""
+        index = BM25Index(self.k1, self.b)
+        mapping = rows.tolist()
+        for term, postings in self._postings.items():
+            kept = [
+                (mapping[row], count) for row, count in postings
+                if row < len(mapping) and mapping[row] >= 0 and row not in self._removed
+            ]
+            if kept:
+                index._postings[term] = kept
+        index._lengths = {
+            mapping[row]: length for row, length in self._lengths.items()
+            if row < len(mapping) and mapping[row] >= 0 and row not in self._removed
+        }
+        index.documents = len(index._lengths)
+        index.total_length = sum(index._lengths.values())
+        return index
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[Set[int]] = None,
+        rows: Optional[int] = None,
+        dead: Optional[np.ndarray] = None,
+        stats: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[int], List[float]]:
+        """
+        Rows and BM25 scores of the `k` best matching documents, best first;
+        only `allowed` rows if given. `rows`, `dead` and `stats` describe the
+        corpus to search (rows below `rows` whose `dead` entry is False, as
+        captured with `stats()`); by default every document not removed.
+        """
+        documents, total_length = stats if stats is not None else self.stats()
+        if not documents or k <= 0:
+            return [], []
+        average_length = total_length / documents or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            # Copied in one step, so documents appended meanwhile are simply not seen
+            if rows is None:
+                matches = [(row, count) for row, count in list(postings) if row not in self._removed]
+            else:
+                matches = [(row, count) for row, count in list(postings) if row < rows and (dead is None or not dead[row])]
+            if not matches:
+                continue
+            idf = math.log(1.0 + (documents - len(matches) + 0.5) / (len(matches) + 0.5))
+            for row, count in matches:
+                if allowed is not None and row not in allowed:
+                    continue
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[row] / average_length)
+                scores[row] = scores.get(row, 0.0) + idf * count * (self.k1 + 1.0) / (count + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [row for row, _ in best], [score for _, score in best]
+
+
+def reciprocal_rank_fusion(*rankings: List[int], k: int = RRF_K) -> Dict[int, float]:
+    """Fused score of every item in the given best-first rankings"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
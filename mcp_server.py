@@ -1,19 +1,40 @@
 import asyncio
+import multiprocessing
+import os
 import signal
 import sys
 import threading
 import time
-import uvicorn
 
 from logging_setup import get_logger
-from config import ServerConfig
+from config import ServerConfig, WORKER_CONFIG_ENV
 from api import create_app
+from tools_store import get_store
 from mcp_tools import mcp
 
 
 logger = get_logger(__name__)
 
 
+def serve_http_workers(config: ServerConfig):
+    """
+    Serve HTTP from `config.http_workers` uvicorn worker processes.
+    Each worker builds its own app (server.create_worker_app) over the same
+    storage files; the snapshot matrix is memory-mapped, so the OS shares it.
+    """
+    import uvicorn
+    os.environ[WORKER_CONFIG_ENV] = config.to_json()
+    logger.info(f"Starting {config.http_workers} HTTP workers on {config.host}:{config.port}")
+    uvicorn.run(
+        "server:create_worker_app",
+        factory=True,
+        host=config.host,
+        port=config.port,
+        workers=config.http_workers,
+        log_level="info",
+    )
+
+
 class MCPServer:
     """MCP Server with support for multiple transports."""
     
@@ -21,11 +42,17 @@ class MCPServer:
         self.config = config
         self.http_thread = None
         self.http_server = None
+        self.http_process = None
         self.shutdown_requested = False
+        self.app = None
+        
+        if "stdio" not in config.transports and config.http_workers > 1:
+            # The worker processes build their own apps; this process only supervises them
+            return
         
         # Create the combined app
         try:
-            self.app = create_app(mcp, config.storage_path)
+            self.app = create_app(mcp, config.storage_path, **config.app_options())
             logger.info(f"Created app with storage path: {config.storage_path}")
         except Exception as e:
             logger.error(f"Failed to create app: {e}")
@@ -41,10 +68,28 @@ class MCPServer:
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
+        
+        if self.app is not None and not self.config.shard_urls() and hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.reload_handler)
+    
+    def reload_handler(self, sig, frame):
+        """Hot reload the store from disk on SIGHUP, off the signal handler."""
+        def run():
+            try:
+                get_store().reload()
+            except Exception as e:
+                logger.error(f"Reload on signal {sig} failed, keeping the current tools: {e}")
+        
+        logger.info(f"Received signal {sig}, reloading tools from {self.config.storage_path}...")
+        threading.Thread(target=run, name="tools-store-reload", daemon=True).start()
     
     def run_http_server(self):
         """Run the HTTP server using uvicorn with proper shutdown handling."""
+        if self.config.http_workers > 1:
+            serve_http_workers(self.config)
+            return
         try:
+            import uvicorn
             logger.info(f"Starting HTTP server on {self.config.host}:{self.config.port}")
             
             # Create uvicorn server configuration
@@ -68,11 +113,21 @@ class MCPServer:
     
     def start_http_server_thread(self):
         """Start HTTP server in a background thread."""
+        if self.config.http_workers > 1:
+            # uvicorn's multi-worker supervisor needs a main thread of its own
+            self.http_process = multiprocessing.Process(
+                target=serve_http_workers, args=(self.config,), name="http-workers"
+            )
+            self.http_process.start()
+            logger.info(f"HTTP worker supervisor started (pid {self.http_process.pid})")
+            return
         self.http_thread = threading.Thread(target=self.run_http_server, daemon=True)
         self.http_thread.start()
         
-        # Give the server a moment to start
-        time.sleep(1)
+        # Give the server a moment to start, but do not hold up the stdio handshake once it is listening
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline and not (self.http_server and self.http_server.started):
+            time.sleep(0.01)
         logger.info(f"HTTP server thread started on {self.config.host}:{self.config.port}")
     
     def run_stdio_server(self):
@@ -132,6 +187,11 @@ class MCPServer:
             # Give it a moment to shutdown gracefully
             time.sleep(0.5)
         
+        if self.http_process and self.http_process.is_alive():
+            logger.info("Stopping HTTP worker processes...")
+            self.http_process.terminate()
+            self.http_process.join(timeout=10.0)
+        
         if self.http_thread and self.http_thread.is_alive():
             logger.info("Waiting for HTTP server thread to finish...")
             self.http_thread.join(timeout=5.0)
@@ -1,13 +1,19 @@
+from typing import List, Optional
+
 from fastmcp import FastMCP
-from models import ToolsInput, SearchQuery, DeleteToolsInput, SearchResult, DeleteResult, UploadResult, StatsResult, ClearResult
-from tools_store import get_store
+from models import ToolsInput, SearchQuery, BatchSearchQuery, DeleteToolsInput, SearchResult, BatchSearchResult, DeleteResult, UploadResult, JobStatus, StatsResult, NamespaceInfo, ClearResult
+from executor import get_executor
+from batcher import batched_search, search_many
+from metrics import track_tool
+from ingest_jobs import get_job_manager
+from namespaces import get_namespaces, namespace_store
+from router import get_router
 
 # Create MCP server
 mcp = FastMCP("API Tools")
 
-# Get the default store instance
-store = get_store()
-
+# Tools resolve the store of their namespace (configured by create_app) on each call;
+# without a namespace they use the default store. In router mode they forward to the shards instead.
 
 @mcp.tool
 def echo_message(message: str) -> str:
@@ -15,15 +21,33 @@ def echo_message(message: str) -> str:
     return message
 
 @mcp.tool
-async def search_tool(query: SearchQuery) -> SearchResult:
+@track_tool
+async def search_tool(query: SearchQuery, namespace: Optional[str] = None) -> SearchResult:
         """
         Search for available tools using natural language query.
         Returns top k most similar tools based on cosine similarity.
+        Optional filters restrict the search to tools with matching fields (type, tags, source, namespace).
+        mode "lexical" matches keywords and exact names without the embedding model; "hybrid" fuses both rankings.
+        namespace selects another team's tool catalog (see list_namespaces).
         """
-        if not store.tools:
-            raise ValueError("No tools available. Please upload/add tools first.")
+        router = get_router()
+        if router is not None:
+            results, failed = await router.search(query.query, query.k, query.filters, query.mode, namespace)
+            return SearchResult(
+                query=query.query,
+                k=query.k,
+                total_results=len(results),
+                results=results,
+                failed_shards=failed or None
+            )
         
-        results = store.search(query.query, query.k)
+        async with namespace_store(namespace) as store:
+            if store.shared:
+                await get_executor().run(store.refresh)
+            if not store.count:
+                raise ValueError("No tools available. Please upload/add tools first.")
+            
+            results = await batched_search(store, query.query, query.k, query.filters, query.mode)
         
         return SearchResult(
             query=query.query,
@@ -33,7 +57,40 @@ async def search_tool(query: SearchQuery) -> SearchResult:
         )
 
 @mcp.tool
-async def delete_tools_by_names(delete_input: DeleteToolsInput) -> DeleteResult:
+@track_tool
+async def search_tools_batch(batch: BatchSearchQuery, namespace: Optional[str] = None) -> BatchSearchResult:
+        """
+        Search for tools for several natural language queries at once, e.g. one per step of a plan.
+        The queries are encoded together; returns the top k tools of each query, in order.
+        With dedupe, a tool is only returned for the first query that ranks it.
+        """
+        failed = None
+        router = get_router()
+        if router is not None:
+            per_query, failed = await router.search_many(batch.queries, batch.k, batch.filters, batch.mode, batch.dedupe, namespace)
+        else:
+            async with namespace_store(namespace) as store:
+                if store.shared:
+                    await get_executor().run(store.refresh)
+                if not store.count:
+                    raise ValueError("No tools available. Please upload/add tools first.")
+                
+                per_query = await search_many(store, batch.queries, batch.k, batch.filters, batch.mode, batch.dedupe)
+        
+        return BatchSearchResult(
+            k=batch.k,
+            dedupe=batch.dedupe,
+            total_results=sum(len(results) for results in per_query),
+            results=[
+                SearchResult(query=query, k=batch.k, total_results=len(results), results=results)
+                for query, results in zip(batch.queries, per_query)
+            ],
+            failed_shards=failed or None
+        )
+
+@mcp.tool
+@track_tool
+async def delete_tools_by_names(delete_input: DeleteToolsInput, namespace: Optional[str] = None) -> DeleteResult:
         """
         Delete specific tools by their names.
         Returns information about deleted tools and any tools that were not found.
@@ -41,7 +98,12 @@ async def delete_tools_by_names(delete_input: DeleteToolsInput) -> DeleteResult:
         if not delete_input.tool_names:
             raise ValueError("No tool names provided for deletion.")
         
-        result = store.delete_tools(delete_input.tool_names)
+        router = get_router()
+        if router is not None:
+            return DeleteResult(**await router.delete_tools(delete_input.tool_names, namespace))
+        
+        async with namespace_store(namespace) as store:
+            result = await get_executor().run(store.delete_tools, delete_input.tool_names)
         return DeleteResult(
              deleted_count=result["deleted_count"],
              not_found=result["not_found"],
@@ -49,43 +111,119 @@ async def delete_tools_by_names(delete_input: DeleteToolsInput) -> DeleteResult:
          )
 
 @mcp.tool
-async def upload_tools_json(tools_input: ToolsInput) -> UploadResult:
+@track_tool
+async def upload_tools_json(tools_input: ToolsInput, namespace: Optional[str] = None) -> UploadResult:
         """
         Upload tools in JSON format to the store.
         Returns information about the upload operation.
+        With background=true the upload is queued and a job_id is returned right away; poll it with get_ingest_job.
+        Uploading to a namespace that does not exist yet creates it.
         """
         tools = tools_input.tools
         if not tools:
             raise ValueError("No tools provided")
         
-        initial_count = len(store.tools)
-        store.add_tools(tools)
-        added_count = len(store.tools) - initial_count
+        router = get_router()
+        if router is not None:
+            if tools_input.background:
+                raise ValueError("Background uploads go to the shards directly, not through the router")
+            ingest = await router.add_tools(tools, tools_input.upsert, namespace)
+            return UploadResult(
+                 message=f"Successfully added {ingest['added']} tools",
+                 total_tools=ingest["total_tools"],
+                 added=ingest["added"],
+                 tools_per_sec=round(ingest["tools_per_sec"], 2),
+                 updated=ingest["updated"],
+                 unchanged=ingest["unchanged"]
+             )
+        
+        async with namespace_store(namespace, create=True) as store:
+            if tools_input.background:
+                # The job holds its own pin on the namespace until it finishes
+                manager = get_namespaces()
+                manager.acquire_loaded(namespace)
+                job = get_job_manager().submit(
+                    store, tools, tools_input.upsert,
+                    namespace=manager.resolve(namespace),
+                    on_finish=lambda: manager.release(namespace)
+                )
+                return UploadResult(
+                     message=f"Queued {len(tools)} tools as ingest job {job.job_id}",
+                     total_tools=store.count,
+                     job_id=job.job_id
+                 )
+            
+            ingest = await get_executor().run(store.add_tools, tools, upsert=tools_input.upsert)
+            total_tools = store.count
         
         return UploadResult(
-             message=f"Successfully added {added_count} tools",
-             total_tools=len(store.tools)
+             message=f"Successfully added {ingest['added']} tools",
+             total_tools=total_tools,
+             added=ingest["added"],
+             tools_per_sec=round(ingest["tools_per_sec"], 2),
+             updated=ingest["updated"],
+             unchanged=ingest["unchanged"]
          )
 
 @mcp.tool
-async def get_stats() -> StatsResult:
+@track_tool
+async def get_ingest_job(job_id: str) -> JobStatus:
+        """
+        Get the status of a background upload started with upload_tools_json(background=true).
+        Returns its state, progress, throughput and any error.
+        """
+        job = get_job_manager().get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown ingest job '{job_id}'")
+        return JobStatus(**job.to_dict())
+
+@mcp.tool
+@track_tool
+async def get_stats(namespace: Optional[str] = None) -> StatsResult:
         """
         Get statistics about stored tools.
         Returns information about the current state of the tool store.
         """
-        return StatsResult(
-             total_tools=len(store.tools),
-             storage_path=str(store.storage_path.absolute()),
-             model=store.model_name
-         )
+        router = get_router()
+        if router is not None:
+            return StatsResult(**await router.stats(namespace))
+        
+        async with namespace_store(namespace) as store:
+            return StatsResult(
+                 namespace=get_namespaces().resolve(namespace),
+                 total_tools=store.count,
+                 storage_path=str(store.storage_path.absolute()),
+                 model=store.model_name,
+                 backend=store.backend,
+                 needs_reembed=store.needs_reembed,
+                 cache=store.cache_stats(),
+                 memory=store.memory_stats()
+             )
 
 @mcp.tool
-async def clear_tools() -> ClearResult:
+@track_tool
+async def list_namespaces() -> List[NamespaceInfo]:
+        """
+        List the tool namespaces (one catalog per team or tenant) that tools can be searched in.
+        Returns whether each is loaded, its tool count and embedding memory when loaded.
+        """
+        router = get_router()
+        if router is not None:
+            return [NamespaceInfo(**info) for info in await router.namespaces()]
+        return [NamespaceInfo(**info) for info in get_namespaces().list()]
+
+@mcp.tool
+@track_tool
+async def clear_tools(namespace: Optional[str] = None) -> ClearResult:
         """
         Clear all stored tools from the store.
         Returns confirmation that all tools have been cleared.
         """
-        store.tools = []
-        store.embeddings = None
-        store.save_to_disk()
+        router = get_router()
+        if router is not None:
+            await router.clear_tools(namespace)
+            return ClearResult(message="All tools cleared")
+        
+        async with namespace_store(namespace) as store:
+            await get_executor().run(store.clear_tools)
         return ClearResult(message="All tools cleared")
\ No newline at end of file
@@ -0,0 +1,261 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Transport that started the work being timed: "rest", "mcp", "mixed" for a
+# search batch coalesced from both, or "internal" for background work
+TRANSPORT: ContextVar[str] = ContextVar("transport", default="internal")
+
+# Seconds; from cached lookups (sub-millisecond) to bulk encodes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Gauge(_Metric):
+    """A value per label set, replaced on every `set` (also used for counters read from elsewhere)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def replace(self, samples: Sequence[Tuple[float, Dict[str, Any]]]):
+        """Swap in a whole new set of (value, labels) samples, dropping label sets that are not in it"""
+        values = {self._key(labels): float(value) for value, labels in samples}
+        with self._lock:
+            self._values = values
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "one_mcp_stage_seconds",
+    "Time spent in each stage of search and ingest: encode_query, encode_tools, ann_search, lexical_search, "
+    "similarity, top_k, rescore, persist, snapshot",
+    ("stage", "transport"),
+)
+REQUEST_SECONDS = Histogram(
+    "one_mcp_request_seconds",
+    "End-to-end latency of REST requests and MCP tool calls",
+    ("transport", "endpoint", "status"),
+)
+SHARD_SECONDS = Histogram(
+    "one_mcp_shard_request_seconds",
+    "Latency of router requests to each shard, by HTTP status (or timeout / error)",
+    ("shard", "outcome"),
+)
+TOOLS = Gauge("one_mcp_tools", "Number of tools in each loaded namespace", ("namespace",))
+EMBEDDING_BYTES = Gauge("one_mcp_embedding_bytes", "Bytes held by the embedding rows of each loaded namespace", ("namespace", "precision"))
+EXECUTOR_PENDING = Gauge("one_mcp_executor_pending", "Store executor jobs running or waiting for a worker thread")
+BATCH_QUEUE_DEPTH = Gauge("one_mcp_search_batch_queue_depth", "Searches waiting to be coalesced into a batch")
+INGEST_JOBS = Gauge("one_mcp_ingest_jobs", "Background ingest jobs by status", ("status",))
+CACHE_ENTRIES = Gauge("one_mcp_cache_entries", "Entries held by each cache", ("namespace", "cache"))
+CACHE_HITS = Gauge("one_mcp_cache_hits_total", "Cache hits", ("namespace", "cache"), kind="counter")
+CACHE_MISSES = Gauge("one_mcp_cache_misses_total", "Cache misses", ("namespace", "cache"), kind="counter")
+CACHE_HIT_RATIO = Gauge("one_mcp_cache_hit_ratio", "Share of cache lookups that hit", ("namespace", "cache"))
+NAMESPACES_LOADED = Gauge("one_mcp_namespaces_loaded", "Namespaces loaded in memory besides the default one")
+NAMESPACE_MEMORY_BYTES = Gauge("one_mcp_namespace_memory_bytes", "Embedding bytes held by all loaded namespaces")
+NAMESPACE_EVICTIONS = Gauge("one_mcp_namespace_evictions_total", "Namespaces closed to stay under the memory budget", kind="counter")
+
+REGISTRY: List[_Metric] = [
+    STAGE_SECONDS,
+    REQUEST_SECONDS,
+    SHARD_SECONDS,
+    TOOLS,
+    EMBEDDING_BYTES,
+    EXECUTOR_PENDING,
+    BATCH_QUEUE_DEPTH,
+    INGEST_JOBS,
+    CACHE_ENTRIES,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CACHE_HIT_RATIO,
+    NAMESPACES_LOADED,
+    NAMESPACE_MEMORY_BYTES,
+    NAMESPACE_EVICTIONS,
+]
+
+
+def record_stores(stores: Dict[str, Any]):
+    """
+    Set the tool count, embedding bytes and cache gauges from `stores`
+    (namespace -> ToolsStore). Namespaces missing from it, e.g. evicted ones,
+    drop out of those gauges.
+    """
+    tools, embedding_bytes = [], []
+    caches: Dict[Gauge, List[Tuple[float, Dict[str, Any]]]] = {gauge: [] for gauge in (CACHE_ENTRIES, CACHE_HITS, CACHE_MISSES, CACHE_HIT_RATIO)}
+    for namespace, store in stores.items():
+        tools.append((store.count, {"namespace": namespace}))
+        memory = store.memory_stats()
+        # Multi-vector chunks are kept at full precision
+        embedding_bytes.append((memory["full_precision_bytes"] + memory["chunk_bytes"], {"namespace": namespace, "precision": "float32"}))
+        if memory["encoding"] != "float32":
+            embedding_bytes.append((memory["quantized_bytes"], {"namespace": namespace, "precision": memory["encoding"]}))
+        for cache, stats in store.cache_stats().items():
+            labels = {"namespace": namespace, "cache": cache}
+            caches[CACHE_ENTRIES].append((stats["size"], labels))
+            caches[CACHE_HITS].append((stats["hits"], labels))
+            caches[CACHE_MISSES].append((stats["misses"], labels))
+            caches[CACHE_HIT_RATIO].append((stats["hit_rate"], labels))
+    TOOLS.replace(tools)
+    EMBEDDING_BYTES.replace(embedding_bytes)
+    for gauge, samples in caches.items():
+        gauge.replace(samples)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name` of the current transport"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, transport=TRANSPORT.get())
+
+
+def track_tool(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Record the latency of an async MCP tool and mark the work it starts as MCP traffic"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = TRANSPORT.set("mcp")
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, transport="mcp", endpoint=fn.__name__, status=status)
+            TRANSPORT.reset(token)
+    return wrapper
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording REST request latency by route and status code.
+    The MCP mount is skipped; its tools are timed by `track_tool`.
+    """
+
+    def __init__(self, app, skip_prefixes: Sequence[str] = ("/mcp", "/metrics")):
+        self.app = app
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+        token = TRANSPORT.set("rest")
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, transport="rest", endpoint=endpoint, status=status[0])
+            TRANSPORT.reset(token)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Any, Literal, Optional, Union
 
 
 class ToolsInput(BaseModel):
@@ -7,6 +7,23 @@ class ToolsInput(BaseModel):
         ..., 
         description="Array of OpenAPI compatible tools"
     )
+    upsert: bool = Field(
+        False,
+        description="Replace stored tools that have the same name instead of adding duplicates; unchanged tools are skipped. "
+                    "Off by default, so uploads append as they always have"
+    )
+    background: bool = Field(
+        False,
+        description="Queue the upload as a background job and return its job_id right away; poll the job for progress"
+    )
+
+    @field_validator("tools")
+    @classmethod
+    def names_are_strings(cls, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for i, tool in enumerate(tools):
+            if not isinstance(tool.get("name", ""), str):
+                raise ValueError(f"tools[{i}].name must be a string")
+        return tools
 
 
 class SearchQuery(BaseModel):
@@ -17,6 +34,36 @@ class SearchQuery(BaseModel):
         ge=1, 
         le=100
     )
+    filters: Optional[Dict[str, Union[str, List[str]]]] = Field(
+        None,
+        description="Only search tools whose fields match, e.g. {\"type\": \"function\", \"tags\": [\"billing\", \"payments\"]}. "
+                    "A list matches any of its values; fields are combined with AND. "
+                    "Filterable fields: type, tags, source, namespace (configurable with --filter_fields)"
+    )
+    mode: Literal["semantic", "lexical", "hybrid"] = Field(
+        "semantic",
+        description="semantic: embedding similarity; lexical: BM25 keyword match on names, descriptions and parameters "
+                    "(no model involved); hybrid: both, merged by reciprocal rank fusion"
+    )
+
+
+class BatchSearchQuery(BaseModel):
+    queries: List[str] = Field(
+        ...,
+        description="Natural language queries to search for, e.g. one per step of a plan; encoded together in one batch",
+        min_length=1,
+        max_length=100
+    )
+    k: int = Field(5, description="Number of top matching tools to return per query", ge=1, le=100)
+    filters: Optional[Dict[str, Union[str, List[str]]]] = Field(
+        None,
+        description="Field filters applied to every query, as in SearchQuery"
+    )
+    mode: Literal["semantic", "lexical", "hybrid"] = Field("semantic", description="Search mode of every query, as in SearchQuery")
+    dedupe: bool = Field(
+        False,
+        description="Return each tool only for the first query that ranks it; later queries get their next best tools instead"
+    )
 
 
 class DeleteToolsInput(BaseModel):
@@ -30,7 +77,26 @@ class SearchResult(BaseModel):
     query: str = Field(..., description="The search query that was executed")
     k: int = Field(..., description="Number of results requested")
     total_results: int = Field(..., description="Total number of results returned")
-    results: List[Dict[str, Any]] = Field(..., description="Array of matching tools with similarity scores")
+    results: List[Dict[str, Any]] = Field(
+        ...,
+        description="Array of matching tools with their scores: similarity_score (semantic), bm25_score (lexical), "
+                    "or all three including fused_score (hybrid)"
+    )
+    failed_shards: Optional[List[str]] = Field(
+        None,
+        description="In router mode, shards that failed or timed out; the results come from the other shards"
+    )
+
+
+class BatchSearchResult(BaseModel):
+    k: int = Field(..., description="Number of results requested per query")
+    dedupe: bool = Field(..., description="Whether tools were de-duplicated across queries")
+    total_results: int = Field(..., description="Total number of results returned over all queries")
+    results: List[SearchResult] = Field(..., description="Results of each query, in the order the queries were given")
+    failed_shards: Optional[List[str]] = Field(
+        None,
+        description="In router mode, shards that failed or timed out; the results come from the other shards"
+    )
 
 
 class DeleteResult(BaseModel):
@@ -42,12 +108,58 @@ class DeleteResult(BaseModel):
 class UploadResult(BaseModel):
     message: str = Field(..., description="Success message describing the upload")
     total_tools: int = Field(..., description="Total number of tools in the store after upload")
+    added: Optional[int] = Field(None, description="Number of new tools")
+    tools_per_sec: Optional[float] = Field(None, description="Ingest throughput of the upload in tools per second")
+    updated: Optional[int] = Field(None, description="Number of existing tools replaced by name")
+    unchanged: Optional[int] = Field(None, description="Number of tools skipped because their content was unchanged")
+    job_id: Optional[str] = Field(None, description="ID of the background ingest job, when the upload was queued")
+
+
+class JobStatus(BaseModel):
+    job_id: str = Field(..., description="ID of the ingest job")
+    namespace: Optional[str] = Field(None, description="Namespace the tools are added to")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="Current state of the job")
+    total: int = Field(..., description="Number of tools submitted with the job")
+    processed: int = Field(..., description="Number of submitted tools encoded (or skipped as unchanged) so far")
+    added: Optional[int] = Field(None, description="Number of new tools, once the job succeeded")
+    updated: Optional[int] = Field(None, description="Number of existing tools replaced by name, once the job succeeded")
+    unchanged: Optional[int] = Field(None, description="Number of tools skipped because their content was unchanged, once the job succeeded")
+    seconds: float = Field(..., description="Time the job has been running (or ran)")
+    tools_per_sec: float = Field(..., description="Ingest throughput of the job so far in tools per second")
+    error: Optional[str] = Field(None, description="Why the job failed")
+    total_tools: int = Field(..., description="Total number of tools in the store now")
+    created_at: float = Field(..., description="Unix time the job was queued")
+    started_at: Optional[float] = Field(None, description="Unix time the job started running")
+    finished_at: Optional[float] = Field(None, description="Unix time the job finished")
 
 
 class StatsResult(BaseModel):
+    namespace: Optional[str] = Field(None, description="Namespace the statistics are for")
     total_tools: int = Field(..., description="Total number of tools in the store")
-    storage_path: str = Field(..., description="Absolute path to the storage file")
+    storage_path: str = Field(..., description="Absolute path to the storage file (the shard URLs in router mode)")
     model: str = Field(..., description="Name of the embedding model being used")
+    backend: Optional[str] = Field(None, description="Inference backend of the embedding model (torch, onnx or onnx-int8)")
+    needs_reembed: Optional[bool] = Field(None, description="Whether stored embeddings are incompatible with the active backend or serialization settings and should be re-encoded")
+    cache: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Hit/miss counters of the query embedding, search result and tool embedding caches")
+    memory: Optional[Dict[str, Any]] = Field(None, description="Embedding encoding and the bytes held by the full-precision and quantized rows and by multi-vector chunks")
+    shards: Optional[List[Dict[str, Any]]] = Field(None, description="In router mode, the tool count and memory of each shard")
+
+
+class ReloadResult(BaseModel):
+    message: str = Field(..., description="Confirmation message that the store was reloaded")
+    total_tools: int = Field(..., description="Total number of tools in the store after the reload")
+    previous_tools: int = Field(..., description="Number of tools in the store before the reload")
+    generation: int = Field(..., description="Snapshot generation that was loaded")
+    version: int = Field(..., description="Store version after the reload; cached search results of older versions are not served")
+    seconds: float = Field(..., description="Time the reload took")
+
+
+class NamespaceInfo(BaseModel):
+    namespace: str = Field(..., description="Name of the namespace; \"default\" is the store at --storage_path")
+    loaded: bool = Field(..., description="Whether the namespace is in memory; others are loaded on their next request")
+    total_tools: Optional[int] = Field(None, description="Number of tools in the namespace, when loaded")
+    memory_bytes: Optional[int] = Field(None, description="Bytes held by the namespace's embedding rows, when loaded")
+    in_use: int = Field(..., description="Requests and ingest jobs currently using the namespace")
 
 
 class ClearResult(BaseModel):
@@ -0,0 +1,269 @@
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from logging_setup import get_logger
+from batcher import discard_batcher
+from executor import get_executor
+from tools_store import ToolsStore, get_store
+
+logger = get_logger(__name__)
+
+# The store at --storage_path; always loaded and never evicted
+DEFAULT_NAMESPACE = "default"
+DEFAULT_NAMESPACE_DIR = "namespaces"
+# 0 keeps every namespace loaded once used
+DEFAULT_NAMESPACE_MEMORY_MB = 0
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+NAMESPACE_STORE_FILE = "tool_embeddings.json"
+
+
+class InvalidNamespaceError(ValueError):
+    pass
+
+
+class UnknownNamespaceError(LookupError):
+    pass
+
+
+class NamespaceManager:
+    """
+    One ToolsStore per namespace (e.g. per team's catalog) in a single process.
+
+    Namespace `name` keeps its files in `<root>/<name>/` and is loaded on
+    first use; the default namespace is the store at --storage_path. All
+    stores share one embedding model (see encoders.get_encoder), so a loaded
+    namespace costs its embedding rows and tool definitions, not a model.
+
+    Requests and ingest jobs pin the store they use. When the embedding bytes
+    of all loaded stores exceed `memory_budget_bytes`, the least recently
+    used unpinned namespaces are closed until the rest fit; their files stay
+    on disk and the next request loads them again.
+    """
+
+    def __init__(self, root: str = DEFAULT_NAMESPACE_DIR, memory_budget_mb: float = DEFAULT_NAMESPACE_MEMORY_MB, **store_options):
+        self.root = Path(root)
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.store_options = store_options
+        self._lock = threading.Lock()
+        # Loaded namespaces, least recently used first
+        self._stores: "OrderedDict[str, ToolsStore]" = OrderedDict()
+        # Requests and jobs currently using each namespace
+        self._pins: Dict[str, int] = {}
+        # Held while a namespace is loaded, so concurrent first requests load it once
+        self._namespace_locks: Dict[str, threading.Lock] = {}
+        # Evicted namespaces still being closed; loading one again waits for it
+        self._closing: Dict[str, threading.Thread] = {}
+        self.evictions = 0
+
+    @staticmethod
+    def resolve(namespace: Optional[str]) -> str:
+        """Canonical name of `namespace`; None and "" mean the default namespace"""
+        if not namespace:
+            return DEFAULT_NAMESPACE
+        if not NAMESPACE_PATTERN.match(namespace):
+            raise InvalidNamespaceError(
+                f"Invalid namespace '{namespace}': use up to 64 letters, digits, '.', '_' or '-', "
+                "starting with a letter or digit"
+            )
+        return namespace
+
+    def _path(self, name: str) -> Path:
+        return self.root / name / NAMESPACE_STORE_FILE
+
+    def acquire_loaded(self, namespace: Optional[str]) -> Optional[ToolsStore]:
+        """Pin and return the store of `namespace` if it needs no loading, else None"""
+        name = self.resolve(namespace)
+        if name == DEFAULT_NAMESPACE:
+            return get_store()
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                return None
+            self._pins[name] = self._pins.get(name, 0) + 1
+            self._stores.move_to_end(name)
+            return store
+
+    def acquire(self, namespace: Optional[str], create: bool = False) -> ToolsStore:
+        """
+        Pin and return the store of `namespace`, loading it if needed; release()
+        it when done. Unless `create`, a namespace without files raises
+        UnknownNamespaceError instead of being created.
+        """
+        while True:
+            store = self.acquire_loaded(namespace)
+            if store is not None:
+                self._evict()
+                return store
+            self.load(namespace, create)
+
+    def load(self, namespace: Optional[str], create: bool = False):
+        """Load `namespace` if it is not loaded yet, without pinning it"""
+        name = self.resolve(namespace)
+        if name == DEFAULT_NAMESPACE:
+            return
+        with self._lock:
+            if name in self._stores:
+                return
+            namespace_lock = self._namespace_locks.setdefault(name, threading.Lock())
+            closing = self._closing.get(name)
+        if closing is not None:
+            # Never open the files while the evicted instance may still be compacting into them
+            closing.join()
+        with namespace_lock:
+            with self._lock:
+                if name in self._stores:
+                    return
+            store = self._load(name, create)
+            with self._lock:
+                self._stores[name] = store
+
+    def _load(self, name: str, create: bool) -> ToolsStore:
+        path = self._path(name)
+        if not path.exists() and not any(path.parent.glob(f"{path.stem}.*.wal")):
+            if not create:
+                raise UnknownNamespaceError(f"Unknown namespace '{name}'; upload tools to it to create it")
+            path.parent.mkdir(parents=True, exist_ok=True)
+        store = ToolsStore(str(path), **self.store_options)
+        logger.info(f"Loaded namespace '{name}' with {store.count} tools in {store.load_seconds:.2f}s")
+        return store
+
+    def release(self, namespace: Optional[str]):
+        """Unpin a store taken with acquire(); it becomes evictable once no one uses it"""
+        name = self.resolve(namespace)
+        if name == DEFAULT_NAMESPACE:
+            return
+        with self._lock:
+            pins = self._pins.get(name, 0) - 1
+            if pins > 0:
+                self._pins[name] = pins
+            else:
+                self._pins.pop(name, None)
+        # Uploads may have grown the namespace past the budget
+        self._evict()
+
+    @staticmethod
+    def _memory_bytes(store: ToolsStore) -> int:
+        memory = store.memory_stats()
+        return memory["full_precision_bytes"] + memory["quantized_bytes"] + memory["chunk_bytes"]
+
+    def memory_bytes(self) -> int:
+        """Embedding bytes held by the default store and every loaded namespace"""
+        with self._lock:
+            stores = list(self._stores.values())
+        return sum(self._memory_bytes(store) for store in [get_store(), *stores])
+
+    def _evict(self):
+        if self.memory_budget_bytes <= 0:
+            return
+        evicted = []
+        with self._lock:
+            usage = {name: self._memory_bytes(store) for name, store in self._stores.items()}
+            total = self._memory_bytes(get_store()) + sum(usage.values())
+            for name in list(self._stores):
+                if total <= self.memory_budget_bytes:
+                    break
+                if self._pins.get(name):
+                    continue
+                store = self._stores.pop(name)
+                # Closing waits for a running compaction, so it happens off the request path
+                thread = threading.Thread(target=self._close, args=(name, store), name="namespace-evict", daemon=True)
+                self._closing[name] = thread
+                # Started before the lock is released, so a load can always join it
+                thread.start()
+                evicted.append((name, usage[name]))
+                total -= usage[name]
+                self.evictions += 1
+        for name, size in evicted:
+            logger.info(
+                f"Evicted namespace '{name}' ({size / 1e6:.1f} MB) to stay under the "
+                f"{self.memory_budget_bytes / 1e6:.1f} MB memory budget"
+            )
+
+    def _close(self, name: str, store: ToolsStore):
+        discard_batcher(store)
+        try:
+            store.close()
+        except Exception as e:
+            logger.error(f"Closing namespace '{name}' failed: {e}")
+        finally:
+            with self._lock:
+                if self._closing.get(name) is threading.current_thread():
+                    del self._closing[name]
+
+    def loaded_stores(self) -> Dict[str, ToolsStore]:
+        """The default store and every loaded namespace's store, by namespace"""
+        with self._lock:
+            stores = dict(self._stores)
+        return {DEFAULT_NAMESPACE: get_store(), **stores}
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Every namespace on disk or loaded, with its size when loaded"""
+        names = {DEFAULT_NAMESPACE}
+        if self.root.is_dir():
+            names.update(
+                path.name for path in self.root.iterdir()
+                if path.is_dir() and NAMESPACE_PATTERN.match(path.name) and any(path.glob(f"{Path(NAMESPACE_STORE_FILE).stem}*"))
+            )
+        with self._lock:
+            loaded = dict(self._stores)
+            pins = dict(self._pins)
+            names.update(loaded)
+        loaded[DEFAULT_NAMESPACE] = get_store()
+        namespaces = []
+        for name in sorted(names):
+            store = loaded.get(name)
+            namespaces.append({
+                "namespace": name,
+                "loaded": store is not None,
+                "total_tools": store.count if store is not None else None,
+                "memory_bytes": self._memory_bytes(store) if store is not None else None,
+                "in_use": pins.get(name, 0),
+            })
+        return namespaces
+
+    @property
+    def loaded_count(self) -> int:
+        """Namespaces loaded besides the default one"""
+        with self._lock:
+            return len(self._stores)
+
+
+_manager: Optional[NamespaceManager] = None
+_manager_lock = threading.Lock()
+
+
+def configure_namespaces(root: str = DEFAULT_NAMESPACE_DIR, memory_budget_mb: float = DEFAULT_NAMESPACE_MEMORY_MB, **store_options):
+    """Set where namespaces live, their memory budget and the ToolsStore options they are loaded with"""
+    global _manager
+    with _manager_lock:
+        _manager = NamespaceManager(root, memory_budget_mb, **store_options)
+    budget = f"{memory_budget_mb} MB" if memory_budget_mb > 0 else "unlimited"
+    logger.info(f"Namespaces under {Path(root).absolute()}, memory budget {budget}")
+
+
+def get_namespaces() -> NamespaceManager:
+    """Return the shared namespace manager, creating one with the defaults on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = NamespaceManager()
+        return _manager
+
+
+@asynccontextmanager
+async def namespace_store(namespace: Optional[str], create: bool = False) -> AsyncIterator[ToolsStore]:
+    """Use the store of `namespace` for the duration of the block; cold namespaces load on the store executor"""
+    manager = get_namespaces()
+    store = manager.acquire_loaded(namespace)
+    while store is None:
+        # Only pinned here, on the caller's side, so a cancelled request cannot leak a pin
+        await get_executor().run(manager.load, namespace, create)
+        store = manager.acquire_loaded(namespace)
+    try:
+        yield store
+    finally:
+        manager.release(namespace)
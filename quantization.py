@@ -0,0 +1,81 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from similarity import normalize_rows
+
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+# Rows converted to float32 at a time while scoring or quantizing; small enough to stay in CPU cache
+BLOCK_ROWS = 2048
+
+
+class Quantizer:
+    """
+    Compact search copy of the embedding matrix.
+
+    Rows are optionally truncated to their first `dim` dimensions
+    (Matryoshka-style; the truncated vector is re-normalized) and stored as
+    float16 or as int8 with one float32 scale per row. Scoring against this
+    copy is a first pass only: the best candidates are rescored against the
+    full-precision rows, so most of those never have to be paged in.
+    """
+
+    def __init__(self, dtype: str = "float32", dim: int = 0):
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype '{dtype}'. Choose from {', '.join(EMBEDDING_DTYPES)}.")
+        if dim < 0:
+            raise ValueError("Embedding dim must be 0 (all dimensions) or positive")
+        self.dtype = dtype
+        self.dim = dim
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is anything to store besides the full-precision matrix"""
+        return self.dtype != "float32" or self.dim > 0
+
+    @property
+    def name(self) -> str:
+        """Identifies the encoding in file names and snapshot metadata, e.g. `int8` or `float16-128`"""
+        return self.dtype if not self.dim else f"{self.dtype}-{self.dim}"
+
+    def truncate(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalized vectors (queries or rows) truncated to the stored dimensions"""
+        if not self.dim or self.dim >= vectors.shape[1]:
+            return np.asarray(vectors, dtype=np.float32)
+        return normalize_rows(vectors[:, :self.dim])
+
+    def allocate(self, rows: int, dim: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Uninitialized (codes, scales) buffers for `rows` embeddings of `dim` dimensions"""
+        if self.dim:
+            dim = min(self.dim, dim)
+        codes = np.empty((rows, dim), dtype=np.dtype(self.dtype))
+        scales = np.empty(rows, dtype=np.float32) if self.dtype == "int8" else None
+        return codes, scales
+
+    def encode(self, embeddings: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Quantize normalized rows; returns (codes, per-row scales or None)"""
+        rows = len(embeddings)
+        codes, scales = self.allocate(rows, embeddings.shape[1])
+        for start in range(0, rows, BLOCK_ROWS):
+            block = self.truncate(np.asarray(embeddings[start:start + BLOCK_ROWS], dtype=np.float32))
+            if scales is None:
+                codes[start:start + len(block)] = block
+                continue
+            # Symmetric per-row scaling onto [-127, 127]
+            block_scales = np.abs(block).max(axis=1) / 127.0
+            block_scales[block_scales == 0] = 1.0
+            codes[start:start + len(block)] = np.rint(block / block_scales[:, None])
+            scales[start:start + len(block)] = block_scales
+        return codes, scales
+
+    @staticmethod
+    def scores(queries: np.ndarray, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """Approximate cosine scores of truncated `queries` against quantized rows, one block at a time"""
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = np.asarray(codes[start:start + BLOCK_ROWS], dtype=np.float32)
+            block_scores = queries @ block.T
+            if scales is not None:
+                block_scores *= scales[start:start + BLOCK_ROWS]
+            scores[:, start:start + len(block)] = block_scores
+        return scores
@@ -0,0 +1,364 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+import metrics
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SHARD_TIMEOUT = 5.0
+# Keep-alive connections per shard, per event loop
+DEFAULT_SHARD_CONNECTIONS = 32
+# Largest k the shards' search models accept
+SHARD_MAX_K = 100
+# Score a merged result is ranked by, in order of preference
+SCORE_KEYS = ("fused_score", "similarity_score", "bm25_score")
+
+
+class ShardError(Exception):
+    """
+    A request the shards could not answer; `status_code` is what the router
+    responds with and `failed_shards` the URLs of the shards that failed, if
+    that is why
+    """
+
+    def __init__(self, message: str, status_code: int = 502, failed_shards: Optional[List[str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.failed_shards = failed_shards
+
+
+def _score(result: Dict[str, Any]) -> float:
+    for key in SCORE_KEYS:
+        if key in result:
+            return result[key]
+    return 0.0
+
+
+def _routing_key(tool: Dict[str, Any]) -> str:
+    # Unnamed tools cannot be upserted or deleted by name, so their content only spreads them out
+    return tool.get("name") or json.dumps(tool, sort_keys=True)
+
+
+def merge_results(per_shard: List[List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """
+    Top `k` of the shards' result lists by score. Cosine similarities are
+    comparable across shards; BM25 and fused scores depend on each shard's
+    corpus statistics, so lexical and hybrid merges are approximate.
+    """
+    merged = sorted((result for results in per_shard for result in results), key=_score, reverse=True)
+    seen = set()
+    top = []
+    for result in merged:
+        name = result["tool"].get("name")
+        if name is not None:
+            if name in seen:
+                continue
+            seen.add(name)
+        top.append(result)
+        if len(top) == k:
+            break
+    return top
+
+
+class ShardRouter:
+    """
+    Scatter-gather front for several one-mcp instances (shards), each holding
+    part of the catalog.
+
+    Searches go to every shard concurrently, each with its own deadline, and
+    their top-k lists are merged by score; a shard that fails or times out is
+    left out and reported in `failed_shards`. Uploads and deletes go only to
+    the shard that owns each tool, chosen by rendezvous hashing of the tool
+    name, so a shard appended to the list takes over only its share of tools.
+
+    Connections are pooled and kept alive per event loop: HTTP and stdio MCP
+    run on different loops in dual transport mode, and an httpx client cannot
+    be shared between loops.
+    """
+
+    def __init__(self, shards: List[str], timeout: float = DEFAULT_SHARD_TIMEOUT, max_connections: int = DEFAULT_SHARD_CONNECTIONS):
+        if not shards:
+            raise ValueError("At least one shard URL is required")
+        self.shards = [url.rstrip("/") for url in shards]
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                connections = self.max_connections * len(self.shards)
+                client = self._clients[loop] = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+                    timeout=httpx.Timeout(self.timeout),
+                )
+        return client
+
+    def shard_for(self, tool: Dict[str, Any]) -> int:
+        """Index of the shard that owns `tool`"""
+        key = _routing_key(tool)
+        return max(
+            range(len(self.shards)),
+            key=lambda i: hashlib.blake2b(f"{i}:{key}".encode(), digest_size=8).digest(),
+        )
+
+    async def _call(
+        self,
+        shard: int,
+        method: str,
+        path: str,
+        namespace: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+        write: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        JSON response of one shard, or None if the shard has no such namespace.
+        Reads must answer within the shard timeout; writes only need to connect
+        in time, since a write cut off halfway would leave its outcome unknown.
+        """
+        url = self.shards[shard]
+        params = {"namespace": namespace} if namespace else None
+        timeout = httpx.Timeout(self.timeout, read=None) if write else httpx.Timeout(self.timeout)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            request = self._client().request(method, url + path, params=params, json=payload, timeout=timeout)
+            response = await (request if write else asyncio.wait_for(request, self.timeout))
+            outcome = str(response.status_code)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            outcome = "timeout"
+            raise ShardError(f"Shard {url} did not answer within {self.timeout}s", 504)
+        except httpx.HTTPError as e:
+            raise ShardError(f"Shard {url} is unreachable: {e}")
+        finally:
+            metrics.SHARD_SECONDS.observe(time.perf_counter() - start, shard=url, outcome=outcome)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"detail": response.text[:200]}
+        detail = body.get("detail", body) if isinstance(body, dict) else body
+        if response.status_code == 404 and str(detail).startswith("Unknown namespace"):
+            # Namespaces only exist on the shards their tools were routed to
+            return None
+        if 400 <= response.status_code < 500 and response.status_code != 404:
+            # The request itself is invalid (e.g. an unknown filter field); every shard would say the same
+            raise ShardError(str(detail), response.status_code)
+        if response.status_code >= 300:
+            raise ShardError(f"Shard {url} answered {response.status_code}: {detail}")
+        return body
+
+    async def _scatter(
+        self,
+        method: str,
+        path: str,
+        namespace: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[str]]:
+        """(shard URL, answer) of every shard that has the namespace, and the URLs of the shards that failed"""
+        responses = await asyncio.gather(
+            *(self._call(i, method, path, namespace, payload) for i in range(len(self.shards))),
+            return_exceptions=True,
+        )
+        answers = []
+        failed = []
+        for url, response in zip(self.shards, responses):
+            if isinstance(response, ShardError):
+                if 400 <= response.status_code < 500:
+                    raise response
+                logger.warning(f"Leaving out shard {url}: {response}")
+                failed.append(url)
+            elif isinstance(response, BaseException):
+                raise response
+            elif response is not None:
+                answers.append((url, response))
+        if len(failed) == len(self.shards):
+            raise ShardError(f"No shard answered {method} {path}")
+        if not answers and not failed:
+            raise ShardError(f"Unknown namespace '{namespace}'", 404)
+        return answers, failed
+
+    async def _write(self, requests: Dict[int, Tuple[str, str, Dict[str, Any]]], namespace: Optional[str]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Send one write per shard and return their answers; fails if any shard fails"""
+        shards = list(requests)
+        responses = await asyncio.gather(
+            *(self._call(i, method, path, namespace, payload, write=True) for i, (method, path, payload) in requests.items()),
+            return_exceptions=True,
+        )
+        errors = []
+        for i, response in zip(shards, responses):
+            if isinstance(response, ShardError) and 400 <= response.status_code < 500:
+                raise response
+            if isinstance(response, ShardError):
+                errors.append(str(response))
+            elif isinstance(response, BaseException):
+                raise response
+        if errors:
+            message = "; ".join(errors)
+            if len(errors) < len(shards):
+                # Writes are not atomic across shards
+                message += f" ({len(shards) - len(errors)} other shards applied their part)"
+            raise ShardError(message)
+        return dict(zip(shards, responses))
+
+    async def count(self, namespace: Optional[str] = None) -> int:
+        """Tools over all shards that answer"""
+        responses = await asyncio.gather(
+            *(self._call(i, "GET", "/api/status", namespace) for i in range(len(self.shards))),
+            return_exceptions=True,
+        )
+        return sum(response["total_tools"] for response in responses if isinstance(response, dict))
+
+    async def search(
+        self,
+        query: str,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: str = "semantic",
+        namespace: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Global top `k` of `query` over all shards, and the shards left out"""
+        payload = {"query": query, "k": k, "filters": filters, "mode": mode}
+        answers, failed = await self._scatter("POST", "/api/tools/search", namespace, payload)
+        return merge_results([answer["results"] for _, answer in answers], k), failed
+
+    async def search_many(
+        self,
+        queries: List[str],
+        k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: str = "semantic",
+        dedupe: bool = False,
+        namespace: Optional[str] = None,
+    ) -> Tuple[List[List[Dict[str, Any]]], List[str]]:
+        """Global top `k` of each query over all shards, and the shards left out"""
+        # De-duplicated across shards here, so each shard returns enough for later queries to fill k slots
+        depth = min(k * len(queries), SHARD_MAX_K) if dedupe else k
+        payload = {"queries": queries, "k": depth, "filters": filters, "mode": mode, "dedupe": False}
+        answers, failed = await self._scatter("POST", "/api/tools/search-batch", namespace, payload)
+        per_query = [
+            merge_results([answer["results"][i]["results"] for _, answer in answers], depth)
+            for i in range(len(queries))
+        ]
+        if not dedupe:
+            return per_query, failed
+        seen = set()
+        unique = []
+        for results in per_query:
+            kept = []
+            for result in results:
+                name = result["tool"].get("name")
+                if name is not None and name in seen:
+                    continue
+                seen.add(name)
+                kept.append(result)
+                if len(kept) == k:
+                    break
+            unique.append(kept)
+        return unique, failed
+
+    async def add_tools(self, tools: List[Dict[str, Any]], upsert: bool = False, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Add each tool on the shard that owns it"""
+        start = time.perf_counter()
+        by_shard: Dict[int, List[Dict[str, Any]]] = {}
+        for tool in tools:
+            by_shard.setdefault(self.shard_for(tool), []).append(tool)
+        answers = await self._write(
+            {i: ("POST", "/api/tools/upload-json", {"tools": shard_tools, "upsert": upsert}) for i, shard_tools in by_shard.items()},
+            namespace,
+        )
+        totals = {"added": 0, "updated": 0, "unchanged": 0}
+        for answer in answers.values():
+            for key in totals:
+                totals[key] += answer.get(key) or 0
+        elapsed = time.perf_counter() - start
+        return {
+            **totals,
+            "total_tools": await self.count(namespace),
+            "seconds": elapsed,
+            "tools_per_sec": len(tools) / elapsed if elapsed > 0 else float(len(tools)),
+        }
+
+    async def delete_tools(self, tool_names: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Delete each tool on the shard that owns it"""
+        by_shard: Dict[int, List[str]] = {}
+        for name in tool_names:
+            by_shard.setdefault(self.shard_for({"name": name}), []).append(name)
+        answers = await self._write(
+            {i: ("DELETE", "/api/tools/delete", {"tool_names": names}) for i, names in by_shard.items()},
+            namespace,
+        )
+        deleted = 0
+        not_found: List[str] = []
+        for i, answer in answers.items():
+            if answer is None:
+                not_found.extend(by_shard[i])
+            else:
+                deleted += answer["deleted_count"]
+                not_found.extend(answer["not_found"])
+        return {"deleted_count": deleted, "not_found": not_found, "remaining_tools": await self.count(namespace)}
+
+    async def clear_tools(self, namespace: Optional[str] = None):
+        """Clear the namespace on every shard"""
+        await self._write({i: ("DELETE", "/api/tools/clear", None) for i in range(len(self.shards))}, namespace)
+
+    async def stats(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Tool counts of every shard and their total"""
+        answers, failed = await self._scatter("GET", "/api/tools/stats", namespace)
+        if not answers:
+            # The shards that answered do not have the namespace; the others might
+            raise ShardError(f"Namespace '{namespace}' is on none of the shards that answered", 502, failed)
+        first = answers[0][1]
+        return {
+            "namespace": first.get("namespace"),
+            "total_tools": sum(answer["total_tools"] for _, answer in answers),
+            "storage_path": ", ".join(self.shards),
+            "model": first["model"],
+            "backend": first.get("backend"),
+            "shards": [
+                *({"url": url, "total_tools": answer["total_tools"], "memory": answer.get("memory")} for url, answer in answers),
+                *({"url": url, "error": "did not answer"} for url in failed),
+            ],
+        }
+
+    async def namespaces(self) -> List[Dict[str, Any]]:
+        """Namespaces of all shards, with their sizes summed"""
+        answers, _ = await self._scatter("GET", "/api/namespaces")
+        merged: Dict[str, Dict[str, Any]] = {}
+        for _, infos in answers:
+            for info in infos:
+                entry = merged.setdefault(info["namespace"], {
+                    "namespace": info["namespace"], "loaded": False, "total_tools": None, "memory_bytes": None, "in_use": 0,
+                })
+                entry["loaded"] = entry["loaded"] or info["loaded"]
+                entry["in_use"] += info["in_use"]
+                for key in ("total_tools", "memory_bytes"):
+                    if info[key] is not None:
+                        entry[key] = (entry[key] or 0) + info[key]
+        return [merged[name] for name in sorted(merged)]
+
+
+_router: Optional[ShardRouter] = None
+
+
+def configure_router(shards: List[str], timeout: float = DEFAULT_SHARD_TIMEOUT) -> ShardRouter:
+    """Serve in router mode, forwarding to `shards`"""
+    global _router
+    _router = ShardRouter(shards, timeout)
+    logger.info(f"Routing to {len(_router.shards)} shards: {', '.join(_router.shards)} (timeout {timeout}s)")
+    return _router
+
+
+def get_router() -> Optional[ShardRouter]:
+    """The shard router in router mode, None when this instance serves its own store"""
+    return _router
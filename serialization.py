@@ -0,0 +1,196 @@
+import json
+import re
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# Name, description, then every other field as JSON (the original format)
+DEFAULT_TEMPLATE = ("name", "description", "*")
+# Name, description and the parameters flattened to one short line each; nested schemas never reach the model
+COMPACT_TEMPLATE = ("name", "description", "parameters")
+TEMPLATES = {"default": DEFAULT_TEMPLATE, "compact": COMPACT_TEMPLATE}
+# Template field standing for all fields the template does not name
+REMAINING_FIELDS = "*"
+# Where tool formats keep their JSON schema; the `parameters` template field renders the first one present
+PARAMETER_FIELDS = ("parameters", "input_schema", "inputSchema")
+# Chunk size in multi-vector mode without --max_tool_tokens; all-MiniLM-L6-v2 reads at most 256 word pieces
+DEFAULT_CHUNK_TOKENS = 200
+MAX_CHUNKS_PER_TOOL = 16
+# Nested object and array schemas are flattened this many levels deep
+MAX_SCHEMA_DEPTH = 4
+# Words and punctuation marks; a little below the word-piece count of English text
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate model tokens in `text`, without loading a tokenizer"""
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut after its first `max_tokens` tokens; 0 keeps it whole"""
+    if max_tokens <= 0:
+        return text
+    for i, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def _label(field: str) -> str:
+    return field.replace("_", " ").capitalize()
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, list) and all(not isinstance(item, (dict, list)) for item in value):
+        return ", ".join(str(item) for item in value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def flatten_parameters(schema: Any) -> List[Tuple[str, str, List[str]]]:
+    """
+    One (name, line, enum values) triple per parameter of a JSON schema, e.g.
+    ("unit", "unit (string, required): Temperature unit. One of: celsius, fahrenheit",
+    ["celsius", "fahrenheit"]). Nested object properties and array items get
+    dotted names (`address.city`, `tags[]`).
+    """
+    parameters: List[Tuple[str, str, List[str]]] = []
+
+    def visit(properties: Dict[str, Any], required: Sequence[str], prefix: str, depth: int):
+        for name, prop in properties.items():
+            path = f"{prefix}{name}"
+            if not isinstance(prop, dict):
+                parameters.append((path, f"{path}: {_render_value(prop)}", []))
+                continue
+            kind = prop.get("type")
+            details = [", ".join(map(str, kind)) if isinstance(kind, list) else str(kind)] if kind else []
+            if name in required:
+                details.append("required")
+            line = f"{path} ({', '.join(details)})" if details else path
+            description = str(prop.get("description") or "").strip()
+            if description:
+                line += f": {description}"
+            enum = [str(value) for value in prop.get("enum") or [] if not isinstance(value, (dict, list))]
+            if enum:
+                separator = ":" if not description else "" if description[-1] in ".!?" else "."
+                line += f"{separator} One of: {', '.join(enum)}"
+            parameters.append((path, line, enum))
+            if depth >= MAX_SCHEMA_DEPTH:
+                continue
+            if isinstance(prop.get("properties"), dict):
+                visit(prop["properties"], prop.get("required") or (), f"{path}.", depth + 1)
+            items = prop.get("items")
+            if isinstance(items, dict) and isinstance(items.get("properties"), dict):
+                visit(items["properties"], items.get("required") or (), f"{path}[].", depth + 1)
+
+    if isinstance(schema, dict):
+        if isinstance(schema.get("properties"), dict):
+            visit(schema["properties"], schema.get("required") or (), "", 0)
+        else:
+            # A bare {name: schema} mapping
+            visit(schema, (), "", 0)
+    return parameters
+
+
+class ToolSerializer:
+    """
+    Turns a tool definition into the text that is embedded.
+
+    `template` lists the fields to render, in order: `name` and
+    `description`, `parameters` (the tool's JSON schema flattened to one
+    line per parameter), any other top-level field (rendered as
+    `Field: value`), and `*` for the fields the template does not name, as
+    JSON. Text past `max_tokens` is cut off, so fields early in the template
+    always make it in and the model never truncates the input itself.
+
+    With `multi_vector`, tools longer than the budget also get chunk texts
+    (their parameters, then their enum values, each chunk within the budget
+    and headed by the tool name) that are embedded separately; a search
+    scores a tool by its best matching vector.
+    """
+
+    def __init__(self, template: Union[str, Sequence[str]] = "default", max_tokens: int = 0, multi_vector: bool = False):
+        if isinstance(template, str):
+            template = TEMPLATES.get(template) or [field.strip() for field in template.split(",") if field.strip()]
+        if not template:
+            raise ValueError(f"Serialization template needs at least one field, or one of {', '.join(TEMPLATES)}")
+        if max_tokens < 0:
+            raise ValueError("Max tool tokens must be 0 (no limit) or positive")
+        self.template = tuple(template)
+        self.max_tokens = max_tokens
+        self.multi_vector = multi_vector
+        named = set(self.template)
+        if "parameters" in named:
+            named.update(PARAMETER_FIELDS)
+        self._named = named
+
+    @property
+    def budget(self) -> int:
+        """Tokens per embedded text, 0 for no limit"""
+        if self.multi_vector and not self.max_tokens:
+            return DEFAULT_CHUNK_TOKENS
+        return self.max_tokens
+
+    @property
+    def signature(self) -> str:
+        """Identifies the settings in snapshot metadata; texts (and so embeddings) differ when it does"""
+        signature = f"{','.join(self.template)};{self.budget}"
+        return f"{signature};multi" if self.multi_vector else signature
+
+    @staticmethod
+    def _schema(tool: Dict[str, Any]) -> Any:
+        return next((tool[field] for field in PARAMETER_FIELDS if field in tool), None)
+
+    def _parts(self, tool: Dict[str, Any]) -> List[str]:
+        parts = []
+        for field in self.template:
+            if field == REMAINING_FIELDS:
+                remaining = {key: value for key, value in tool.items() if key not in self._named}
+                if remaining:
+                    parts.append(json.dumps(remaining))
+            elif field == "parameters":
+                lines = [line for _, line, _ in flatten_parameters(self._schema(tool))]
+                if lines:
+                    parts.append(f"Parameters: {'; '.join(lines)}")
+            elif field in tool:
+                parts.append(f"{_label(field)}: {_render_value(tool[field])}")
+        return parts
+
+    def full_text(self, tool: Dict[str, Any]) -> str:
+        """Every templated field, without the token budget (what keyword search indexes)"""
+        return " | ".join(self._parts(tool))
+
+    def serialize(self, tool: Dict[str, Any]) -> str:
+        """The text embedded for `tool`: the templated fields within the token budget"""
+        return truncate_tokens(self.full_text(tool), self.budget)
+
+    def chunks(self, tool: Dict[str, Any]) -> List[str]:
+        """Extra texts embedded for `tool` in multi-vector mode; none unless it exceeds the budget"""
+        if not self.multi_vector or count_tokens(self.full_text(tool)) <= self.budget:
+            return []
+        parameters = flatten_parameters(self._schema(tool))
+        header = f"Name: {tool['name']} | " if "name" in tool else ""
+        values = self._pack(f"{header}Values: ", [
+            f"{name}: {', '.join(enum)}" for name, _, enum in parameters if enum
+        ])[:MAX_CHUNKS_PER_TOOL]
+        # Enum values are rarely in the description, so they keep their chunks when a tool has too many
+        chunks = self._pack(f"{header}Parameters: ", [line for _, line, _ in parameters])
+        return chunks[:MAX_CHUNKS_PER_TOOL - len(values)] + values
+
+    def _pack(self, header: str, items: List[str]) -> List[str]:
+        """Group items into as few `header + items` texts within the budget as possible"""
+        chunks: List[str] = []
+        current: List[str] = []
+        room = self.budget - count_tokens(header)
+        used = 0
+        for item in items:
+            size = count_tokens(item) + 1
+            if current and used + size > room:
+                chunks.append(header + "; ".join(current))
+                current, used = [], 0
+            current.append(item)
+            used += size
+        if current:
+            chunks.append(header + "; ".join(current))
+        # A single item longer than the budget is cut like any other text
+        return [truncate_tokens(chunk, self.budget) for chunk in chunks]
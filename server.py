@@ -1,10 +1,18 @@
+import os
 import sys
+import time
+
+_import_start = time.perf_counter()
 
 from logging_setup import setup_logging, get_logger
-from config import ServerConfig, create_argument_parser
+from config import ServerConfig, WORKER_CONFIG_ENV, create_argument_parser
 from mcp_server import MCPServer
 from api import create_app
 from mcp_tools import mcp
+from tools_store import get_store
+from router import get_router
+
+import_seconds = time.perf_counter() - _import_start
 
 
 # Configure logging at application startup
@@ -20,32 +28,69 @@ logger = get_logger(__name__)
 
 # Initializations for uvicorn
 config = None
-app = None
+_app = None
 
 
 def initialize_app():
-    """Initialize the app for uvicorn when imported."""
-    global config, app
-    if app is None:
+    """Initialize the app for uvicorn on first access."""
+    global config, _app
+    if _app is None:
         config = ServerConfig.default()
         try:
-            app = create_app(mcp, config.storage_path)
+            start = time.perf_counter()
+            _app = create_app(mcp, config.storage_path, **config.app_options())
+            log_startup_timings(time.perf_counter() - start)
         except Exception as e:
             logger.error(f"Failed to initialize app: {e}")
             raise
+    return _app
+
+
+def __getattr__(name):
+    # `uvicorn server:app` builds the app when it looks the attribute up, not when the module is imported
+    if name == "app":
+        return initialize_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-# Initialize app for uvicorn
-initialize_app()
+def create_worker_app():
+    """App factory for each uvicorn worker process when serving with --http_workers > 1."""
+    worker_config = ServerConfig.from_json(os.environ[WORKER_CONFIG_ENV])
+    start = time.perf_counter()
+    worker_app = create_app(mcp, worker_config.storage_path, **worker_config.app_options())
+    log_startup_timings(time.perf_counter() - start)
+    return worker_app
+
+
+def log_startup_timings(app_seconds: float):
+    """Log where cold-start time went so regressions are visible"""
+    if get_router() is not None:
+        # A router has no store or model to load
+        logger.info(f"Startup: imports {import_seconds:.2f}s, router setup {app_seconds:.2f}s")
+        return
+    store = get_store()
+    if store.model_loaded:
+        model = f"load {store.model_load_seconds:.2f}s"
+    elif store.warming_up:
+        model = "loading in background"
+    else:
+        model = "deferred to first encode"
+    logger.info(
+        f"Startup: imports {import_seconds:.2f}s, store load {store.load_seconds:.2f}s "
+        f"({store.count} tools), app setup {app_seconds - store.load_seconds:.2f}s, model {model}"
+    )
 
 
 if __name__ == "__main__":
     parser = create_argument_parser()
     args = parser.parse_args()
-    
+
     try:
         config = ServerConfig.from_args(args)
+        start = time.perf_counter()
         server = MCPServer(config)
+        if server.app is not None:
+            log_startup_timings(time.perf_counter() - start)
         server.run()
     except ValueError as e:
         parser.error(str(e))
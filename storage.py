@@ -0,0 +1,594 @@
+import base64
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, multi-worker mode is unsupported
+    fcntl = None
+
+import metrics
+from logging_setup import get_logger
+from similarity import normalize_rows
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 2
+# Times a shared process re-reads a snapshot whose files a peer's compaction removed meanwhile
+LOAD_ATTEMPTS = 3
+# Legacy JSON stores were always encoded with this model
+LEGACY_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def new_id() -> str:
+    """Random id for a store lineage or a snapshot's files"""
+    return uuid.uuid4().hex[:12]
+
+
+class EmbeddingStorage:
+    """
+    On-disk layout for a tool store.
+
+    Tool metadata lives in the JSON file at `storage_path` and the embeddings in a
+    contiguous float32 `.npy` file next to it, which is memory-mapped on load.
+    Legacy stores (a JSON list with an inline "embedding" per tool) are migrated
+    automatically the first time they are loaded. A snapshot may also carry a
+    quantized copy of the rows (`<stem>.<generation>.<snapshot>.<encoding>.codes.npy`,
+    plus `.scales.npy` for int8) and, in multi-vector mode, the extra chunk
+    embeddings with the row each belongs to (`<stem>.<generation>.<snapshot>.chunks.*.npy`).
+    Every snapshot names its files with a random id, so files copied in from
+    another store never overwrite ones that are memory-mapped, whatever their
+    generation.
+
+    Mutations are not written to the snapshot directly. They are appended to a
+    write-ahead log (`<stem>.<generation>.wal`, one JSON record per line) and
+    periodically compacted into a new snapshot generation. The metadata file is
+    the commit point: on startup the snapshot it references is loaded and every
+    log with a generation >= the snapshot's is replayed on top, in order.
+    Snapshots and logs are stamped with the lineage of the store they were
+    written by (a log in its first line); logs of another lineage, left over
+    when a snapshot from elsewhere is swapped in, are set aside as
+    `<stem>.<generation>.wal.discarded` instead of being replayed.
+
+    With `shared`, several processes use the same files. Appends and log
+    rotation happen under an exclusive file lock, each process tracks how far
+    it has read every log so it can tail other processes' appends, and a
+    replaced metadata file tells readers to re-map the new snapshot.
+    """
+
+    def __init__(self, storage_path: str, shared: bool = False):
+        self.meta_path = Path(storage_path)
+        self.stem = self.meta_path.stem
+        self.shared = shared
+        # Bytes of each log generation already applied in memory
+        self._read_positions: Dict[int, int] = {}
+        # Guards the fields below and the files they name against a compaction
+        # committing on another thread while the snapshot is loaded or the log tailed
+        self._state_lock = threading.RLock()
+        # (inode, mtime, size) of the metadata file that was loaded
+        self._meta_signature: Optional[Tuple[int, int, int]] = None
+        self._lock_file = None
+        self._compaction_lock_file = None
+        # Generation of the last committed snapshot
+        self.generation = 0
+        # Generation of the log currently being appended to
+        self.wal_generation = 0
+        self.embeddings_file: Optional[str] = None
+        # Store history the loaded snapshot and the logs belong to
+        self.lineage: Optional[str] = None
+        self._wal = None
+
+    def _snapshot_path(self, generation: int, snapshot_id: str, suffix: str) -> Path:
+        return self.meta_path.with_name(f"{self.stem}.{generation}.{snapshot_id}.{suffix}")
+
+    def _embeddings_path(self, generation: int, snapshot_id: str) -> Path:
+        return self._snapshot_path(generation, snapshot_id, "npy")
+
+    def _wal_path(self, generation: int) -> Path:
+        return self.meta_path.with_name(f"{self.stem}.{generation}.wal")
+
+    def _wal_generations(self) -> List[int]:
+        return self._generations(".wal")
+
+    def _generations(self, suffix: str) -> List[int]:
+        generations = []
+        for path in self.meta_path.parent.glob(f"{self.stem}.*{suffix}"):
+            generation = path.name[len(self.stem) + 1:-len(suffix)]
+            if generation.isdigit():
+                generations.append(int(generation))
+        return sorted(generations)
+
+    # ---- cross-process coordination ----
+
+    @contextmanager
+    def write_lock(self):
+        """Exclusive lock held by the one process appending to (or rotating) the log; a no-op unless shared"""
+        if not self.shared or fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.meta_path.with_name(f"{self.stem}.lock"), "a+")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def try_lock_compaction(self) -> bool:
+        """Claim the right to write the next snapshot; only one process compacts at a time"""
+        if not self.shared or fcntl is None:
+            return True
+        if self._compaction_lock_file is None:
+            self._compaction_lock_file = open(self.meta_path.with_name(f"{self.stem}.compact.lock"), "a+")
+        try:
+            fcntl.flock(self._compaction_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def unlock_compaction(self):
+        if self._compaction_lock_file is not None:
+            fcntl.flock(self._compaction_lock_file, fcntl.LOCK_UN)
+
+    def _stat_meta(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def snapshot_changed(self) -> bool:
+        """Whether another snapshot was committed since this process loaded one"""
+        return self._stat_meta() != self._meta_signature
+
+    # ---- snapshots ----
+
+    def save(self, tools: List[Dict[str, Any]], embeddings: Optional[np.ndarray], model_name: str, backend: str = "torch"):
+        """Synchronously write a full snapshot, superseding all logged mutations"""
+        self.write_snapshot(tools, embeddings, model_name, self.rotate(), backend)
+
+    def write_snapshot(
+        self,
+        tools: List[Dict[str, Any]],
+        embeddings: Optional[np.ndarray],
+        model_name: str,
+        generation: int,
+        backend: str = "torch",
+        quantized: Optional[Tuple[str, np.ndarray, Optional[np.ndarray]]] = None,
+        chunks: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        serialization: Optional[str] = None,
+    ):
+        """
+        Write the snapshot for `generation` and commit it by replacing the metadata file.
+        `quantized` optionally adds the compact search copy of the rows as
+        (encoding, codes, scales), so loading does not have to quantize again.
+        `chunks` holds multi-vector chunk embeddings as (vectors, owning rows)
+        and `serialization` the settings the tool texts were serialized with.
+        Logs and snapshot files from older generations (or of a snapshot with the
+        same generation that this one replaces) are removed afterwards;
+        processes that still map an old embeddings file keep a valid mapping.
+        """
+        has_embeddings = embeddings is not None and len(embeddings) > 0
+        lineage = self._current_lineage()
+        snapshot_id = new_id()
+        embeddings_path = self._embeddings_path(generation, snapshot_id)
+        if has_embeddings:
+            self._write_npy(embeddings_path, np.ascontiguousarray(embeddings, dtype=np.float32))
+        quantized_meta = None
+        if has_embeddings and quantized is not None:
+            encoding, codes, scales = quantized
+            codes_path = self._snapshot_path(generation, snapshot_id, f"{encoding}.codes.npy")
+            self._write_npy(codes_path, codes)
+            quantized_meta = {"encoding": encoding, "codes_file": codes_path.name, "scales_file": None}
+            if scales is not None:
+                scales_path = self._snapshot_path(generation, snapshot_id, f"{encoding}.scales.npy")
+                self._write_npy(scales_path, scales)
+                quantized_meta["scales_file"] = scales_path.name
+        chunks_meta = None
+        if has_embeddings and chunks is not None and len(chunks[0]):
+            vectors_path = self._snapshot_path(generation, snapshot_id, "chunks.vectors.npy")
+            rows_path = self._snapshot_path(generation, snapshot_id, "chunks.rows.npy")
+            self._write_npy(vectors_path, np.ascontiguousarray(chunks[0], dtype=np.float32))
+            self._write_npy(rows_path, np.ascontiguousarray(chunks[1], dtype=np.int64))
+            chunks_meta = {"count": len(chunks[0]), "vectors_file": vectors_path.name, "rows_file": rows_path.name}
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "generation": generation,
+            "lineage": lineage,
+            "model": model_name,
+            # Inference backend the embeddings were produced with
+            "backend": backend,
+            "count": len(tools),
+            "dim": int(embeddings.shape[1]) if has_embeddings else None,
+            "embeddings_file": embeddings_path.name if has_embeddings else None,
+            # Rows are L2-normalized by ToolsStore before they are persisted
+            "normalized": True,
+            "quantized": quantized_meta,
+            "chunks": chunks_meta,
+            "serialization": serialization,
+            "ids": [t["id"] for t in tools],
+            "hashes": [t.get("hash") for t in tools],
+            "tools": [t["original"] for t in tools],
+        }
+        with self._state_lock:
+            self._write_json(self.meta_path, meta)
+            self.generation = generation
+            self.embeddings_file = meta["embeddings_file"]
+            if not self.shared:
+                # Shared processes notice the new file and re-map it instead
+                self._meta_signature = self._stat_meta()
+            # Includes same-generation files of a snapshot this one replaced
+            current = {name for name in (meta["embeddings_file"],) if name}
+            current.update(name for part in (quantized_meta or {}, chunks_meta or {})
+                           for key, name in part.items() if key.endswith("_file") and name)
+            for path in self.meta_path.parent.glob(f"{self.stem}.*.npy"):
+                file_generation = path.name[len(self.stem) + 1:].split(".", 1)[0]
+                if file_generation.isdigit() and int(file_generation) <= generation and path.name not in current:
+                    path.unlink(missing_ok=True)
+            for old_generation in self._wal_generations():
+                if old_generation < generation:
+                    self._wal_path(old_generation).unlink(missing_ok=True)
+                    self._read_positions.pop(old_generation, None)
+            for path in self.meta_path.parent.glob(f"{self.stem}.*.index*"):
+                file_generation = path.name[len(self.stem) + 1:].split(".", 1)[0]
+                if file_generation.isdigit() and int(file_generation) < generation:
+                    path.unlink(missing_ok=True)
+
+    def index_path(self, generation: int, kind: str) -> Path:
+        """Where the ANN index matching snapshot `generation` is persisted"""
+        return self.meta_path.with_name(f"{self.stem}.{generation}.{kind}.index")
+
+    def load_chunks(self, meta: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Memory-map the snapshot's chunk embeddings and their rows, if it has any"""
+        chunks = meta.get("chunks")
+        if not chunks:
+            return None
+        vectors = np.load(self.meta_path.with_name(chunks["vectors_file"]), mmap_mode="r")
+        rows = np.load(self.meta_path.with_name(chunks["rows_file"]), mmap_mode="r")
+        if len(vectors) != chunks.get("count") or len(rows) != len(vectors):
+            raise ValueError(f"Chunk files list {len(vectors)} vectors and {len(rows)} rows but metadata says {chunks.get('count')}")
+        return vectors, rows
+
+    def load_quantized(self, meta: Dict[str, Any], encoding: str) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """Memory-map the snapshot's quantized rows if they were written with `encoding`"""
+        quantized = meta.get("quantized")
+        if not quantized or quantized.get("encoding") != encoding:
+            return None
+        try:
+            codes = np.load(self.meta_path.with_name(quantized["codes_file"]), mmap_mode="r")
+            scales = None
+            if quantized.get("scales_file"):
+                scales = np.load(self.meta_path.with_name(quantized["scales_file"]), mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load {encoding} embeddings for generation {self.generation}: {e}")
+            return None
+        if len(codes) != meta.get("count") or (scales is not None and len(scales) != len(codes)):
+            return None
+        return codes, scales
+
+    def scratch_rows(self, rows: int, dim: int) -> np.ndarray:
+        """
+        A writable float32 (rows, dim) array backed by an unnamed file next to
+        the store rather than by process memory, so the kernel can write its
+        pages back and drop them like those of a snapshot. The file has no
+        name and goes away with the array.
+        """
+        # Next to the store, not in the temp dir, which may be a RAM-backed tmpfs
+        with tempfile.TemporaryFile(dir=self.meta_path.parent, prefix=f"{self.stem}.scratch.") as f:
+            # The mapping keeps its own reference to the file
+            return np.memmap(f, dtype=np.float32, mode="w+", shape=(max(rows, 1), dim))[:rows]
+
+    def embedding_cache_path(self, model_name: str) -> Path:
+        """Where the content-hash embedding cache for `model_name` is kept; it outlives snapshots"""
+        model_slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        return self.meta_path.with_name(f"{self.stem}.{model_slug}.embcache")
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray], Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Load the committed snapshot.
+        Returns tools, embeddings, the snapshot metadata (model, normalized, ...)
+        without the tool list and the logged records that still have to be
+        replayed on top of them.
+        When shared, a peer may commit a newer snapshot and remove the files of
+        this one (including logs not replayed yet) while they are read; the
+        new one is loaded instead.
+        """
+        for attempt in range(1, LOAD_ATTEMPTS + 1):
+            signature = self._stat_meta()
+            try:
+                with self._state_lock:
+                    loaded = self._load()
+            except FileNotFoundError:
+                if not self.shared or attempt == LOAD_ATTEMPTS or self._stat_meta() == signature:
+                    raise
+            else:
+                # Old logs are only removed after the new metadata file is in place
+                if not self.shared or attempt == LOAD_ATTEMPTS or self._stat_meta() == signature:
+                    return loaded
+            logger.info(f"Snapshot at {self.meta_path} was replaced while loading it; loading the new one")
+
+    def _load(self) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray], Dict[str, Any], List[Dict[str, Any]]]:
+        self._meta_signature = self._stat_meta()
+        if self._meta_signature is None:
+            self.generation = 0
+            # Only logs so far; the store's lineage is taken from them when something is written
+            self.lineage = None
+            records = self._read_records(0)
+            self._start_wal(max(self._wal_generations(), default=0))
+            return [], None, {}, records
+
+        with open(self.meta_path, "r") as f:
+            data = json.load(f)
+
+        if isinstance(data, list):
+            self.lineage = None
+            tools, embeddings = self._migrate_legacy(data)
+            return tools, embeddings, {"model": LEGACY_MODEL_NAME}, []
+
+        originals = data.get("tools", [])
+        ids = data.get("ids") or list(range(len(originals)))
+        hashes = data.get("hashes") or [None] * len(originals)
+        tools = [
+            {"id": tool_id, "original": t, "hash": tool_hash}
+            for tool_id, t, tool_hash in zip(ids, originals, hashes)
+        ]
+        embeddings = None
+        embeddings_file = data.get("embeddings_file")
+        if embeddings_file:
+            embeddings = np.load(self.meta_path.with_name(embeddings_file), mmap_mode="r")
+            if len(embeddings) != len(tools):
+                raise ValueError(
+                    f"Embeddings file has {len(embeddings)} rows but metadata lists {len(tools)} tools"
+                )
+        # Only switched once the snapshot is known to be readable, so a failed reload changes nothing
+        self.generation = data.get("generation", 0)
+        self.embeddings_file = embeddings_file
+        # Snapshots written before lineages were stamped accept every log
+        self.lineage = data.get("lineage")
+        records = self._read_records(self.generation)
+        self._start_wal(max([self.generation] + self._wal_generations()))
+        data.pop("tools", None)
+        data.pop("ids", None)
+        data.pop("hashes", None)
+        return tools, embeddings, data, records
+
+    def _migrate_legacy(self, data: List[Dict[str, Any]]):
+        """Convert a legacy JSON store in place, keeping the original as a backup"""
+        tools = [{"id": tool_id, "original": t["original"]} for tool_id, t in enumerate(data)]
+        embeddings = None
+        if data:
+            embeddings = normalize_rows(np.array([t["embedding"] for t in data], dtype=np.float32))
+
+        backup_path = self.meta_path.with_name(self.meta_path.name + ".legacy.bak")
+        os.replace(self.meta_path, backup_path)
+        self._open_wal(max(self._wal_generations(), default=0))
+        self.save(tools, embeddings, LEGACY_MODEL_NAME)
+        self._meta_signature = self._stat_meta()
+        logger.info(f"Migrated legacy store with {len(tools)} tools (backup at {backup_path})")
+        return tools, embeddings
+
+    # ---- write-ahead log ----
+
+    def _start_wal(self, generation: int):
+        if self.shared:
+            # Opened by prepare_append under the write lock; another process may be mid-append
+            self.close()
+            self.wal_generation = generation
+            return
+        self._open_wal(generation)
+
+    def prepare_append(self):
+        """Point the log handle at the newest generation before appending (call under write_lock when shared)"""
+        if not self.shared:
+            return
+        latest = max([self.generation, self.wal_generation] + self._wal_generations())
+        if self._wal is None or latest != self.wal_generation:
+            self._open_wal(latest)
+
+    def _open_wal(self, generation: int):
+        if self._wal is not None:
+            self._wal.close()
+        self.wal_generation = generation
+        path = self._wal_path(generation)
+        self._truncate_torn_tail(path)
+        self._wal = open(path, "a", encoding="utf-8")
+        if self._wal.tell() == 0:
+            self._wal.write(json.dumps({"op": "lineage", "lineage": self._current_lineage()}) + "\n")
+            self._wal.flush()
+
+    @staticmethod
+    def _truncate_torn_tail(path: Path):
+        """Drop a partially written last record so new appends start on a fresh line"""
+        if not path.exists() or path.stat().st_size == 0:
+            return
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data.endswith(b"\n"):
+                return
+            f.truncate(data.rfind(b"\n") + 1)
+
+    def rotate(self) -> int:
+        """Start a new log generation; returns the generation a snapshot should be written as"""
+        self.prepare_append()
+        with self._state_lock:
+            self._open_wal(self.wal_generation + 1)
+            self._read_positions[self.wal_generation] = 0
+        return self.wal_generation
+
+    def wal_size(self) -> int:
+        """Size in bytes of the log currently being appended to"""
+        if self._wal is None:
+            return 0
+        return self._wal.tell()
+
+    def append_add(
+        self,
+        tools: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        ids: List[int],
+        hashes: Optional[List[str]] = None,
+        chunks: Optional[Tuple[np.ndarray, List[int]]] = None,
+    ):
+        """
+        Log added tools; an id that already exists replaces that tool on replay.
+        `chunks` holds their multi-vector chunk embeddings, in tool order, and
+        how many belong to each tool.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        record = {
+            "op": "add",
+            "ids": ids,
+            "hashes": hashes,
+            "tools": tools,
+            "dim": int(embeddings.shape[1]),
+            "embeddings": base64.b64encode(embeddings.tobytes()).decode("ascii"),
+        }
+        if chunks is not None:
+            vectors = np.ascontiguousarray(chunks[0], dtype=np.float32)
+            record["chunk_counts"] = list(chunks[1])
+            record["chunks"] = base64.b64encode(vectors.tobytes()).decode("ascii")
+        self._append(record)
+
+    def append_delete(self, tool_names: List[str]):
+        self._append({"op": "delete", "names": tool_names})
+
+    def append_clear(self):
+        self._append({"op": "clear"})
+
+    def _append(self, record: Dict[str, Any]):
+        if self._wal is None:
+            self._open_wal(self.wal_generation)
+        with metrics.stage("persist"):
+            self._wal.write(json.dumps(record) + "\n")
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+        # Our own record is applied by the caller; the holder of the write lock appends at the end
+        with self._state_lock:
+            self._read_positions[self.wal_generation] = self._wal.tell()
+
+    def _current_lineage(self) -> str:
+        """The store's lineage, adopted from the newest stamped log (or a new one) the first time it is written"""
+        if self.lineage is None:
+            stamped = filter(None, map(self._log_lineage, reversed(self._wal_generations())))
+            self.lineage = next(stamped, None) or new_id()
+        return self.lineage
+
+    def _log_lineage(self, generation: int) -> Optional[str]:
+        """Lineage stamped in the first line of a log; None for logs written before lineages were"""
+        try:
+            with open(self._wal_path(generation), "rb") as f:
+                first = json.loads(f.readline() or b"{}")
+        except (OSError, json.JSONDecodeError):
+            return None
+        return first.get("lineage") if first.get("op") == "lineage" else None
+
+    def _is_foreign(self, generation: int) -> bool:
+        lineage = self._log_lineage(generation)
+        return lineage is not None and self.lineage is not None and lineage != self.lineage
+
+    def _read_records(self, from_generation: int) -> List[Dict[str, Any]]:
+        self._read_positions = {}
+        records = []
+        for generation in self._wal_generations():
+            if generation < from_generation:
+                continue
+            if self._is_foreign(generation):
+                # Written on top of the snapshot that was replaced; its records do not apply to this one
+                path = self._wal_path(generation)
+                os.replace(path, path.with_name(path.name + ".discarded"))
+                logger.warning(f"Set aside log {path.name} of another store lineage as {path.name}.discarded")
+                continue
+            records.extend(self._read_log(generation))
+        return records
+
+    def read_new_records(self) -> List[Dict[str, Any]]:
+        """
+        Records other processes appended since the last load or read.
+        Raises FileNotFoundError if a log was compacted away meanwhile, in
+        which case the caller has to load the new snapshot instead.
+        """
+        records = []
+        with self._state_lock:
+            for generation in self._wal_generations():
+                if generation >= self.generation and not self._is_foreign(generation):
+                    records.extend(self._read_log(generation))
+            for generation in list(self._read_positions):
+                if generation >= self.generation and not self._wal_path(generation).exists():
+                    raise FileNotFoundError(self._wal_path(generation))
+        return records
+
+    def _read_log(self, generation: int) -> List[Dict[str, Any]]:
+        """Complete records of one log past the read position; a partial last line is left for later"""
+        path = self._wal_path(generation)
+        start = self._read_positions.get(generation, 0)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._read_positions[generation] = start + end
+        records = []
+        lines = data[:end].split(b"\n")
+        last = max((line_no for line_no, line in enumerate(lines, 1) if line.strip()), default=0)
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                if line_no != last:
+                    # Later records were acknowledged, so skipping this one would lose a write
+                    raise ValueError(f"Corrupt log record {path.name}:{line_no} (reading from byte {start}): {e}") from e
+                # A torn write from a crash; nothing after it was acknowledged
+                logger.warning(f"Skipping corrupt log record {path.name}:{line_no} (reading from byte {start})")
+                continue
+            if record.get("op") == "lineage":
+                continue
+            if record.get("op") == "add":
+                raw = base64.b64decode(record.pop("embeddings"))
+                record["embeddings"] = np.frombuffer(raw, dtype=np.float32).reshape(-1, record["dim"])
+                if "chunks" in record:
+                    raw = base64.b64decode(record.pop("chunks"))
+                    record["chunks"] = np.frombuffer(raw, dtype=np.float32).reshape(-1, record["dim"])
+            records.append(record)
+        return records
+
+    def close(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def close_lock_files(self):
+        """Close the cross-process lock files; they are reopened by the next write or compaction"""
+        for lock_file in (self._lock_file, self._compaction_lock_file):
+            if lock_file is not None:
+                lock_file.close()
+        self._lock_file = None
+        self._compaction_lock_file = None
+
+    @staticmethod
+    def _write_npy(path: Path, array: np.ndarray):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_json(path: Path, payload: Dict[str, Any]):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,175 @@
+import asyncio
+import codecs
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from logging_setup import get_logger
+from executor import ExecutorBusyError, get_executor
+
+logger = get_logger(__name__)
+
+DEFAULT_INGEST_CHUNK_SIZE = 1000
+# A single tool larger than this (or JSON that never completes) aborts the upload
+MAX_TOOL_BYTES = 16 * 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+
+class ToolStreamParser:
+    """
+    Incremental parser for tool uploads: NDJSON (one tool per line), a JSON
+    array of tools, or a single tool object. Bytes are fed as they arrive and
+    complete tools come out, so only the current partial tool is buffered.
+    """
+
+    def __init__(self, max_tool_bytes: int = MAX_TOOL_BYTES):
+        self.max_tool_bytes = max_tool_bytes
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # Parsed but not yet handed out; kept when a later tool turns out malformed
+        self._parsed: List[Dict[str, Any]] = []
+        self._in_array = False
+        self._started = False
+        self._finished = False
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """Tools completed by `data`; raises ValueError on malformed input"""
+        self._buffer += self._utf8.decode(data)
+        self._drain(final=False)
+        return self.take()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Tools left at the end of the stream; raises ValueError if the input was cut off"""
+        self._buffer += self._utf8.decode(b"", final=True)
+        self._drain(final=True)
+        if self._in_array and not self._finished:
+            raise ValueError("JSON array is not closed")
+        return self.take()
+
+    def take(self) -> List[Dict[str, Any]]:
+        """Tools parsed so far and not yet returned, including those before a malformed one"""
+        tools, self._parsed = self._parsed, []
+        return tools
+
+    def _drain(self, final: bool):
+        pos = 0
+        buffer = self._buffer
+        while True:
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or (self._in_array and buffer[pos] == ",")):
+                pos += 1
+            if pos == len(buffer):
+                break
+            if self._finished:
+                raise ValueError(f"Unexpected data after the end of the JSON array: {buffer[pos:pos + 20]!r}")
+            if not self._started:
+                self._started = True
+                if buffer[pos] == "[":
+                    self._in_array = True
+                    pos += 1
+                    continue
+            if self._in_array and buffer[pos] == "]":
+                self._finished = True
+                pos += 1
+                continue
+            try:
+                tool, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # JSON strings cannot span lines, so a cut-off tool only fails on its last line
+                if final or e.pos < buffer.rfind("\n"):
+                    raise ValueError(f"Invalid JSON: {e.msg}") from e
+                if len(buffer) - pos > self.max_tool_bytes:
+                    raise ValueError(f"Invalid JSON or a tool larger than {self.max_tool_bytes} bytes: {e.msg}") from e
+                # Most likely incomplete; wait for more data
+                break
+            if not isinstance(tool, dict):
+                raise ValueError(f"Expected a tool object, got {type(tool).__name__}")
+            if not isinstance(tool.get("name", ""), str):
+                raise ValueError(f"Tool name must be a string, got {type(tool['name']).__name__}")
+            self._parsed.append(tool)
+            pos = end
+        self._buffer = buffer[pos:]
+
+
+async def ingest_stream(
+    store,
+    chunks: AsyncIterator[bytes],
+    upsert: bool = False,
+    chunk_size: int = DEFAULT_INGEST_CHUNK_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Parse tools from `chunks` as they arrive and add them to `store`
+    `chunk_size` at a time. Every added chunk is durable once its progress
+    event is yielded, so a dropped connection loses at most the chunk in
+    flight. Yields progress events and a final "done" (or "error") event.
+    """
+    async def add(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        while True:
+            try:
+                ingest = await get_executor().run(store.add_tools, batch, upsert=upsert)
+                return {**ingest, "total_tools": store.count}
+            except ExecutorBusyError:
+                # A bulk upload waits for capacity instead of failing halfway
+                await asyncio.sleep(0.05)
+
+    async def count() -> int:
+        return store.count
+
+    async for event in ingest_chunks(add, count, chunks, chunk_size):
+        yield event
+
+
+async def ingest_chunks(
+    add: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]],
+    count: Callable[[], Awaitable[int]],
+    chunks: AsyncIterator[bytes],
+    chunk_size: int = DEFAULT_INGEST_CHUNK_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    ingest_stream for any destination: `add` adds a chunk of tools and returns
+    its added / updated / unchanged counts and the resulting total_tools;
+    `count` returns total_tools when nothing was added.
+    """
+    parser = ToolStreamParser()
+    pending: List[Dict[str, Any]] = []
+    totals = {"received": 0, "added": 0, "updated": 0, "unchanged": 0}
+    start = time.perf_counter()
+
+    async def commit(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        ingest = await add(batch)
+        totals["received"] += len(batch)
+        for key in ("added", "updated", "unchanged"):
+            totals[key] += ingest[key]
+        elapsed = time.perf_counter() - start
+        return {
+            **totals,
+            "total_tools": ingest["total_tools"],
+            "seconds": round(elapsed, 3),
+            "tools_per_sec": round(totals["received"] / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    try:
+        async for data in chunks:
+            pending.extend(parser.feed(data))
+            while len(pending) >= chunk_size:
+                batch, pending = pending[:chunk_size], pending[chunk_size:]
+                yield {"event": "progress", **await commit(batch)}
+        pending.extend(parser.close())
+        progress = await commit(pending) if pending else None
+    except ValueError as e:
+        pending.extend(parser.take())
+        if pending:
+            # Keep the well-formed tools that came before the error
+            await commit(pending)
+        logger.warning(f"Streaming upload stopped after {totals['received']} tools: {e}")
+        yield {"event": "error", "detail": str(e), **totals, "total_tools": await count()}
+        return
+    if progress is None:
+        elapsed = time.perf_counter() - start
+        progress = {**totals, "total_tools": await count(), "seconds": round(elapsed, 3), "tools_per_sec": 0.0}
+    logger.info(
+        f"Streaming upload: {progress['received']} tools in {progress['seconds']:.2f}s "
+        f"({progress['added']} added, {progress['updated']} updated, {progress['unchanged']} unchanged)"
+    )
+    yield {"event": "done", **progress}
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import HashingEncoder  # noqa: E402
+from tools_store import ToolsStore  # noqa: E402
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """Build ToolsStores over files in a temporary directory, with the hashing encoder as their model"""
+    stores = []
+
+    def make(name="tools.json", **options):
+        store = ToolsStore(str(tmp_path / name), warm_up=False, **options)
+        store._model = HashingEncoder()
+        store._compatibility_checked = True
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
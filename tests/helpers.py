@@ -0,0 +1,34 @@
+import hashlib
+
+import numpy as np
+
+DIM = 64
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for the sentence-transformers model: every word
+    maps to a fixed random vector and a text embeds as their sum, so texts
+    sharing words are similar and the tests never download a model.
+    """
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        return np.stack([self._encode(text) for text in texts]) if len(texts) else np.zeros((0, DIM), dtype=np.float32)
+
+    @staticmethod
+    def _encode(text):
+        vector = np.zeros(DIM, dtype=np.float32)
+        for word in text.lower().replace("_", " ").split():
+            seed = int(hashlib.md5(word.encode()).hexdigest()[:8], 16)
+            vector += np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+        return vector
+
+
+def catalog(count, prefix="tool"):
+    """`count` tools with distinct names and descriptions drawn from a small vocabulary"""
+    rng = np.random.default_rng(count)
+    words = [f"word{i}" for i in range(200)]
+    return [
+        {"name": f"{prefix}_{i}", "description": " ".join(rng.choice(words, 6)), "type": "function"}
+        for i in range(count)
+    ]
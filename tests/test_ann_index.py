@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from ann_index import HNSWIndex, IVFIndex
+from helpers import catalog
+from similarity import cosine_top_k, normalize_rows
+
+hnswlib = pytest.importorskip("hnswlib")
+
+
+def random_vectors(count, dim=32, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32))
+
+
+def test_hnsw_readd_of_live_label_replaces_it():
+    vectors = random_vectors(10)
+    index = HNSWIndex()
+    index.add(np.arange(10), vectors)
+    index.remove([3])
+    # Re-adding a live label must update it, not claim the vacant slot of 3 as a second copy
+    index.add(np.array([5]), vectors[5:6])
+    ids, _ = index.search(vectors[5], 5)
+    assert len(set(ids.tolist())) == len(ids)
+    index.remove([5])
+    ids, _ = index.search(vectors[5], 9)
+    assert 5 not in ids.tolist() and 3 not in ids.tolist()
+    # Both deleted labels can come back
+    index.add(np.array([5, 3]), vectors[[5, 3]])
+    assert index.search(vectors[3], 1)[0].tolist() == [3]
+    assert sorted(index.ids().tolist()) == list(range(10))
+
+
+def test_hnsw_last_duplicate_in_a_batch_wins():
+    vectors = random_vectors(3)
+    index = HNSWIndex()
+    index.add(np.array([7, 7]), vectors[:2])
+    ids, scores = index.search(vectors[1], 5)
+    assert ids.tolist() == [7] and scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("kind", ["hnsw", "ivf"])
+def test_store_upsert_and_delete_never_duplicate_results(make_store, kind):
+    store = make_store(index=kind)
+    tools = catalog(100)
+    store.add_tools(tools)
+    deleted = {tool["name"] for round_no in range(3) for tool in tools[3 + round_no::11]}
+    for round_no in range(3):
+        # Upserts reuse the ids of live tools
+        changed = [
+            {**tool, "description": f"{tool['description']} revised{round_no}"}
+            for tool in tools[::7] if tool["name"] not in deleted
+        ]
+        store.add_tools(changed, upsert=True)
+        store.delete_tools([tool["name"] for tool in tools[3 + round_no::11]])
+        for query in ["word1 word2", "revised0 word5", tools[14]["description"]]:
+            names = [result["tool"]["name"] for result in store.search(query, 10)]
+            assert len(names) == len(set(names))
+    for tool in tools:
+        names = [result["tool"]["name"] for result in store.search(tool["description"], 5)]
+        assert not deleted & set(names)
+
+
+def test_ivf_before_training_matches_exact_search(make_store):
+    """Until it is trained, the IVF index searches exactly, so results must equal brute force"""
+    exact, ivf = make_store("exact.json"), make_store("ivf.json", index="ivf")
+    tools = catalog(300)
+    for store in (exact, ivf):
+        store.add_tools(tools)
+        store.delete_tools([tool["name"] for tool in tools[::9]])
+    assert not ivf.index.trained
+    for tool in tools[:60]:
+        expected = [(r["tool"]["name"], round(r["similarity_score"], 5)) for r in exact.search(tool["description"], 5)]
+        found = [(r["tool"]["name"], round(r["similarity_score"], 5)) for r in ivf.search(tool["description"], 5)]
+        assert found == expected
+
+
+def test_hnsw_recall_against_brute_force():
+    vectors = random_vectors(2000, dim=32, seed=1)
+    queries = random_vectors(50, dim=32, seed=2)
+    index = HNSWIndex()
+    index.add(np.arange(len(vectors)), vectors)
+    hits = 0
+    for query in queries:
+        expected = set(cosine_top_k(vectors, query, 10)[0].tolist())
+        hits += len(expected & set(index.search(query, 10)[0].tolist()))
+    assert hits / (10 * len(queries)) >= 0.95
+
+
+def test_trained_ivf_recall_against_brute_force():
+    vectors = random_vectors(3000, dim=32, seed=3)
+    queries = random_vectors(50, dim=32, seed=4)
+    index = IVFIndex(nlist=16, nprobe=8, train_size=1000)
+    index.add(np.arange(len(vectors)), vectors)
+    assert index.trained
+    hits = 0
+    for query in queries:
+        expected = set(cosine_top_k(vectors, query, 10)[0].tolist())
+        hits += len(expected & set(index.search(query, 10)[0].tolist()))
+    assert hits / (10 * len(queries)) >= 0.8
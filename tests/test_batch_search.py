@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from batcher import search_many
+from helpers import catalog
+from models import BatchSearchQuery
+
+
+def names(results):
+    return [[result["tool"]["name"] for result in query_results] for query_results in results]
+
+
+@pytest.fixture
+def store(make_store):
+    store = make_store()
+    store.add_tools(catalog(50))
+    return store
+
+
+def test_batch_results_match_single_searches(store):
+    queries = ["word1 word2", "word3", "word40 word41 word42"]
+    results = asyncio.run(search_many(store, queries, 4))
+    assert names(results) == [names([store.search(query, 4)])[0] for query in queries]
+
+
+def test_dedupe_returns_each_tool_once_and_fills_every_query(store):
+    queries = ["word1 word2", "word1 word2", "word1"]
+    ranked = names([store.search(queries[0], 8)])[0]
+    results = names(asyncio.run(search_many(store, queries, 4, dedupe=True)))
+    assert [len(query_results) for query_results in results] == [4, 4, 4]
+    flat = [name for query_results in results for name in query_results]
+    assert len(flat) == len(set(flat))
+    # The repeated query gets the next best tools
+    assert results[0] == ranked[:4] and results[1] == ranked[4:8]
+
+
+def test_invalid_filters_and_modes_fail_before_searching(store):
+    with pytest.raises(ValueError, match="Cannot filter on"):
+        asyncio.run(search_many(store, ["word1"], 3, filters={"color": "red"}))
+    with pytest.raises(ValueError, match="Unknown search mode"):
+        asyncio.run(search_many(store, ["word1"], 3, mode="fuzzy"))
+
+
+def test_batch_requests_are_bounded():
+    assert BatchSearchQuery(queries=["a"]).dedupe is False
+    for invalid in ({"queries": []}, {"queries": ["a"] * 101}, {"queries": ["a"], "k": 0}, {"queries": ["a"], "k": 101}):
+        with pytest.raises(ValidationError):
+            BatchSearchQuery(**invalid)
@@ -0,0 +1,28 @@
+from concurrent.futures import Future
+
+from batcher import SearchBatcher
+
+
+def finished(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_cancelled_caller_does_not_strand_the_rest_of_the_batch():
+    futures = [Future() for _ in range(3)]
+    futures[0].cancel()
+    SearchBatcher._fan_out(finished([["a"], ["b"], ["c"]]), futures)
+    assert futures[0].cancelled()
+    assert [future.result() for future in futures[1:]] == [["b"], ["c"]]
+
+
+def test_batch_error_reaches_every_waiting_caller():
+    futures = [Future() for _ in range(3)]
+    futures[1].cancel()
+    error = RuntimeError("search failed")
+    SearchBatcher._fan_out(finished(error=error), futures)
+    assert futures[0].exception() is error and futures[2].exception() is error
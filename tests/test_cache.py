@@ -0,0 +1,148 @@
+import numpy as np
+
+import cache
+from cache import EmbeddingCache, LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    lru = LRUCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert len(lru) == 2
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    lru = LRUCache(maxsize=4, ttl=10)
+    lru.put("a", 1)
+    clock.now += 9
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a", "expired") == "expired"
+    assert len(lru) == 0
+
+
+def test_zero_maxsize_disables_the_cache():
+    lru = LRUCache(maxsize=0)
+    lru.put("a", 1)
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_stats_count_hits_and_misses():
+    lru = LRUCache(maxsize=4)
+    lru.put("a", 1)
+    lru.get("a")
+    lru.get("a")
+    lru.get("b")
+    assert lru.stats() == {"size": 1, "maxsize": 4, "hits": 2, "misses": 1, "hit_rate": 0.6667}
+    lru.clear()
+    assert len(lru) == 0
+
+
+def key(i):
+    return f"{i:032x}"
+
+
+def vectors(count, dim=4, start=0):
+    return np.arange(start * dim, (start + count) * dim, dtype=np.float32).reshape(count, dim)
+
+
+def test_embeddings_persist_across_instances(tmp_path):
+    path = tmp_path / "model.cache"
+    first = EmbeddingCache(path)
+    first.put_many([key(0), key(1)], vectors(2))
+    found = EmbeddingCache(path).get_many([key(1), key(2), key(0)])
+    assert found[1] is None
+    np.testing.assert_array_equal(found[0], vectors(2)[1])
+    np.testing.assert_array_equal(found[2], vectors(2)[0])
+
+
+def test_a_torn_final_record_is_dropped_on_open(tmp_path):
+    path = tmp_path / "model.cache"
+    EmbeddingCache(path).put_many([key(0), key(1)], vectors(2))
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 7)
+    cache = EmbeddingCache(path)
+    assert len(cache) == 2
+    cache.put_many([key(2)], vectors(1, start=2))
+    found = EmbeddingCache(path).get_many([key(0), key(1), key(2)])
+    np.testing.assert_array_equal(np.vstack(found), vectors(3))
+
+
+def test_an_unreadable_file_is_discarded(tmp_path):
+    path = tmp_path / "model.cache"
+    path.write_bytes(b"not a cache file at all")
+    cache = EmbeddingCache(path)
+    assert len(cache) == 0 and not path.exists()
+
+
+def test_a_different_dimension_starts_the_cache_over(tmp_path):
+    path = tmp_path / "model.cache"
+    cache = EmbeddingCache(path)
+    cache.put_many([key(0)], vectors(1, dim=4))
+    cache.put_many([key(1)], vectors(1, dim=8))
+    assert cache.get_many([key(0)]) == [None]
+    assert EmbeddingCache(path).dim == 8
+
+
+def test_the_file_shrinks_to_the_newest_entries(tmp_path):
+    path = tmp_path / "model.cache"
+    cache = EmbeddingCache(path, max_entries=4)
+    for i in range(6):
+        cache.put_many([key(i)], vectors(1, start=i))
+    assert len(cache) == 4
+    reopened = EmbeddingCache(path, max_entries=4)
+    assert len(reopened) == 4
+    assert reopened.get_many([key(0), key(1)]) == [None, None]
+    np.testing.assert_array_equal(np.vstack(reopened.get_many([key(i) for i in range(2, 6)])), vectors(4, start=2))
+
+
+def test_new_entries_are_read_back_from_the_file(tmp_path):
+    path = tmp_path / "model.cache"
+    cache = EmbeddingCache(path)
+    cache.put_many([key(0), key(1)], vectors(2))
+    path.write_bytes(path.read_bytes()[:EmbeddingCache.HEADER_SIZE] + b"\0" * (path.stat().st_size - EmbeddingCache.HEADER_SIZE))
+    assert not cache.get_many([key(1)])[0].any()
+
+
+def test_processes_sharing_the_file_follow_a_rewrite(tmp_path):
+    path = tmp_path / "model.cache"
+    first = EmbeddingCache(path, max_entries=4)
+    second = EmbeddingCache(path, max_entries=4)
+    first.put_many([key(0)], vectors(1))
+    second.put_many([key(1)], vectors(1, start=1))
+    # The second writer picked up the first one's record before appending its own
+    np.testing.assert_array_equal(second.get_many([key(0)])[0], vectors(1)[0])
+
+    for i in range(2, 6):
+        first.put_many([key(i)], vectors(1, start=i))
+    assert len(first) == 4
+    # The old mapping keeps serving until the next write moves to the new file
+    np.testing.assert_array_equal(second.get_many([key(1)])[0], vectors(1, start=1)[0])
+    second.put_many([key(6)], vectors(1, start=6))
+    assert second.get_many([key(1)]) == [None]
+    reopened = EmbeddingCache(path, max_entries=4)
+    assert len(reopened) == 5
+    np.testing.assert_array_equal(np.vstack(reopened.get_many([key(i) for i in range(2, 7)])), vectors(5, start=2))
+
+
+def test_zero_max_entries_disables_the_cache(tmp_path):
+    path = tmp_path / "model.cache"
+    cache = EmbeddingCache(path, max_entries=0)
+    cache.put_many([key(0)], vectors(1))
+    assert cache.get_many([key(0)]) == [None]
+    assert not path.exists()
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor import ExecutorBusyError, StoreExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = StoreExecutor(max_workers=1, max_queue_depth=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_run_returns_the_result_and_raises_the_error_of_the_job(executor):
+    async def scenario():
+        assert await executor.run(lambda a, b: a + b, 2, 3) == 5
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+
+    asyncio.run(scenario())
+    assert executor.pending == 0
+
+
+def test_jobs_beyond_workers_and_queue_depth_are_refused(executor):
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(lambda: None)
+        release.set()
+        assert await asyncio.gather(*blocked) == [True, True]
+        # Finished jobs free their slots
+        assert await executor.run(lambda: "ok") == "ok"
+
+    asyncio.run(scenario())
+    assert executor.pending == 0
+
+
+def test_a_caller_that_stops_waiting_keeps_its_slot_until_the_job_ends(executor):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def job():
+        release.wait()
+        finished.set()
+
+    async def scenario():
+        waiter = asyncio.ensure_future(executor.run(job))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert executor.pending == 1
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, finished.wait)
+
+    asyncio.run(scenario())
+    # The done callback runs on the worker right after the job returns
+    for _ in range(100):
+        if executor.pending == 0:
+            break
+        threading.Event().wait(0.01)
+    assert executor.pending == 0
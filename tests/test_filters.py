@@ -0,0 +1,75 @@
+import pytest
+
+from helpers import catalog
+
+
+def tagged_catalog():
+    tools = catalog(30)
+    for i, tool in enumerate(tools):
+        tool["type"] = "function" if i % 2 else "resource"
+        tool["tags"] = ["finance", "billing"] if i % 3 == 0 else ["weather"]
+        tool["source"] = f"server{i % 5}"
+    return tools
+
+
+def names(results):
+    return {result["tool"]["name"] for result in results}
+
+
+def test_filter_values_are_ored_within_a_field_and_fields_are_anded(make_store):
+    store = make_store()
+    tools = tagged_catalog()
+    store.add_tools(tools)
+    query = tools[0]["description"]
+
+    assert names(store.search(query, 30, {"type": "resource"})) == {f"tool_{i}" for i in range(0, 30, 2)}
+    assert names(store.search(query, 30, {"source": ["server1", "server2"]})) == {
+        f"tool_{i}" for i in range(30) if i % 5 in (1, 2)
+    }
+    assert names(store.search(query, 30, {"tags": "billing", "type": "function"})) == {
+        f"tool_{i}" for i in range(30) if i % 3 == 0 and i % 2
+    }
+    assert store.search(query, 30, {"tags": "unknown"}) == []
+
+
+def test_filtered_results_keep_semantic_order_and_k(make_store):
+    store = make_store()
+    tools = tagged_catalog()
+    store.add_tools(tools)
+    query = tools[3]["description"]
+    unfiltered = [
+        result["tool"]["name"] for result in store.search(query, 30) if result["tool"]["tags"] == ["finance", "billing"]
+    ]
+    assert [result["tool"]["name"] for result in store.search(query, 3, {"tags": "finance"})] == unfiltered[:3]
+
+
+def test_filters_follow_upserts_and_deletes(make_store):
+    store = make_store()
+    tools = tagged_catalog()
+    store.add_tools(tools)
+    store.add_tools([{**tools[1], "source": "moved"}], upsert=True)
+    store.delete_tools([tools[2]["name"]])
+    query = tools[0]["description"]
+    assert names(store.search(query, 30, {"source": "moved"})) == {"tool_1"}
+    assert "tool_1" not in names(store.search(query, 30, {"source": "server1"}))
+    assert "tool_2" not in names(store.search(query, 30, {"source": "server2"}))
+
+    store.compact()
+    reopened = make_store()
+    assert names(reopened.search(query, 30, {"source": "moved"})) == {"tool_1"}
+
+
+def test_filtered_search_bypasses_the_ann_index(make_store):
+    store = make_store(index="hnsw")
+    tools = tagged_catalog()
+    store.add_tools(tools)
+    assert names(store.search(tools[0]["description"], 30, {"source": "server4"})) == {
+        f"tool_{i}" for i in range(30) if i % 5 == 4
+    }
+
+
+def test_unknown_filter_fields_are_rejected(make_store):
+    store = make_store()
+    store.add_tools(catalog(3))
+    with pytest.raises(ValueError, match="Cannot filter on color"):
+        store.search("word1", 3, {"color": "red"})
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from helpers import catalog
+from ingest_jobs import IngestJobManager
+
+
+class BlockingStore:
+    """Stands in for a store whose add_tools waits for the test, then succeeds or fails"""
+
+    count = 0
+
+    def __init__(self, error=None):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.error = error
+
+    def add_tools(self, tools, upsert=True, progress=None):
+        self.started.set()
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        progress(len(tools))
+        return {"added": len(tools), "updated": 0, "unchanged": 0}
+
+
+def wait(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.finished_at is None:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job.to_dict()
+
+
+def test_a_job_goes_from_queued_through_running_to_succeeded():
+    manager = IngestJobManager()
+    first_store, second_store = BlockingStore(), BlockingStore()
+    first = manager.submit(first_store, catalog(3))
+    second = manager.submit(second_store, catalog(2))
+    assert first_store.started.wait(5)
+    assert first.to_dict()["status"] == "running"
+    # Jobs run one at a time in submission order
+    assert second.to_dict()["status"] == "queued"
+    first_store.release.set()
+    second_store.release.set()
+    result = wait(first)
+    assert result["status"] == "succeeded"
+    assert (result["processed"], result["added"], result["error"]) == (3, 3, None)
+    assert result["started_at"] <= result["finished_at"]
+    assert wait(second)["status"] == "succeeded"
+    assert manager.list() == [first, second]
+    assert manager.get(second.job_id) is second
+    assert manager.get("unknown") is None
+
+
+def test_a_failing_job_reports_its_error():
+    manager = IngestJobManager()
+    store = BlockingStore(RuntimeError("disk full"))
+    store.release.set()
+    result = wait(manager.submit(store, catalog(3)))
+    assert result["status"] == "failed"
+    assert result["error"] == "disk full"
+    assert result["added"] is None
+
+
+def test_only_the_newest_finished_jobs_are_kept():
+    manager = IngestJobManager(max_finished=2)
+    store = BlockingStore()
+    store.release.set()
+    jobs = [manager.submit(store, catalog(1)) for _ in range(3)]
+    for job in jobs:
+        wait(job)
+    last = manager.submit(store, catalog(1))
+    assert manager.list()[:2] == jobs[1:]
+    assert manager.get(jobs[0].job_id) is None
+    wait(last)
+
+
+def test_a_job_adds_its_tools_to_the_store(make_store):
+    store = make_store()
+    result = wait(IngestJobManager().submit(store, catalog(20)))
+    assert result["status"] == "succeeded"
+    assert result["added"] == result["total_tools"] == store.count == 20
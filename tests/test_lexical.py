@@ -0,0 +1,80 @@
+import pytest
+
+from helpers import catalog
+from lexical import reciprocal_rank_fusion, tokenize
+
+
+def test_identifiers_are_tokenized_whole_and_by_parts():
+    assert tokenize("convert_currency getWeatherNow, HTTPServer v2") == [
+        "convert_currency", "convert", "currency",
+        "getweathernow", "get", "weather", "now",
+        "httpserver", "http", "server",
+        "v2", "v", "2",
+    ]
+
+
+def test_reciprocal_rank_fusion_sums_rank_contributions():
+    fused = reciprocal_rank_fusion(["a", "b"], ["b", "c"], k=1)
+    assert fused == {"a": 1 / 2, "b": 1 / 3 + 1 / 2, "c": 1 / 3}
+
+
+def named_catalog():
+    tools = catalog(40)
+    tools[7]["name"] = "convert_currency"
+    tools[7]["description"] = "exchange rates between moneys"
+    return tools
+
+
+def names(results):
+    return [result["tool"]["name"] for result in results]
+
+
+def test_lexical_search_finds_exact_names_and_reports_bm25_scores(make_store):
+    store = make_store()
+    store.add_tools(named_catalog())
+    results = store.search("convert_currency", 3, mode="lexical")
+    assert names(results)[0] == "convert_currency"
+    assert set(results[0]) == {"tool", "bm25_score"}
+    scores = [result["bm25_score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+    assert store.search("nonexistentterm", 3, mode="lexical") == []
+
+
+def test_lexical_index_follows_upserts_and_deletes(make_store):
+    store = make_store()
+    tools = named_catalog()
+    store.add_tools(tools)
+    assert names(store.search("moneys", 5, mode="lexical")) == ["convert_currency"]
+    store.add_tools([{**tools[7], "description": "foreign cash"}], upsert=True)
+    assert store.search("moneys", 5, mode="lexical") == []
+    assert names(store.search("cash", 5, mode="lexical")) == ["convert_currency"]
+    store.delete_tools(["convert_currency"])
+    assert store.search("cash", 5, mode="lexical") == []
+
+
+def test_lexical_search_honours_filters(make_store):
+    store = make_store()
+    tools = named_catalog()
+    tools[7]["type"] = "resource"
+    store.add_tools(tools)
+    assert store.search("convert_currency", 5, {"type": "function"}, mode="lexical") == []
+    assert names(store.search("convert_currency", 5, {"type": "resource"}, mode="lexical")) == ["convert_currency"]
+
+
+def test_hybrid_search_fuses_both_rankings(make_store):
+    store = make_store()
+    store.add_tools(named_catalog())
+    results = store.search("convert_currency", 5, mode="hybrid")
+    assert len(results) == 5
+    assert names(results)[0] == "convert_currency"
+    assert set(results[0]) == {"tool", "similarity_score", "bm25_score", "fused_score"}
+    assert results[0]["bm25_score"] > 0
+    fused = [result["fused_score"] for result in results]
+    assert fused == sorted(fused, reverse=True)
+
+
+def test_unknown_modes_are_rejected(make_store):
+    store = make_store()
+    store.add_tools(catalog(3))
+    with pytest.raises(ValueError, match="Unknown search mode"):
+        store.search("word1", 3, mode="fuzzy")
@@ -0,0 +1,42 @@
+import numpy as np
+
+from helpers import catalog
+
+OPTIONS = dict(serialization_template="compact", max_tool_tokens=16, multi_vector=True)
+
+
+def long_catalog(count):
+    """Tools with more parameters than fit the token budget, so every one gets chunks"""
+    rng = np.random.default_rng(7)
+    words = [f"word{i}" for i in range(300)]
+    tools = catalog(count)
+    for tool in tools:
+        tool["parameters"] = {"properties": {
+            f"p{j}": {"type": "string", "description": " ".join(rng.choice(words, 4))} for j in range(6)
+        }}
+    return tools
+
+
+def ranking(store, query, k):
+    return [(result["tool"]["name"], round(result["similarity_score"], 5)) for result in store.search(query, k)]
+
+
+def test_untrained_ivf_with_chunks_matches_exact_search(make_store):
+    exact = make_store("exact.json", **OPTIONS)
+    ivf = make_store("ivf.json", index="ivf", **OPTIONS)
+    tools = long_catalog(120)
+    # Upserts leave stale rows, deletes dead ones; both keep their chunks until a vacuum
+    changed = [{**tool, "description": f"{tool['description']} revised"} for tool in tools[::5]]
+    deleted = [tool["name"] for tool in tools[1::9]]
+    for store in (exact, ivf):
+        store.add_tools(tools)
+        store.add_tools(changed, upsert=True)
+        store.delete_tools(deleted)
+        assert store.memory_stats()["chunk_vectors"] > 0
+    rng = np.random.default_rng(3)
+    queries = [tool["parameters"]["properties"]["p2"]["description"] for tool in tools[::3]]
+    queries += [" ".join(rng.choice([f"word{i}" for i in range(300)], 3)) for _ in range(40)]
+    for query in queries:
+        expected = ranking(exact, query, 10)
+        assert len(expected) == 10
+        assert ranking(ivf, query, 10) == expected
@@ -0,0 +1,106 @@
+import pytest
+
+import metrics
+import tools_store
+from helpers import DIM, HashingEncoder, catalog
+from namespaces import DEFAULT_NAMESPACE, InvalidNamespaceError, NamespaceManager, UnknownNamespaceError
+
+TOOLS = 20
+# Room for two namespaces of TOOLS float32 rows, not three
+BUDGET_MB = 2.5 * TOOLS * DIM * 4 / 1024 / 1024
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    encoder = HashingEncoder()
+    monkeypatch.setattr(tools_store, "get_encoder", lambda model_name, backend: (encoder, 0.0))
+    monkeypatch.setattr(tools_store, "tools_stores", {})
+    monkeypatch.setitem(tools_store.default_store_config, "storage_path", str(tmp_path / "default.json"))
+    monkeypatch.setitem(tools_store.default_store_config, "options", {"warm_up": False})
+    manager = NamespaceManager(str(tmp_path / "namespaces"), BUDGET_MB, warm_up=False)
+    yield manager
+    for thread in list(manager._closing.values()):
+        thread.join()
+    for store in [*manager._stores.values(), *tools_store.tools_stores.values()]:
+        store.close()
+
+
+def fill(manager, namespace):
+    store = manager.acquire(namespace, create=True)
+    try:
+        store.add_tools(catalog(TOOLS, namespace))
+    finally:
+        manager.release(namespace)
+
+
+def loaded(manager):
+    return {entry["namespace"] for entry in manager.list() if entry["loaded"]} - {DEFAULT_NAMESPACE}
+
+
+def test_namespace_names_are_validated():
+    assert NamespaceManager.resolve(None) == NamespaceManager.resolve("") == DEFAULT_NAMESPACE
+    assert NamespaceManager.resolve("team-a.v2") == "team-a.v2"
+    for name in ("../etc", "-x", "a" * 65, "a b"):
+        with pytest.raises(InvalidNamespaceError):
+            NamespaceManager.resolve(name)
+
+
+def test_unknown_namespaces_are_only_created_on_request(manager):
+    with pytest.raises(UnknownNamespaceError):
+        manager.acquire("team")
+    fill(manager, "team")
+    listed = {entry["namespace"]: entry for entry in manager.list()}
+    assert set(listed) == {DEFAULT_NAMESPACE, "team"}
+    assert listed["team"]["total_tools"] == TOOLS and listed["team"]["in_use"] == 0
+    assert manager.acquire(DEFAULT_NAMESPACE) is tools_store.get_store()
+
+
+def test_the_least_recently_used_unpinned_namespace_is_evicted(manager):
+    fill(manager, "a")
+    fill(manager, "b")
+    assert loaded(manager) == {"a", "b"} and manager.evictions == 0
+
+    # Pinned and most recently used, so b goes first
+    manager.acquire("a")
+    fill(manager, "c")
+    assert loaded(manager) == {"a", "c"} and manager.evictions == 1
+    assert manager.memory_bytes() <= manager.memory_budget_bytes
+    manager.release("a")
+
+    # An evicted namespace is loaded again from its files on the next request
+    store = manager.acquire("b")
+    assert store.count == TOOLS
+    assert store.search("b_3", 1, mode="lexical")[0]["tool"]["name"] == "b_3"
+    manager.release("b")
+    assert loaded(manager) == {"b", "c"} and manager.evictions == 2
+
+
+def test_pinned_namespaces_are_kept_over_the_budget(manager):
+    for name in ("a", "b"):
+        fill(manager, name)
+    stores = [manager.acquire(name) for name in ("a", "b")]
+    fill(manager, "c")
+    assert loaded(manager) == {"a", "b"}
+    for name in ("a", "b"):
+        manager.release(name)
+    assert manager.loaded_count == 2
+    assert all(store.count == TOOLS for store in stores)
+
+
+def test_store_metrics_are_labeled_by_loaded_namespace(manager):
+    fill(manager, "a")
+    fill(manager, "b")
+    metrics.record_stores(manager.loaded_stores())
+    rendered = metrics.render()
+    for name in ("a", "b"):
+        assert f'one_mcp_tools{{namespace="{name}"}} {TOOLS}' in rendered
+        assert f'one_mcp_embedding_bytes{{namespace="{name}",precision="float32"}} {TOOLS * DIM * 4}' in rendered
+        assert f'one_mcp_cache_entries{{namespace="{name}",cache="tool_embeddings"}}' in rendered
+    assert f'one_mcp_tools{{namespace="{DEFAULT_NAMESPACE}"}} 0' in rendered
+
+    # a, the least recently used, is evicted and drops out of the per-namespace gauges
+    fill(manager, "c")
+    metrics.record_stores(manager.loaded_stores())
+    rendered = metrics.render()
+    assert 'namespace="a"' not in rendered
+    assert 'one_mcp_tools{namespace="c"}' in rendered
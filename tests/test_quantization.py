@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import tools_store
+from helpers import catalog
+from quantization import Quantizer
+from similarity import normalize_rows
+
+
+def unit_rows(count, dim=32, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32))
+
+
+def test_unknown_dtype_and_negative_dim_are_rejected():
+    with pytest.raises(ValueError):
+        Quantizer("int4")
+    with pytest.raises(ValueError):
+        Quantizer("int8", -1)
+
+
+def test_names_and_enabled():
+    assert not Quantizer().enabled
+    assert Quantizer("float32", 16).enabled
+    assert Quantizer("int8").name == "int8"
+    assert Quantizer("float16", 128).name == "float16-128"
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scores_approximate_exact_cosine(dtype):
+    rows = unit_rows(100)
+    queries = unit_rows(5, seed=1)
+    codes, scales = Quantizer(dtype).encode(rows)
+    assert codes.dtype == np.dtype(dtype)
+    assert (scales is not None) == (dtype == "int8")
+    np.testing.assert_allclose(Quantizer.scores(queries, codes, scales), queries @ rows.T, atol=0.02)
+
+
+def test_truncated_rows_are_renormalized():
+    quantizer = Quantizer("float32", 8)
+    truncated = quantizer.truncate(unit_rows(10))
+    assert truncated.shape == (10, 8)
+    np.testing.assert_allclose(np.linalg.norm(truncated, axis=1), 1.0, rtol=1e-5)
+
+
+@pytest.mark.parametrize("options", [
+    {"embedding_dtype": "int8"},
+    # Half of the hashing encoder's dimensions rank coarsely, so rescore deeper
+    {"embedding_dtype": "float16", "embedding_dim": 32, "rescore_factor": 20},
+])
+def test_rescored_results_match_full_precision_search(make_store, options):
+    tools = catalog(300)
+    exact = make_store("exact.json")
+    quantized = make_store("quantized.json", **options)
+    exact.add_tools(tools)
+    quantized.add_tools(tools)
+    quantized.compact()
+    reopened = make_store("quantized.json", **options)
+    for tool in tools[:20]:
+        expected = exact.search(tool["description"], 5)
+        for store in (quantized, reopened):
+            results = store.search(tool["description"], 5)
+            assert [result["tool"]["name"] for result in results] == [result["tool"]["name"] for result in expected]
+            # Rescored against the full-precision rows
+            assert [result["similarity_score"] for result in results] == pytest.approx(
+                [result["similarity_score"] for result in expected], abs=1e-5
+            )
+
+
+def test_memory_stats_report_the_quantized_copy(make_store):
+    store = make_store(embedding_dtype="int8")
+    store.add_tools(catalog(50))
+    stats = store.memory_stats()
+    assert stats["encoding"] == "int8"
+    assert stats["full_precision_bytes"] == 50 * 64 * 4
+    assert stats["quantized_bytes"] == 50 * 64 + 50 * 4
+    assert make_store("plain.json").memory_stats()["quantized_bytes"] == 0
+
+
+def test_full_precision_rows_stay_out_of_memory_through_vacuum_and_compaction(make_store, monkeypatch):
+    monkeypatch.setattr(tools_store, "VACUUM_MIN_TOMBSTONES", 8)
+    store = make_store(embedding_dtype="int8")
+    tools = catalog(100)
+    store.add_tools(tools[:60])
+    store.compact()
+    store.add_tools(tools[60:])
+
+    def check(expected_rows):
+        stats = store.memory_stats()
+        assert stats["full_precision_bytes"] == expected_rows * 64 * 4
+        assert stats["full_precision_resident_bytes"] == 0
+        assert all(isinstance(segment, np.memmap) for segment in store._segments())
+        assert store.search(tools[90]["description"], 1)[0]["tool"]["name"] == "tool_90"
+
+    check(100)
+    store.delete_tools([tool["name"] for tool in tools[:30]])
+    # Enough tombstones to vacuum
+    assert store._tombstones == 0 and len(store.tools) == 70
+    check(70)
+    store.compact()
+    check(70)
+    store.add_tools(catalog(120)[100:])
+    check(90)
+
+    plain = make_store("plain.json")
+    plain.add_tools(tools)
+    assert plain.memory_stats()["full_precision_resident_bytes"] == 100 * 64 * 4
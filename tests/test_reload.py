@@ -0,0 +1,61 @@
+import shutil
+
+from helpers import catalog
+
+
+def names(store):
+    return {result["tool"]["name"] for result in store.search("word1", store.count + 10)}
+
+
+def copy_store(source, target):
+    """Copy a store's files the documented way: arrays first, the metadata file last"""
+    for path in sorted(source.parent.glob(f"{source.stem}.*.npy")):
+        shutil.copy(path, target.parent / path.name)
+    shutil.copy(source, target)
+
+
+def test_reload_does_not_replay_logs_onto_a_snapshot_from_elsewhere(make_store, tmp_path):
+    (tmp_path / "live").mkdir()
+    (tmp_path / "offline").mkdir()
+    live = make_store("live/tools.json")
+    live.add_tools(catalog(2, "old"))
+    live.compact()
+    # Logged on top of live's snapshot, with an id the offline snapshot also uses
+    live.add_tools(catalog(3, "old")[2:])
+    offline = make_store("offline/tools.json")
+    offline.add_tools(catalog(3, "new"))
+    offline.compact()
+    assert offline.storage.generation == live.storage.generation
+    # Same generation, yet copying does not overwrite the file live has memory-mapped
+    assert offline.storage.embeddings_file != live.storage.embeddings_file
+
+    copy_store(tmp_path / "offline/tools.json", tmp_path / "live/tools.json")
+    result = live.reload()
+    assert result["total_tools"] == 3
+    assert names(live) == {"new_0", "new_1", "new_2"}
+    assert list((tmp_path / "live").glob("*.wal.discarded"))
+
+    # New writes are logged under the new lineage and survive a restart
+    live.add_tools(catalog(1, "later"))
+    live.close()
+    restarted = make_store("live/tools.json")
+    assert names(restarted) == {"new_0", "new_1", "new_2", "later_0"}
+
+
+def test_reload_keeps_logs_of_the_same_store(make_store):
+    store = make_store()
+    store.add_tools(catalog(3))
+    store.compact()
+    store.add_tools(catalog(5)[3:])
+    other = make_store()
+    assert other.reload()["total_tools"] == 5
+    assert names(other) == {f"tool_{i}" for i in range(5)}
+
+
+def test_reload_before_the_first_snapshot(make_store):
+    assert make_store("empty.json").reload()["total_tools"] == 0
+    store = make_store()
+    store.add_tools(catalog(4))
+    assert not store.storage_path.exists()
+    result = store.reload()
+    assert result["total_tools"] == result["previous_tools"] == 4
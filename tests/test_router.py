@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from router import ShardError, ShardRouter  # noqa: E402
+
+
+def routed(answers):
+    """A router whose shards answer with `answers` (a ShardError is raised, None means no such namespace)"""
+    router = ShardRouter([f"http://shard{i}" for i in range(len(answers))])
+
+    async def call(shard, method, path, namespace=None, payload=None, write=False):
+        if isinstance(answers[shard], ShardError):
+            raise answers[shard]
+        return answers[shard]
+
+    router._call = call
+    return router
+
+
+def test_stats_without_answers_reports_the_failed_shards():
+    router = routed([None, ShardError("Shard http://shard1 is unreachable")])
+    with pytest.raises(ShardError) as raised:
+        asyncio.run(router.stats("team"))
+    assert raised.value.status_code == 502
+    assert raised.value.failed_shards == ["http://shard1"]
+
+
+def test_stats_sums_the_shards_that_answered():
+    answer = {"namespace": "team", "total_tools": 3, "model": "m", "backend": "torch"}
+    router = routed([answer, ShardError("Shard http://shard1 is unreachable"), {**answer, "total_tools": 4}])
+    stats = asyncio.run(router.stats("team"))
+    assert stats["total_tools"] == 7
+    assert stats["shards"][-1] == {"url": "http://shard1", "error": "did not answer"}
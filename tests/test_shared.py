@@ -0,0 +1,53 @@
+import threading
+import traceback
+
+import pytest
+
+from helpers import catalog
+
+pytest.importorskip("fcntl")
+
+
+def test_compaction_while_readers_refresh(make_store):
+    """Two processes' worth of stores write, compact in the background and refresh at once"""
+    stores = [make_store(shared=True), make_store(shared=True)]
+    errors = []
+    writing = threading.Event()
+
+    def write(store, prefix):
+        try:
+            tools = catalog(150, prefix)
+            for i in range(0, len(tools), 2):
+                store.add_tools(tools[i:i + 2])
+                store.compact(background=True)
+        except Exception:
+            errors.append(traceback.format_exc())
+
+    def read(store):
+        last = 0
+        while writing.is_set():
+            try:
+                store.refresh()
+            except Exception:
+                errors.append(traceback.format_exc())
+                continue
+            if store.count < last:
+                errors.append(f"Tool count went back from {last} to {store.count}")
+            last = store.count
+
+    writing.set()
+    writers = [threading.Thread(target=write, args=(store, f"p{i}")) for i, store in enumerate(stores)]
+    readers = [threading.Thread(target=read, args=(store,)) for store in stores]
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writing.clear()
+    for thread in readers:
+        thread.join()
+    assert not errors, errors[0]
+    for store in stores:
+        if store._compaction_thread is not None:
+            store._compaction_thread.join()
+        store.refresh()
+        assert store.count == 300
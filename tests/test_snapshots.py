@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+from helpers import catalog
+
+BATCH = 10
+
+
+def batch(number):
+    return [{**tool, "source": f"batch{number}"} for tool in catalog(BATCH, f"batch{number}")]
+
+
+def test_searches_see_all_of_a_write_or_none_of_it(make_store):
+    store = make_store()
+    store.add_tools(catalog(20))
+    done = threading.Event()
+    seen = []
+    errors = []
+
+    def search():
+        try:
+            number = 0
+            while not done.is_set():
+                number = (number + 1) % 30
+                results = store.search("word1 word2", 100, {"source": f"batch{number}"})
+                seen.append(len(results))
+                lexical = [
+                    result for result in store.search(f"batch{number}", 100, mode="lexical")
+                    if result["tool"].get("source") == f"batch{number}"
+                ]
+                seen.append(len(lexical))
+        except Exception as e:
+            errors.append(e)
+
+    searchers = [threading.Thread(target=search) for _ in range(3)]
+    for thread in searchers:
+        thread.start()
+    try:
+        for number in range(30):
+            store.add_tools(batch(number))
+            # Upserts replace the whole batch at once
+            store.add_tools([{**tool, "description": "word1 " + tool["description"]} for tool in batch(number)], upsert=True)
+            if number >= 2:
+                store.delete_tools([tool["name"] for tool in batch(number - 2)])
+    finally:
+        done.set()
+        for thread in searchers:
+            thread.join()
+    assert not errors
+    assert set(seen) <= {0, BATCH}
+    assert BATCH in seen
+
+
+def test_a_published_snapshot_does_not_change_after_later_writes(make_store):
+    store = make_store()
+    store.add_tools(catalog(10))
+    snapshot = store._snapshot
+    rows = snapshot.visible(np.arange(snapshot.rows))
+    store.add_tools(catalog(15)[10:])
+    store.add_tools([{**catalog(10)[0], "description": "replaced"}], upsert=True)
+    store.delete_tools(["tool_1", "tool_2"])
+    assert snapshot.count == 10
+    assert (snapshot.visible(np.arange(snapshot.rows)) == rows).all()
+    assert store._snapshot.count == 13
+    assert snapshot.version < store._snapshot.version
+
+
+@pytest.mark.parametrize("kind", ["hnsw", "ivf"])
+def test_ann_results_resolve_against_the_snapshot_searched(make_store, kind):
+    tools = catalog(50)
+    exact = make_store("exact.json")
+    exact.add_tools(tools)
+    store = make_store(index=kind)
+    store.add_tools(tools)
+    snapshot = store._snapshot
+    # The shared index now returns tool_3 for its new text, but the snapshot holds its old row
+    store.add_tools([{**tools[3], "description": "moved elsewhere"}], upsert=True)
+    current = store._snapshot
+    try:
+        store._snapshot = snapshot
+        found = {result["tool"]["name"]: result for result in store.search("moved elsewhere", 50)}
+    finally:
+        store._snapshot = current
+    expected = {result["tool"]["name"]: result for result in exact.search("moved elsewhere", 50)}
+    assert found["tool_3"]["tool"] is tools[3]
+    assert found["tool_3"]["similarity_score"] == pytest.approx(expected["tool_3"]["similarity_score"], abs=1e-5)
+    assert store.search("moved elsewhere", 1)[0]["tool"]["description"] == "moved elsewhere"
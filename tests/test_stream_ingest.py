@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from helpers import catalog
+from stream_ingest import ToolStreamParser, ingest_stream
+
+TOOLS = [
+    {"name": "a", "description": "first tool, with [brackets] and \"quotes\""},
+    {"name": "b", "description": "zweites Werkzeug für Ümlaute"},
+    {"name": "c", "description": "third\ntool", "tags": ["x", "y"]},
+]
+
+
+def parse(data, chunk_size):
+    parser = ToolStreamParser()
+    tools = []
+    for start in range(0, len(data), chunk_size):
+        tools.extend(parser.feed(data[start:start + chunk_size]))
+    return tools + parser.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1 << 20])
+@pytest.mark.parametrize("document", [
+    "\n".join(json.dumps(tool, ensure_ascii=False) for tool in TOOLS) + "\n",
+    json.dumps(TOOLS, ensure_ascii=False, indent=2),
+    json.dumps(TOOLS, ensure_ascii=False, separators=(",", ":")),
+])
+def test_ndjson_and_arrays_parse_across_any_chunk_boundaries(document, chunk_size):
+    assert parse(document.encode(), chunk_size) == TOOLS
+
+
+def test_a_single_object_is_one_tool():
+    assert parse(json.dumps(TOOLS[0]).encode(), 3) == [TOOLS[0]]
+
+
+@pytest.mark.parametrize("document, message", [
+    (b'[{"name": "a"}, {"name": "b"}', "not closed"),
+    (b'[{"name": "a"}] {"name": "b"}', "after the end"),
+    (b'{"name": "a"}\n42\n', "Expected a tool object"),
+    (b'{"name": "a"', "Invalid JSON"),
+])
+def test_malformed_input_is_rejected(document, message):
+    with pytest.raises(ValueError, match=message):
+        parse(document, 4)
+
+
+def test_tools_before_a_malformed_line_are_kept():
+    parser = ToolStreamParser()
+    with pytest.raises(ValueError, match="Invalid JSON"):
+        parser.feed(b'{"name": "a"}\n{"name": "b"}\n{"name": oops}\n{"name": "c"}\n')
+    assert parser.take() == [{"name": "a"}, {"name": "b"}]
+
+
+def test_an_oversized_tool_is_rejected():
+    parser = ToolStreamParser(max_tool_bytes=32)
+    with pytest.raises(ValueError, match="larger than 32 bytes"):
+        parser.feed(b'{"name": "a", "description": "' + b"x" * 64)
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def events(store, data, chunk_size):
+    async def collect():
+        return [event async for event in ingest_stream(store, chunked(data, 5), chunk_size=chunk_size)]
+
+    return asyncio.run(collect())
+
+
+def test_ingest_commits_chunks_and_reports_progress(make_store):
+    store = make_store()
+    data = "".join(json.dumps(tool) + "\n" for tool in catalog(5)).encode()
+    progress = events(store, data, chunk_size=2)
+    assert [event["event"] for event in progress] == ["progress", "progress", "done"]
+    assert [event["received"] for event in progress] == [2, 4, 5]
+    assert progress[-1]["added"] == progress[-1]["total_tools"] == store.count == 5
+
+
+def test_ingest_keeps_the_tools_before_an_error(make_store):
+    store = make_store()
+    data = "".join(json.dumps(tool) + "\n" for tool in catalog(3)).encode() + b"{broken\n"
+    progress = events(store, data, chunk_size=2)
+    assert progress[-1]["event"] == "error"
+    assert "Invalid JSON" in progress[-1]["detail"]
+    assert progress[-1]["received"] == store.count == 3
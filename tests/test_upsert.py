@@ -0,0 +1,44 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from helpers import catalog
+from models import ToolsInput
+from stream_ingest import ToolStreamParser
+
+
+def names(store):
+    return sorted(result["tool"]["name"] for result in store.search("word1", store.count + 10))
+
+
+def test_uploads_append_unless_upsert_is_asked_for(make_store):
+    store = make_store()
+    tools = catalog(3)
+    store.add_tools(tools)
+    result = store.add_tools(tools[:1])
+    assert (result["added"], result["updated"]) == (1, 0)
+    assert names(store) == ["tool_0", "tool_0", "tool_1", "tool_2"]
+
+    store = make_store("upsert.json")
+    store.add_tools(tools)
+    assert store.add_tools(tools[:1], upsert=True)["unchanged"] == 1
+    result = store.add_tools([{**tools[1], "description": "changed"}], upsert=True)
+    assert (result["added"], result["updated"]) == (0, 1)
+    assert names(store) == ["tool_0", "tool_1", "tool_2"]
+    assert ToolsInput(tools=tools).upsert is False
+
+
+@pytest.mark.parametrize("name", [["a", "b"], {"a": 1}, 7, None])
+def test_tool_names_must_be_strings(make_store, name):
+    store = make_store()
+    for upsert in (False, True):
+        with pytest.raises(ValueError, match="name must be a string"):
+            store.add_tools([*catalog(2), {"name": name, "description": "x"}], upsert=upsert)
+    assert store.count == 0
+    with pytest.raises(ValidationError, match="name must be a string"):
+        ToolsInput(tools=[{"name": name}])
+    parser = ToolStreamParser()
+    with pytest.raises(ValueError, match="name must be a string"):
+        parser.feed(b'{"name": "ok"}\n' + json.dumps({"name": name}).encode() + b"\n")
+    assert parser.take() == [{"name": "ok"}]
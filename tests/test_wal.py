@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from helpers import catalog
+
+
+def names(store):
+    return {result["tool"]["name"] for result in store.search("word1", store.count + 10)}
+
+
+def wal_files(tmp_path):
+    return sorted(tmp_path.glob("tools.*.wal"))
+
+
+def test_logged_writes_are_replayed_without_a_snapshot(make_store, tmp_path):
+    store = make_store()
+    store.add_tools(catalog(6))
+    store.delete_tools(["tool_1"])
+    store.add_tools([{**catalog(6)[2], "description": "replaced"}], upsert=True)
+    assert not (tmp_path / "tools.json").exists()
+    assert wal_files(tmp_path)
+
+    reopened = make_store()
+    assert names(reopened) == {"tool_0", "tool_2", "tool_3", "tool_4", "tool_5"}
+    assert reopened.search("replaced", 1)[0]["tool"]["name"] == "tool_2"
+
+
+def test_logged_writes_are_replayed_on_top_of_the_snapshot(make_store):
+    store = make_store()
+    store.add_tools(catalog(4))
+    store.compact()
+    store.delete_tools(["tool_0"])
+    store.add_tools(catalog(6)[4:])
+    assert names(make_store()) == {"tool_1", "tool_2", "tool_3", "tool_4", "tool_5"}
+
+
+def test_a_torn_last_record_is_dropped(make_store, tmp_path):
+    store = make_store()
+    store.add_tools(catalog(3))
+    store.close()
+    [wal] = wal_files(tmp_path)
+    with open(wal, "ab") as f:
+        f.write(b'{"op": "delete", "names": ["tool_0"')
+
+    reopened = make_store()
+    assert names(reopened) == {"tool_0", "tool_1", "tool_2"}
+    # New records start on a fresh line and survive the next restart
+    reopened.add_tools(catalog(4)[3:])
+    reopened.close()
+    assert names(make_store()) == {"tool_0", "tool_1", "tool_2", "tool_3"}
+
+
+def test_a_corrupt_record_before_others_fails_the_load(make_store, tmp_path):
+    store = make_store()
+    store.add_tools(catalog(2))
+    store.add_tools(catalog(3)[2:])
+    store.close()
+    [wal] = wal_files(tmp_path)
+    lines = wal.read_bytes().splitlines(keepends=True)
+    lines[1] = b"garbage\n"
+    wal.write_bytes(b"".join(lines))
+
+    with pytest.raises(ValueError, match="Corrupt log record"):
+        make_store()
+    assert wal.read_bytes() == b"".join(lines)
+
+
+def test_an_unreadable_snapshot_fails_the_load_and_is_left_alone(make_store, tmp_path):
+    store = make_store()
+    store.add_tools(catalog(3))
+    store.compact()
+    store.close()
+    meta = tmp_path / "tools.json"
+    embeddings = tmp_path / json.loads(meta.read_text())["embeddings_file"]
+
+    embeddings.rename(embeddings.with_name("moved.npy"))
+    with pytest.raises(FileNotFoundError):
+        make_store()
+    embeddings.with_name("moved.npy").rename(embeddings)
+
+    meta.write_text(meta.read_text()[:-10])
+    with pytest.raises(ValueError):
+        make_store()
+    assert embeddings.exists()
+    assert len(list(tmp_path.glob("tools.*.npy"))) == 1
@@ -1,149 +1,1651 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import json
-from typing import List, Dict, Any
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 from pathlib import Path
+import metrics
 from logging_setup import get_logger
+from storage import EmbeddingStorage
+from similarity import normalize_rows, top_k
+from ann_index import VectorIndex, create_index
+from cache import EmbeddingCache, LRUCache
+from encoders import encoder_id, get_encoder
+from quantization import BLOCK_ROWS, Quantizer
+from lexical import BM25Index, reciprocal_rank_fusion
+from serialization import ToolSerializer
 
 logger = get_logger(__name__)
 tools_stores = {}
+# Storage path and options used by get_store() when called without a path (set by create_app)
+default_store_config: Dict[str, Any] = {"storage_path": "tool_embeddings.json", "options": {}}
+
+DEFAULT_ENCODE_BATCH_SIZE = 64
+DEFAULT_COMPACT_THRESHOLD_MB = 64
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_EMBEDDING_CACHE_SIZE = 100_000
+# Stored embeddings from another backend are kept if a sample re-encodes at least this similar
+COMPATIBLE_MIN_SIMILARITY = 0.98
+COMPATIBILITY_SAMPLE_SIZE = 32
+REEMBED_BATCH_SIZE = 1024
+# With a progress callback, tools are encoded and reported this many at a time
+PROGRESS_STEP = 1024
+# Quantized searches rescore this many candidates per requested result at full precision
+DEFAULT_RESCORE_FACTOR = 4
+# Top-level tool fields with an inverted index that searches can filter on
+DEFAULT_FILTER_FIELDS = ("type", "tags", "source", "namespace")
+SEARCH_MODES = ("semantic", "lexical", "hybrid")
+# Hybrid search fuses at least this many candidates from each of the semantic and lexical rankings
+HYBRID_CANDIDATES = 50
+# Deleted rows are only tombstoned; the matrix is compacted once they make up this share of it
+VACUUM_TOMBSTONE_RATIO = 0.25
+VACUUM_MIN_TOMBSTONES = 1024
+
+
+# Settings of stores written before serialization was configurable
+DEFAULT_SERIALIZATION = ToolSerializer().signature
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of a tool's serialized text, used to detect unchanged re-uploads"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ChunkVectors:
+    """
+    Multi-vector chunk embeddings: segments like the matrix's, plus the row
+    each chunk belongs to. Chunks are appended with their rows, so the rows
+    never decrease and each tool's chunks are contiguous.
+    """
+
+    def __init__(self, segments: List[np.ndarray], row_segments: List[np.ndarray]):
+        self.segments = segments
+        self.row_segments = row_segments
+        self.count = sum(len(segment) for segment in segments)
+        self.nbytes = sum(segment.nbytes for segment in segments)
+        self._rows: Optional[np.ndarray] = None
+        self._groups: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The row of every chunk, computed on first use"""
+        if self._rows is None:
+            segments = self.row_segments
+            self._rows = np.asarray(segments[0] if len(segments) == 1 else np.concatenate(segments), dtype=np.int64)
+        return self._rows
+
+    @property
+    def groups(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(index of each row's first chunk, the rows) for pooling all chunk scores in one pass"""
+        if self._groups is None:
+            rows = self.rows
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            self._groups = (starts, rows[starts])
+        return self._groups
+
+    def pool(self, scores: np.ndarray, query_embeddings: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Raise each (query, row) score to the best score of that row's chunks,
+        in place. `scores` covers every row, or just `rows` (sorted or not)
+        when they are given.
+        """
+        if not self.count:
+            return scores
+        if rows is None:
+            starts, owners = self.groups
+            chunk_scores = np.hstack([query_embeddings @ segment.T for segment in self.segments])
+            best = np.maximum.reduceat(chunk_scores, starts, axis=1)
+            scores[:, owners] = np.maximum(scores[:, owners], best)
+            return scores
+        rows = np.asarray(rows, dtype=np.int64)
+        first = np.searchsorted(self.rows, rows, "left")
+        counts = np.searchsorted(self.rows, rows, "right") - first
+        has_chunks = counts > 0
+        if not has_chunks.any():
+            return scores
+        counts = counts[has_chunks]
+        starts = np.cumsum(counts) - counts
+        # Each row's chunk indices, laid out back to back
+        chunks = np.repeat(first[has_chunks] - starts, counts) + np.arange(int(counts.sum()))
+        vectors = ToolsStore._gather_rows(self.segments, chunks)
+        best = np.maximum.reduceat(query_embeddings @ vectors.T, starts, axis=1)
+        scores[:, has_chunks] = np.maximum(scores[:, has_chunks], best)
+        return scores
+
+    def best_rows(self, query_embedding: np.ndarray, k: int, limit: int, dead: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The `k` rows below `limit` (and not `dead`) whose best chunk is most
+        similar to the query, best first. Rows are ranked by their best chunk,
+        so k chunks of one tool never crowd out the other tools.
+        """
+        if not self.count:
+            return np.zeros(0, dtype=np.int64)
+        starts, owners = self.groups
+        chunk_scores = np.concatenate([segment @ query_embedding for segment in self.segments])
+        best = np.maximum.reduceat(chunk_scores, starts)
+        keep = owners < limit
+        if dead is not None:
+            keep[keep] = ~dead[owners[keep]]
+        owners, best = owners[keep], best[keep]
+        return owners[top_k(best, k)]
+
+
+class StoreSnapshot:
+    """
+    Immutable view of a ToolsStore, published after every write.
+
+    Searches read the current snapshot with a single attribute access and
+    never take the store lock. Nothing a snapshot references changes after
+    it is published: rows and index postings are only ever appended past
+    `rows`, tombstones only clear the store's own live mask (the snapshot
+    keeps its own dead-row mask), and vacuums and reloads build new objects.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        tools: List[Dict[str, Any]],
+        rows: int,
+        segments: List[np.ndarray],
+        quantized: Optional[List[Tuple[np.ndarray, Optional[np.ndarray]]]],
+        dead: Optional[np.ndarray],
+        field_index: Dict[str, Dict[str, List[int]]],
+        lexical: Optional[BM25Index],
+        id_rows: Dict[int, List[int]],
+        index: Optional[VectorIndex],
+        chunks: Optional[ChunkVectors] = None,
+    ):
+        self.version = version
+        # Only the first `rows` entries belong to this snapshot
+        self.tools = tools
+        self.rows = rows
+        self.segments = segments
+        self.quantized = quantized
+        # True for tombstoned rows; None when there are none
+        self.dead = dead
+        self.count = rows - (0 if dead is None else int(np.count_nonzero(dead)))
+        self.field_index = field_index
+        self.lexical = lexical
+        self.lexical_stats = lexical.stats() if lexical is not None else None
+        # Every row each tool id has had; shared with writers, who only append to the
+        # lists, so rows past `rows` are skipped like index postings
+        self.id_rows = id_rows
+        # The ANN index is updated in place by writes (under its own lock), but a reload
+        # builds a new one, so searches keep the index that matches the snapshot they read
+        self.index = index
+        # Multi-vector chunk embeddings of the first `rows` rows, if any
+        self.chunks = chunks
+
+    def visible(self, rows: np.ndarray) -> np.ndarray:
+        """The given rows that are live in this snapshot"""
+        rows = rows[rows < self.rows]
+        return rows if self.dead is None else rows[~self.dead[rows]]
+
+    def resolve(self, ids: List[int]) -> np.ndarray:
+        """The row of each tool id as of this snapshot (its last one below `rows`), -1 for ids it never held"""
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        for i, tool_id in enumerate(ids):
+            for row in reversed(self.id_rows.get(tool_id, ())):
+                if row < self.rows:
+                    rows[i] = row
+                    break
+        return rows
+
 
 class ToolsStore:
-    def __init__(self, storage_path: str = "tool_embeddings.json"):
-        self.tools: List[Dict[str, Any]] = []
-        self.embeddings: np.ndarray = None
+    """
+    Tool definitions plus their embeddings.
+    Embeddings are kept as an L2-normalized float32 matrix so cosine similarity
+    is a single dot product at query time. Every tool also gets a stable integer
+    id, which is what the optional ANN index is labelled with.
+
+    `tools[i]` describes row i of the matrix. The rows loaded from the
+    snapshot stay memory-mapped (and so are shared with any other process
+    serving the same store); rows added later go to a private growable
+    buffer. Deleted and replaced rows are tombstoned (masked out of
+    searches) rather than removed, so deletes cost O(deleted); the matrix is
+    vacuumed once enough tombstones pile up. Tools are also indexed by name
+    for deletes and upserts, and by the values of their `filter_fields` so
+    filtered searches only score matching rows. A BM25 index over the
+    serialized tools, built on the first lexical or hybrid search and then
+    maintained on every change, serves keyword lookups without the model.
+
+    Writers serialize on a lock and publish a StoreSnapshot when they are
+    done; searches only read the latest snapshot, so they never wait for a
+    write and always see either all of it or none of it.
+
+    With a float16/int8 `embedding_dtype` or a truncated `embedding_dim`, a
+    quantized copy of the rows is kept alongside and exact search scores that
+    copy first; only the top `k * rescore_factor` candidates are rescored
+    against the full-precision rows. Those stay on disk until they are
+    touched: snapshot rows are memory-mapped, and rows added or vacuumed
+    since live in an unnamed scratch file next to the store.
+
+    With `shared`, several worker processes serve the same storage files.
+    Writes take a cross-process lock and first catch up with the log, and
+    searches pick up other processes' writes (or a newly compacted snapshot)
+    before running.
+
+    The text embedded for each tool comes from `serializer` (see
+    serialization.ToolSerializer). With `multi_vector`, tools over its token
+    budget get extra chunk embeddings next to their row; semantic search
+    scores such a tool by the best of its row and chunks.
+    """
+
+    def __init__(
+        self,
+        storage_path: str = "tool_embeddings.json",
+        encode_batch_size: int = DEFAULT_ENCODE_BATCH_SIZE,
+        compact_threshold_mb: int = DEFAULT_COMPACT_THRESHOLD_MB,
+        index: str = "exact",
+        query_cache_size: int = DEFAULT_QUERY_CACHE_SIZE,
+        result_cache_size: int = 0,
+        cache_ttl: Optional[float] = DEFAULT_CACHE_TTL,
+        embedding_cache_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        warm_up: bool = False,
+        backend: str = "torch",
+        reembed: bool = False,
+        shared: bool = False,
+        embedding_dtype: str = "float32",
+        embedding_dim: int = 0,
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+        filter_fields: Sequence[str] = DEFAULT_FILTER_FIELDS,
+        reload_interval: float = 0,
+        serialization_template: Union[str, Sequence[str]] = "default",
+        max_tool_tokens: int = 0,
+        multi_vector: bool = False,
+    ):
+        self.tools: List[Optional[Dict[str, Any]]] = []
+        # Read-only snapshot rows, then a private buffer with spare capacity for the rest
+        self._base: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._live: np.ndarray = np.zeros(0, dtype=bool)
+        self._tombstones = 0
+        # Quantized rows (codes plus int8 scales) laid out like the matrix, when enabled
+        self.quantizer = Quantizer(embedding_dtype, embedding_dim)
+        self.rescore_factor = rescore_factor
+        self._qbase: Optional[Tuple[np.ndarray, Optional[np.ndarray]]] = None
+        self._qmatrix: Optional[Tuple[np.ndarray, Optional[np.ndarray]]] = None
+        self.serializer = ToolSerializer(serialization_template, max_tool_tokens, multi_vector)
+        # Multi-vector chunks: snapshot (vectors, rows), then private buffers with spare capacity
+        self._chunk_base: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._chunk_matrix: Optional[np.ndarray] = None
+        self._chunk_row_buffer: Optional[np.ndarray] = None
+        self._chunks_added = 0
+        # Bumped on every mutation; search results are only cached per version
+        self.version = 0
+        self.query_cache = LRUCache(query_cache_size, cache_ttl)
+        self.result_cache = LRUCache(result_cache_size, cache_ttl)
+        self._next_id = 0
+        self._id_to_row: Dict[int, int] = {}
+        # id -> every row it has had since the last vacuum or reload, in order (for snapshots)
+        self._id_rows: Dict[int, List[int]] = {}
+        self._name_to_ids: Dict[str, List[int]] = {}
+        # field -> value -> ids of the tools with that value (any element, for list fields)
+        self.filter_fields = tuple(filter_fields)
+        self._field_index: Dict[str, Dict[str, List[int]]] = {field: {} for field in self.filter_fields}
+        self._lexical: Optional[BM25Index] = None
+        self.index_kind = index
+        self.index = create_index(index)
+        self._snapshot = StoreSnapshot(0, [], 0, [], None, None, self._field_index, None, self._id_rows, self.index)
         self.storage_path = Path(storage_path)
+        self.shared = shared
+        self.storage = EmbeddingStorage(storage_path, shared)
+        self.encode_batch_size = encode_batch_size
+        self.compact_threshold_mb = compact_threshold_mb
+        # Serializes mutations and log appends; compaction only holds it to take a snapshot.
+        # Searches never take it: they read the published snapshot
+        self._lock = threading.RLock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        # Set by close(); stops the watcher
+        self._closed = threading.Event()
         self.model_name = 'all-MiniLM-L6-v2'
-        self.model = SentenceTransformer(self.model_name)
+        self.backend = backend
+        # Backend that produced the stored embeddings (None until a snapshot says so)
+        self.stored_backend: Optional[str] = None
+        # Serialization settings of the stored embeddings (None until a snapshot says so)
+        self.stored_serialization: Optional[str] = None
+        # Set when the stored embeddings turned out to be incompatible with the active backend or serialization
+        self.needs_reembed = False
+        self.reembed_on_mismatch = reembed
+        self._compatibility_checked = False
+        self._reembed_thread: Optional[threading.Thread] = None
+        # Shared with every other store in the process; loaded on first encode (or by warm_up),
+        # as importing torch alone takes seconds
+        self._model = None
+        self.model_load_seconds: Optional[float] = None
+        self._warm_up_thread: Optional[threading.Thread] = None
+        # Survives deletes, clears and restarts, so re-pushing a catalog skips the model entirely
+        self.embedding_cache = EmbeddingCache(
+            self.storage.embedding_cache_path(encoder_id(self.model_name, backend)), embedding_cache_size
+        )
+        start = time.perf_counter()
         self.load_from_disk()
+        self.load_seconds = time.perf_counter() - start
+        self._check_serialization()
+        if warm_up:
+            self.start_warm_up()
+        if reload_interval > 0:
+            self.start_watching(reload_interval)
     
-    def add_tools(self, tools: List[Dict[str, Any]]):
-        """Add tools and their embeddings to storage"""
-        for tool in tools:
-            # Serialize with name and description first
-            serialized = self._serialize_tool(tool)
-            embedding = self.model.encode(serialized)
-            
-            self.tools.append({
-                "original": tool,
-                "embedding": embedding.tolist()
-            })
+    @property
+    def model(self):
+        """The embedding model, loaded on first use by any store"""
+        if self._model is None:
+            self._model, self.model_load_seconds = get_encoder(self.model_name, self.backend)
+            self._check_compatibility()
+        return self._model
+    
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+    
+    @property
+    def warming_up(self) -> bool:
+        return self._warm_up_thread is not None and self._warm_up_thread.is_alive()
+    
+    def start_warm_up(self) -> threading.Thread:
+        """Load the model and run one encode on a background thread so the first request does not pay for it"""
+        def run():
+            try:
+                self.model.encode(["warm up"], convert_to_numpy=True)
+            except Exception as e:
+                logger.error(f"Model warm-up failed: {e}")
         
-        # Update embeddings matrix
-        self._update_embeddings_matrix()
+        self._warm_up_thread = threading.Thread(target=run, name="tools-store-warm-up", daemon=True)
+        self._warm_up_thread.start()
+        return self._warm_up_thread
+    
+    def _check_compatibility(self):
+        """
+        Once per process: if the stored embeddings come from another backend,
+        re-encode a sample of stored tools and compare. Close enough and they
+        are kept; otherwise the store is flagged for re-embedding (or
+        re-embedded in the background when `reembed` is set).
+        """
+        if self._compatibility_checked:
+            return
+        self._compatibility_checked = True
+        if self.stored_backend in (None, self.backend):
+            return
+        with self._lock:
+            rows = np.flatnonzero(self._live[:len(self.tools)])
+            if len(rows) > COMPATIBILITY_SAMPLE_SIZE:
+                rows = np.sort(np.random.default_rng(0).choice(rows, COMPATIBILITY_SAMPLE_SIZE, replace=False))
+            texts = [self._serialize_tool(self.tools[row]["original"]) for row in rows.tolist()]
+            stored = self._row_vectors(rows)
+        if not texts:
+            self.stored_backend = self.backend
+            return
+        fresh = normalize_rows(self._model.encode(texts, batch_size=self.encode_batch_size, convert_to_numpy=True))
+        similarity = float(np.mean(np.sum(fresh * stored, axis=1)))
+        if similarity >= COMPATIBLE_MIN_SIMILARITY:
+            logger.info(
+                f"Stored '{self.stored_backend}' embeddings are compatible with the '{self.backend}' backend "
+                f"(mean cosine {similarity:.4f} over {len(texts)} tools)"
+            )
+            self.stored_backend = self.backend
+            return
+        self.needs_reembed = True
+        logger.warning(
+            f"Stored '{self.stored_backend}' embeddings differ from the '{self.backend}' backend "
+            f"(mean cosine {similarity:.4f} over {len(texts)} tools); search quality will suffer until the "
+            f"store is re-embedded{'' if self.reembed_on_mismatch else ' (start with --reembed)'}"
+        )
+        if self.reembed_on_mismatch:
+            self._start_reembed()
+    
+    def _check_serialization(self):
+        """Flag (or, with `reembed`, re-embed) a store whose tools were serialized with other settings"""
+        if self.stored_serialization in (None, self.serializer.signature) or not self.count:
+            return
+        self.needs_reembed = True
+        logger.warning(
+            f"Stored embeddings were serialized with '{self.stored_serialization}' but the active settings are "
+            f"'{self.serializer.signature}'; search quality will suffer until the store is re-embedded"
+            f"{'' if self.reembed_on_mismatch else ' (start with --reembed)'}"
+        )
+        if self.reembed_on_mismatch:
+            self._start_reembed()
+    
+    def _start_reembed(self):
+        if self._reembed_thread is not None and self._reembed_thread.is_alive():
+            return
+        self._reembed_thread = threading.Thread(target=self.reembed, name="tools-store-reembed", daemon=True)
+        self._reembed_thread.start()
+    
+    def reembed(self):
+        """Re-encode every stored tool with the active backend and serialization, in batches, and write a fresh snapshot"""
+        start = time.perf_counter()
+        with self._lock:
+            ids = [self.tools[row]["id"] for row in np.flatnonzero(self._live[:len(self.tools)]).tolist()]
+        done = 0
+        for offset in range(0, len(ids), REEMBED_BATCH_SIZE):
+            with self._lock:
+                batch = [self.tools[self._id_to_row[tool_id]] for tool_id in ids[offset:offset + REEMBED_BATCH_SIZE]
+                         if tool_id in self._id_to_row]
+            if not batch:
+                continue
+            tools = [tool_data["original"] for tool_data in batch]
+            serialized = [self._serialize_tool(tool) for tool in tools]
+            hashes = [content_hash(text) for text in serialized]
+            new_embeddings, chunks, _ = self._embed(tools, serialized, hashes, self.encode_batch_size)
+            with self._write_lock():
+                # Skip tools deleted or replaced by an upload while this batch was encoding
+                keep = [
+                    i for i, tool_data in enumerate(batch)
+                    if self._id_to_row.get(tool_data["id"]) is not None
+                    and self.tools[self._id_to_row[tool_data["id"]]] is tool_data
+                ]
+                if keep:
+                    batch_ids = [batch[i]["id"] for i in keep]
+                    kept_chunks = self._select_chunks(chunks, keep)
+                    self.storage.append_add([tools[i] for i in keep], new_embeddings[keep], batch_ids,
+                                            [hashes[i] for i in keep], kept_chunks)
+                    self._apply_add([tools[i] for i in keep], new_embeddings[keep], batch_ids,
+                                    [hashes[i] for i in keep], kept_chunks)
+            done += len(batch)
+            logger.info(f"Re-embedded {done}/{len(ids)} tools")
+        self.stored_backend = self.backend
+        self.stored_serialization = self.serializer.signature
+        self.needs_reembed = False
         self.save_to_disk()
+        logger.info(f"Re-embedded {done} tools with the '{self.backend}' backend in {time.perf_counter() - start:.2f}s")
     
-    def _serialize_tool(self, tool: Dict[str, Any]) -> str:
-        """Serialize tool with name and description first"""
-        parts = []
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """Embeddings of all rows, tombstoned ones included (a copy once rows were added after loading)"""
+        segments = self._segments()
+        if not segments:
+            return None
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+    
+    @property
+    def _base_rows(self) -> int:
+        return 0 if self._base is None else len(self._base)
+    
+    def _segments(self) -> List[np.ndarray]:
+        """The matrix as [snapshot rows, rows added since], without copying"""
+        base_rows = self._base_rows
+        segments = [self._base] if base_rows else []
+        if len(self.tools) > base_rows:
+            segments.append(self._matrix[:len(self.tools) - base_rows])
+        return segments
+    
+    def _quantized_segments(self) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """The quantized rows as (codes, scales) segments matching `_segments()`"""
+        base_rows = self._base_rows
+        segments = [self._qbase] if base_rows else []
+        if len(self.tools) > base_rows:
+            used = len(self.tools) - base_rows
+            codes, scales = self._qmatrix
+            segments.append((codes[:used], None if scales is None else scales[:used]))
+        return segments
+    
+    def _chunk_vectors(self) -> Optional[ChunkVectors]:
+        """The chunk embeddings as [snapshot chunks, chunks added since], without copying; None without any"""
+        vectors, rows = [], []
+        if self._chunk_base is not None:
+            vectors.append(self._chunk_base[0])
+            rows.append(self._chunk_base[1])
+        if self._chunks_added:
+            vectors.append(self._chunk_matrix[:self._chunks_added])
+            rows.append(self._chunk_row_buffer[:self._chunks_added])
+        return ChunkVectors(vectors, rows) if vectors else None
+    
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Embeddings of the given rows, gathered from both segments"""
+        return self._gather_rows(self._segments(), rows)
+    
+    def _new_rows(self, rows: int, dim: int) -> np.ndarray:
+        """
+        Uninitialized full-precision rows for the private buffer, a vacuum or a
+        compaction. With a quantized copy, exact search only reads these rows to
+        rescore, so they live in a file the kernel can page out (like the
+        snapshot rows) instead of in process memory.
+        """
+        if self.quantizer.enabled:
+            return self.storage.scratch_rows(rows, dim)
+        return np.empty((rows, dim), dtype=np.float32)
+    
+    def _dense_rows(self, segments: List[np.ndarray], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """The given rows (all by default) of a segment list as one new array from _new_rows, copied block by block"""
+        if rows is None:
+            rows = np.arange(sum(len(segment) for segment in segments))
+        dense = self._new_rows(len(rows), segments[0].shape[1])
+        for start in range(0, len(rows), BLOCK_ROWS):
+            dense[start:start + BLOCK_ROWS] = self._gather_rows(segments, rows[start:start + BLOCK_ROWS])
+        return dense
+    
+    @staticmethod
+    def _gather_rows(segments: List[np.ndarray], rows: np.ndarray) -> np.ndarray:
+        """Full-precision rows of a (possibly captured) segment list"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(segments) == 1:
+            return np.asarray(segments[0][rows], dtype=np.float32)
+        vectors = np.empty((len(rows), segments[0].shape[1]), dtype=np.float32)
+        offset = 0
+        for segment in segments:
+            in_segment = (rows >= offset) & (rows < offset + len(segment))
+            if in_segment.any():
+                vectors[in_segment] = segment[rows[in_segment] - offset]
+            offset += len(segment)
+        return vectors
+    
+    @property
+    def count(self) -> int:
+        """Number of live tools as of the latest published snapshot"""
+        return self._snapshot.count
+    
+    @property
+    def _live_count(self) -> int:
+        """Number of live tools in the state being written (call with the lock held)"""
+        return len(self.tools) - self._tombstones
+    
+    def _publish(self):
+        """Make the current state visible to searches (call with the lock held)"""
+        rows = len(self.tools)
+        self._snapshot = StoreSnapshot(
+            self.version,
+            self.tools,
+            rows,
+            self._segments(),
+            self._quantized_segments() if self.quantizer.enabled else None,
+            ~self._live[:rows] if self._tombstones else None,
+            self._field_index,
+            self._lexical,
+            self._id_rows,
+            self.index,
+            self._chunk_vectors(),
+        )
+    
+    def add_tools(
+        self,
+        tools: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        upsert: bool = False,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Add tools and their embeddings to storage.
+        All tools are serialized up front and encoded in batches, then appended
+        to the embeddings matrix and persisted once.
+        With `upsert`, a tool whose name is already stored replaces that tool in
+        place (the last one wins within a batch), and tools that are unchanged
+        are skipped without being re-encoded. Without it every tool is added,
+        as uploads always were. Names must be strings.
+        `progress` is called with the number of received tools processed so
+        far while encoding; nothing becomes visible to searches until all of
+        them are committed together.
+        """
+        if not tools:
+            return {"added": 0, "updated": 0, "unchanged": 0, "seconds": 0.0, "tools_per_sec": 0.0}
+        for tool in tools:
+            # Names key the name index and upserts, so they must be hashable and comparable
+            if not isinstance(tool.get("name", ""), str):
+                raise ValueError(f"Tool name must be a string, got {type(tool['name']).__name__}")
+        
+        start = time.perf_counter()
+        batch_size = batch_size or self.encode_batch_size
+        received = len(tools)
+        if upsert:
+            latest = {tool["name"]: i for i, tool in enumerate(tools) if "name" in tool}
+            tools = [tool for i, tool in enumerate(tools) if "name" not in tool or latest[tool["name"]] == i]
         
-        # Prioritize name and description
-        if "name" in tool:
-            parts.append(f"Name: {tool['name']}")
-        if "description" in tool:
-            parts.append(f"Description: {tool['description']}")
+        # Serialize with name and description first
+        serialized = [self._serialize_tool(tool) for tool in tools]
+        hashes = [content_hash(text) for text in serialized]
+        if upsert:
+            with self._lock:
+                changed = [i for i, tool in enumerate(tools) if not self._unchanged(tool, hashes[i])]
+        else:
+            changed = list(range(len(tools)))
+        unchanged = len(tools) - len(changed)
+        tools = [tools[i] for i in changed]
+        serialized = [serialized[i] for i in changed]
+        hashes = [hashes[i] for i in changed]
         
-        # Add remaining fields
-        remaining = {k: v for k, v in tool.items() 
-                    if k not in ["name", "description"]}
-        if remaining:
-            parts.append(json.dumps(remaining))
+        updated = 0
+        cache_hits = 0
+        skipped = received - len(tools)
+        if progress is not None:
+            progress(skipped)
+        if tools:
+            report = (lambda encoded: progress(skipped + encoded)) if progress is not None else None
+            new_embeddings, chunks, cache_hits = self._embed(tools, serialized, hashes, batch_size, report)
+            
+            with self._write_lock():
+                # Resolve ids only now so concurrent upserts of one name cannot both insert it
+                ids = []
+                for tool in tools:
+                    existing = self._find_by_name(tool) if upsert else None
+                    if existing is not None:
+                        ids.append(existing["id"])
+                        updated += 1
+                    else:
+                        ids.append(self._next_id)
+                        self._next_id += 1
+                self.storage.append_add(tools, new_embeddings, ids, hashes, chunks)
+                self._apply_add(tools, new_embeddings, ids, hashes, chunks)
+            self._maybe_compact()
+        added = len(tools) - updated
         
-        return " | ".join(parts)
+        elapsed = time.perf_counter() - start
+        tools_per_sec = received / elapsed if elapsed > 0 else float(received)
+        logger.info(
+            f"Ingested {received} tools in {elapsed:.2f}s ({added} added, {updated} updated, "
+            f"{unchanged} unchanged; {tools_per_sec:.1f} tools/sec, batch_size={batch_size})"
+        )
+        if tools:
+            texts = len(tools) + (sum(chunks[1]) if chunks is not None else 0)
+            logger.info(
+                f"Embedding cache: {cache_hits}/{texts} hits "
+                f"({cache_hits / texts:.1%} hit rate) for this upload"
+            )
+        return {
+            "added": added,
+            "updated": updated,
+            "unchanged": unchanged,
+            "seconds": elapsed,
+            "tools_per_sec": tools_per_sec,
+            "cache_hits": cache_hits,
+        }
+    
+    def _embed(
+        self,
+        tools: List[Dict[str, Any]],
+        serialized: List[str],
+        hashes: List[str],
+        batch_size: int,
+        progress: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Embeddings of serialized tools plus, in multi-vector mode, of their
+        chunks, encoded together. Returns (embeddings, chunks, cache_hits) where
+        chunks is (chunk embeddings in tool order, chunks per tool) or None.
+        """
+        if not self.serializer.multi_vector:
+            embeddings, hits = self._encode_tools(serialized, hashes, batch_size, progress)
+            return embeddings, None, hits
+        chunk_texts = [self.serializer.chunks(tool) for tool in tools]
+        texts = serialized + [text for texts in chunk_texts for text in texts]
+        report = None
+        if progress is not None:
+            # Reported in tools, not texts
+            report = lambda encoded: progress(len(tools) * encoded // len(texts))
+        embeddings, hits = self._encode_tools(
+            texts, hashes + [content_hash(text) for text in texts[len(tools):]], batch_size, report
+        )
+        chunks = (embeddings[len(tools):], [len(texts) for texts in chunk_texts])
+        return embeddings[:len(tools)], chunks, hits
+    
+    @staticmethod
+    def _select_chunks(chunks: Optional[Tuple[np.ndarray, List[int]]], keep: List[int]):
+        """The chunks of the tools at positions `keep`, in the (vectors, counts) form of _embed"""
+        if chunks is None:
+            return None
+        vectors, counts = chunks
+        offsets = np.cumsum([0] + list(counts))
+        rows = [np.arange(offsets[i], offsets[i + 1]) for i in keep]
+        return vectors[np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)], [counts[i] for i in keep]
+    
+    def _encode_tools(
+        self,
+        serialized: List[str],
+        hashes: List[str],
+        batch_size: int,
+        progress: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Normalized embeddings for serialized tools; those whose content hash is
+        in the embedding cache are not encoded again. Returns (embeddings, cache_hits).
+        """
+        cached = self.embedding_cache.get_many(hashes)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        hits = len(serialized) - len(missing)
+        if progress is not None:
+            progress(hits)
+        if missing:
+            # Identical tools within the batch are encoded once
+            unique = list(dict.fromkeys(hashes[i] for i in missing))
+            text_by_hash = {hashes[i]: serialized[i] for i in missing}
+            texts = [text_by_hash[h] for h in unique]
+            step = PROGRESS_STEP if progress is not None else len(texts)
+            blocks = []
+            for start in range(0, len(texts), step):
+                with metrics.stage("encode_tools"):
+                    blocks.append(self.model.encode(texts[start:start + step], batch_size=batch_size, convert_to_numpy=True))
+                if progress is not None:
+                    # Duplicates share their encoding, so report progress proportionally
+                    done = min(start + step, len(texts))
+                    progress(hits + len(missing) * done // len(texts))
+            encoded = normalize_rows(np.vstack(blocks) if len(blocks) > 1 else blocks[0]).reshape(len(unique), -1)
+            self.embedding_cache.put_many(unique, encoded)
+            by_hash = dict(zip(unique, encoded))
+            for i in missing:
+                cached[i] = by_hash[hashes[i]]
+        return np.vstack(cached), hits
+    
+    def _find_by_name(self, tool: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The most recently added stored tool with the same name as `tool`, if any"""
+        if "name" not in tool:
+            return None
+        ids = self._name_to_ids.get(tool["name"])
+        if not ids:
+            return None
+        return self.tools[self._id_to_row[ids[-1]]]
+    
+    def _unchanged(self, tool: Dict[str, Any], tool_hash: str) -> bool:
+        """
+        Whether `tool` is stored exactly as it is. The hash only covers the
+        text that is embedded, which may leave fields out or cut them short.
+        """
+        stored = self._find_by_name(tool)
+        return self._stored_hash(stored) == tool_hash and stored["original"] == tool
+    
+    def _stored_hash(self, tool_data: Optional[Dict[str, Any]]) -> Optional[str]:
+        if tool_data is None:
+            return None
+        if tool_data.get("hash") is None:
+            # Snapshots written before content hashes were stored
+            tool_data["hash"] = content_hash(self._serialize_tool(tool_data["original"]))
+        return tool_data["hash"]
+    
+    def _apply_add(
+        self,
+        tools: List[Dict[str, Any]],
+        new_embeddings: np.ndarray,
+        ids: Optional[List[int]] = None,
+        hashes: Optional[List[str]] = None,
+        chunks: Optional[Tuple[np.ndarray, List[int]]] = None,
+    ):
+        """
+        Add already encoded tools (and their multi-vector chunks) to the in-memory store.
+        An id that is already stored has its old row tombstoned and the new
+        version appended, so rows a published snapshot can see never change;
+        the old row's chunks are masked out along with it.
+        """
+        if ids is None:
+            ids = list(range(self._next_id, self._next_id + len(tools)))
+        if hashes is None:
+            hashes = [None] * len(tools)
+        self._next_id = max([self._next_id] + [tool_id + 1 for tool_id in ids])
+        
+        entries = [
+            {"id": tool_id, "original": tool, "hash": tool_hash}
+            for tool_id, tool, tool_hash in zip(ids, tools, hashes)
+        ]
+        # The last of several entries with one id wins
+        latest = {tool_id: i for i, tool_id in enumerate(ids)}
+        appended = [i for i, tool_id in enumerate(ids) if latest[tool_id] == i]
+        for i in appended:
+            row = self._id_to_row.get(ids[i])
+            if row is not None:
+                self._tombstone(row)
+        
+        base_rows = self._base_rows
+        first_row = len(self.tools)
+        # Append into the spare capacity of the row buffer instead of rebuilding the matrix
+        self._reserve(first_row + len(appended), new_embeddings.shape[1])
+        self._write_rows(slice(first_row - base_rows, first_row - base_rows + len(appended)), new_embeddings[appended])
+        self._live[first_row:first_row + len(appended)] = True
+        for offset, i in enumerate(appended):
+            self._id_to_row[ids[i]] = first_row + offset
+            self._id_rows.setdefault(ids[i], []).append(first_row + offset)
+            self._index_tool(entries[i], first_row + offset)
+        if chunks is not None and len(chunks[0]):
+            vectors, counts = self._select_chunks(chunks, appended)
+            self._append_chunks(vectors, np.repeat(np.arange(first_row, first_row + len(appended)), counts))
+        self.tools.extend(entries[i] for i in appended)
+        if self.index is not None:
+            self.index.add(np.asarray(ids, dtype=np.int64), new_embeddings)
+        if self._tombstones:
+            self._maybe_vacuum()
+        self._bump_version()
+    
+    def _write_rows(self, positions, embeddings: np.ndarray):
+        """Store rows in the private buffer (and its quantized copy) at `positions`"""
+        self._matrix[positions] = embeddings
+        if self._qmatrix is not None:
+            codes, scales = self.quantizer.encode(embeddings)
+            self._qmatrix[0][positions] = codes
+            if scales is not None:
+                self._qmatrix[1][positions] = scales
     
-    def _update_embeddings_matrix(self):
-        """Update the embeddings numpy array"""
-        if self.tools:
-            self.embeddings = np.array([s["embedding"] for s in self.tools])
+    def _reserve(self, rows: int, dim: int):
+        """
+        Make room for `rows` rows in total. Only the private buffer after the
+        snapshot rows grows, geometrically and into a new array, so searches
+        that captured the old one keep a consistent view.
+        """
+        base_rows = self._base_rows
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if rows - base_rows <= capacity:
+            return
+        capacity = max(rows - base_rows, capacity + capacity // 2, 1024)
+        used = len(self.tools) - base_rows
+        matrix = self._new_rows(capacity, dim)
+        if used:
+            matrix[:used] = self._matrix[:used]
+        live = np.zeros(base_rows + capacity, dtype=bool)
+        live[:len(self.tools)] = self._live[:len(self.tools)]
+        if self.quantizer.enabled:
+            codes, scales = self.quantizer.allocate(capacity, dim)
+            if used:
+                codes[:used] = self._qmatrix[0][:used]
+                if scales is not None:
+                    scales[:used] = self._qmatrix[1][:used]
+            self._qmatrix = (codes, scales)
+        self._matrix, self._live = matrix, live
     
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar tools using cosine similarity"""
-        if not self.tools:
-            return []
+    def _append_chunks(self, vectors: np.ndarray, rows: np.ndarray):
+        """Append chunk embeddings, growing the buffers into new arrays like _reserve"""
+        if not len(vectors):
+            return
+        used = self._chunks_added
+        capacity = 0 if self._chunk_matrix is None else len(self._chunk_matrix)
+        if used + len(vectors) > capacity:
+            capacity = max(used + len(vectors), capacity + capacity // 2, 1024)
+            matrix = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            row_buffer = np.empty(capacity, dtype=np.int64)
+            if used:
+                matrix[:used] = self._chunk_matrix[:used]
+                row_buffer[:used] = self._chunk_row_buffer[:used]
+            self._chunk_matrix, self._chunk_row_buffer = matrix, row_buffer
+        self._chunk_matrix[used:used + len(vectors)] = vectors
+        self._chunk_row_buffer[used:used + len(vectors)] = rows
+        self._chunks_added = used + len(vectors)
+    
+    def _tombstone(self, row: int):
+        # The entry stays in the list for snapshots that still see the row
+        tool_data = self.tools[row]
+        self._unindex_tool(tool_data, row)
+        del self._id_to_row[tool_data["id"]]
+        self._live[row] = False
+        self._tombstones += 1
+    
+    def _set_rows(
+        self,
+        tools: List[Dict[str, Any]],
+        embeddings: Optional[np.ndarray],
+        quantized: Optional[Tuple[np.ndarray, Optional[np.ndarray]]] = None,
+        chunks: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        """
+        Replace the whole store with dense, read-only rows (no tombstones) and
+        rebuild the lookups. The rows are quantized unless `quantized` already
+        holds them (e.g. mapped from the snapshot). `chunks` holds the
+        multi-vector chunks of these rows as (vectors, rows).
+        """
+        self.tools = tools
+        self._base = embeddings if len(tools) else None
+        self._qbase = None
+        if self.quantizer.enabled and len(tools):
+            self._qbase = quantized if quantized is not None else self.quantizer.encode(embeddings)
+        self._matrix = None
+        self._qmatrix = None
+        self._chunk_base = chunks if chunks is not None and len(chunks[0]) and len(tools) else None
+        self._chunk_matrix = None
+        self._chunk_row_buffer = None
+        self._chunks_added = 0
+        self._live = np.ones(len(tools), dtype=bool)
+        self._tombstones = 0
+        self._id_to_row = {tool_data["id"]: row for row, tool_data in enumerate(tools)}
+        self._id_rows = {tool_data["id"]: [row] for row, tool_data in enumerate(tools)}
+        self._name_to_ids = {}
+        self._field_index = {field: {} for field in self.filter_fields}
+        # Rebuilt on the next lexical search
+        self._lexical = None
+        for row, tool_data in enumerate(tools):
+            self._index_tool(tool_data, row)
+    
+    def _index_tool(self, tool_data: Dict[str, Any], row: int):
+        self._name_to_ids.setdefault(tool_data["original"].get("name", ""), []).append(tool_data["id"])
+        for field, values in self._field_index.items():
+            for value in self._field_values(tool_data["original"], field):
+                # Append-only (tombstoned rows are masked by readers), so snapshots can share the lists
+                values.setdefault(value, []).append(row)
+        if self._lexical is not None:
+            self._lexical.add(row, self.serializer.full_text(tool_data["original"]))
+    
+    def _unindex_tool(self, tool_data: Dict[str, Any], row: int):
+        name = tool_data["original"].get("name", "")
+        ids = self._name_to_ids.get(name)
+        if ids is not None:
+            ids.remove(tool_data["id"])
+            if not ids:
+                del self._name_to_ids[name]
+        if self._lexical is not None:
+            self._lexical.remove(row)
+    
+    @staticmethod
+    def _field_values(tool: Dict[str, Any], field: str) -> Set[str]:
+        """Indexed values of one tool field: scalars as strings, list fields element by element"""
+        value = tool.get(field)
+        if value is None or isinstance(value, dict):
+            return set()
+        if isinstance(value, list):
+            return {str(item) for item in value if item is not None and not isinstance(item, (dict, list))}
+        return {str(value)}
+    
+    def filter_key(self, filters: Optional[Dict[str, Any]]) -> Optional[Tuple]:
+        """
+        Validate search filters ({field: value or [values]}) and return a
+        canonical, hashable form; None when there is nothing to filter on.
+        Raises ValueError for fields without an index.
+        """
+        if not filters:
+            return None
+        unknown = [field for field in filters if field not in self._field_index]
+        if unknown:
+            raise ValueError(
+                f"Cannot filter on {', '.join(unknown)}. Filterable fields: {', '.join(self.filter_fields) or 'none'}"
+            )
+        return tuple(sorted(
+            (field, tuple(sorted({str(value) for value in (values if isinstance(values, list) else [values])})))
+            for field, values in filters.items()
+        ))
+    
+    @staticmethod
+    def _filter_rows(key: Tuple, snapshot: StoreSnapshot) -> np.ndarray:
+        """Sorted rows live in `snapshot` that match every field of a filter key (any of its values per field)"""
+        index = snapshot.field_index
+        # Lists are copied in one step each; rows appended meanwhile are cut off by `visible`
+        postings = [[list(index[field].get(value, ())) for value in values] for field, values in key]
+        matching: Optional[np.ndarray] = None
+        for lists in sorted(postings, key=lambda lists: sum(map(len, lists))):
+            rows = np.unique(np.fromiter((row for rows in lists for row in rows), dtype=np.int64))
+            matching = rows if matching is None else np.intersect1d(matching, rows, assume_unique=True)
+            if not len(matching):
+                break
+        return snapshot.visible(matching)
+    
+    def _lexical_index(self) -> BM25Index:
+        """The BM25 index over serialized tools, built on first use (call with the lock held)"""
+        if self._lexical is None:
+            start = time.perf_counter()
+            index = BM25Index()
+            for row in np.flatnonzero(self._live[:len(self.tools)]).tolist():
+                index.add(row, self.serializer.full_text(self.tools[row]["original"]))
+            self._lexical = index
+            logger.info(f"Built lexical index over {len(index)} tools in {time.perf_counter() - start:.2f}s")
+        return self._lexical
+    
+    def _bump_version(self):
+        self.version += 1
+        self.result_cache.clear()
+    
+    def _serialize_tool(self, tool: Dict[str, Any]) -> str:
+        """The text embedded for a tool, as configured by the serialization template and token budget"""
+        return self.serializer.serialize(tool)
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """Normalized embedding for a search query, served from the query cache when possible"""
+        return self.encode_queries([query])[0]
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalized embeddings for several queries; cache misses are encoded in one batch"""
+        embeddings: List[Optional[np.ndarray]] = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # Duplicate queries within one batch are encoded once
+            unique = list(dict.fromkeys(queries[i] for i in missing))
+            with metrics.stage("encode_query"):
+                encoded = normalize_rows(
+                    self.model.encode(unique, batch_size=self.encode_batch_size, convert_to_numpy=True)
+                ).reshape(len(unique), -1)
+            by_query = dict(zip(unique, encoded))
+            for query, embedding in by_query.items():
+                self.query_cache.put(query, embedding)
+            for i in missing:
+                embeddings[i] = by_query[queries[i]]
+        return np.vstack(embeddings)
+    
+    def search(
+        self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None, mode: str = "semantic"
+    ) -> List[Dict[str, Any]]:
+        """Search for similar tools using cosine similarity, BM25 keyword matching or both"""
+        return self.search_batch([query], k, filters, mode)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        k: Union[int, List[int]] = 5,
+        filters: Union[None, Dict[str, Any], List[Optional[Dict[str, Any]]]] = None,
+        mode: Union[str, List[str]] = "semantic",
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search several queries at once; `k`, `filters` and `mode` may be given per query.
+        
+        - semantic: uncached queries are encoded in a single batch and scored
+          with one query-matrix x embedding-matrix product
+        - lexical: BM25 over the serialized tools; the model is not used
+        - hybrid: both rankings, merged by reciprocal rank fusion
         
-        # Create query embedding
-        query_embedding = self.model.encode(query).reshape(1, -1)
+        A filtered query only scores the rows its filter selects through the
+        field indexes, at full precision and without the ANN index.
         
-        # Compute cosine similarities
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        Tools with multi-vector chunks score the best of their row and chunks.
+        The ANN index only holds the rows, so with an index the chunks are
+        scanned exactly and the tools of the best ones join its candidates.
+        """
+        ks = list(k) if isinstance(k, (list, tuple)) else [k] * len(queries)
+        filter_list = list(filters) if isinstance(filters, (list, tuple)) else [filters] * len(queries)
+        modes = list(mode) if isinstance(mode, (list, tuple)) else [mode] * len(queries)
+        for query_mode in set(modes):
+            if query_mode not in SEARCH_MODES:
+                raise ValueError(f"Unknown search mode '{query_mode}'. Choose from {', '.join(SEARCH_MODES)}.")
+        filter_keys = [self.filter_key(query_filters) for query_filters in filter_list]
+        self.refresh()
+        # Everything below reads this snapshot only, without locks, while writers carry on
+        snapshot = self._snapshot
+        if any(query_mode != "semantic" for query_mode in modes) and snapshot.lexical is None:
+            # One-off build of the BM25 index, then published like any write
+            with self._lock:
+                self._lexical_index()
+                self._publish()
+                snapshot = self._snapshot
+        if not snapshot.count or not queries:
+            return [[] for _ in queries]
         
-        # Get top k indices
-        actual_k = min(k, len(self.tools))
-        top_k_indices = np.argsort(similarities)[::-1][:actual_k]
+        version = snapshot.version
+        results: List[Optional[List[Dict[str, Any]]]] = [
+            self.result_cache.get((version, query, query_k, key, query_mode))
+            for query, query_k, key, query_mode in zip(queries, ks, filter_keys, modes)
+        ]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if not pending:
+            return [list(cached) for cached in results]
         
-        # Return original tools with similarity scores
-        results = []
-        for idx in top_k_indices:
-            results.append({
-                "tool": self.tools[idx]["original"],
-                "similarity_score": float(similarities[idx])
-            })
+        # Keyword-only queries never touch the model
+        encoded = [i for i in pending if modes[i] != "lexical"]
+        query_embeddings = self.encode_queries([queries[i] for i in encoded]) if encoded else None
+        embedding_of = {i: j for j, i in enumerate(encoded)}
+        depth = {i: ks[i] if modes[i] != "hybrid" else max(ks[i], HYBRID_CANDIDATES) for i in pending}
         
-        return results
+        semantic: Dict[int, Any] = {}
+        lexical: Dict[int, Any] = {}
+        tools, segments, quantized, dead = snapshot.tools, snapshot.segments, snapshot.quantized, snapshot.dead
+        chunks = snapshot.chunks
+        if not segments:
+            return [[] for _ in queries]
+        candidate_rows = {filter_keys[i]: self._filter_rows(filter_keys[i], snapshot) for i in pending if filter_keys[i]}
+        if snapshot.index is not None and len(snapshot.index) > 0:
+            # Approximate search; the index is shared with writers and returns stable tool ids,
+            # which are resolved to this snapshot's rows and kept only if live in it
+            for i in encoded:
+                if filter_keys[i]:
+                    continue
+                with metrics.stage("ann_search"):
+                    ids, _ = snapshot.index.search(query_embeddings[embedding_of[i]], depth[i])
+                rows = snapshot.resolve(ids.tolist())
+                keep = (rows >= 0) & (rows < snapshot.rows)
+                keep[keep] = dead is None or ~dead[rows[keep]]
+                # An index must never return a tool twice; each row is scored once if one does
+                rows = np.unique(rows[keep])
+                query_embedding = query_embeddings[embedding_of[i]]
+                if chunks is not None:
+                    rows = np.union1d(rows, chunks.best_rows(query_embedding, depth[i], snapshot.rows, dead))
+                # Scored against this snapshot's rows: the shared index may already hold a newer vector for an id
+                scores = self._gather_rows(segments, rows) @ query_embedding
+                if chunks is not None:
+                    scores = chunks.pool(scores[None], query_embedding[None], rows)[0]
+                top_k_indices = top_k(scores, depth[i])
+                semantic[i] = (rows[top_k_indices], scores[top_k_indices])
+        for i in pending:
+            if modes[i] == "semantic":
+                continue
+            allowed = set(candidate_rows[filter_keys[i]].tolist()) if filter_keys[i] else None
+            with metrics.stage("lexical_search"):
+                lexical[i] = snapshot.lexical.search(
+                    queries[i], depth[i], allowed, snapshot.rows, dead, snapshot.lexical_stats
+                )
+        
+        unfiltered = [i for i in encoded if not filter_keys[i] and i not in semantic]
+        if unfiltered:
+            # Cosine similarity against the pre-normalized matrix, then partial top-k selection per query
+            unfiltered_embeddings = query_embeddings[[embedding_of[i] for i in unfiltered]]
+            with metrics.stage("similarity"):
+                if quantized:
+                    truncated = self.quantizer.truncate(unfiltered_embeddings)
+                    score_matrix = np.hstack([self.quantizer.scores(truncated, codes, scales) for codes, scales in quantized])
+                else:
+                    score_matrix = np.hstack([unfiltered_embeddings @ segment.T for segment in segments])
+                if chunks is not None:
+                    chunks.pool(score_matrix, unfiltered_embeddings)
+                if dead is not None:
+                    score_matrix[:, dead] = -np.inf
+            with metrics.stage("rescore" if quantized and self.rescore_factor > 0 else "top_k"):
+                for row, i in enumerate(unfiltered):
+                    if quantized and self.rescore_factor > 0:
+                        semantic[i] = self._rescore(score_matrix[row], unfiltered_embeddings[row], segments, depth[i], chunks)
+                        continue
+                    top_k_indices = top_k(score_matrix[row], depth[i])
+                    semantic[i] = (top_k_indices, score_matrix[row][top_k_indices])
+        for key, rows in candidate_rows.items():
+            # Only the matching rows are gathered and scored, once for all queries sharing the filter
+            group = [i for i in encoded if filter_keys[i] == key]
+            if not group:
+                continue
+            if not len(rows):
+                semantic.update((i, ([], [])) for i in group)
+                continue
+            with metrics.stage("similarity"):
+                group_embeddings = query_embeddings[[embedding_of[i] for i in group]]
+                score_matrix = group_embeddings @ self._gather_rows(segments, rows).T
+                if chunks is not None:
+                    chunks.pool(score_matrix, group_embeddings, rows)
+            with metrics.stage("top_k"):
+                for row, i in enumerate(group):
+                    top_k_indices = top_k(score_matrix[row], depth[i])
+                    semantic[i] = (rows[top_k_indices], score_matrix[row][top_k_indices])
+        
+        # Return original tools with their scores
+        for i in pending:
+            if modes[i] == "semantic":
+                matches = [(row, {"similarity_score": float(score)}) for row, score in zip(*semantic[i])]
+            elif modes[i] == "lexical":
+                matches = [(row, {"bm25_score": float(score)}) for row, score in zip(*lexical[i])]
+            else:
+                matches = self._fuse(semantic[i], lexical[i], query_embeddings[embedding_of[i]], segments, ks[i], chunks)
+            query_results = []
+            for idx, scores in matches:
+                if dead is not None and dead[idx]:
+                    # Masked out, when fewer than k tools are live
+                    continue
+                query_results.append({"tool": tools[idx]["original"], **scores})
+            self.result_cache.put((version, queries[i], ks[i], filter_keys[i], modes[i]), query_results)
+            results[i] = query_results
+        
+        return [list(query_results) for query_results in results]
+    
+    def _fuse(
+        self,
+        semantic,
+        lexical,
+        query_embedding: np.ndarray,
+        segments: List[np.ndarray],
+        k: int,
+        chunks: Optional[ChunkVectors] = None,
+    ):
+        """Top-k of a semantic and a lexical ranking by reciprocal rank fusion, with both scores for each result"""
+        cosine = {row: float(score) for row, score in zip(np.asarray(semantic[0]).tolist(), semantic[1]) if score > -np.inf}
+        bm25 = dict(zip(lexical[0], lexical[1]))
+        fused = reciprocal_rank_fusion(list(cosine), lexical[0])
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        missing = [row for row in best if row not in cosine]
+        if missing:
+            # Keyword matches outside the semantic candidates still get their cosine similarity
+            scores = self._gather_rows(segments, missing) @ query_embedding
+            if chunks is not None:
+                scores = chunks.pool(scores[None], query_embedding[None], missing)[0]
+            cosine.update(zip(missing, scores.tolist()))
+        return [
+            (row, {"similarity_score": cosine[row], "bm25_score": float(bm25.get(row, 0.0)), "fused_score": fused[row]})
+            for row in best
+        ]
+    
+    def _rescore(
+        self,
+        approximate: np.ndarray,
+        query_embedding: np.ndarray,
+        segments: List[np.ndarray],
+        k: int,
+        chunks: Optional[ChunkVectors] = None,
+    ):
+        """Top-k by full-precision cosine among the best `k * rescore_factor` approximate candidates"""
+        candidates = top_k(approximate, k * self.rescore_factor)
+        candidates = candidates[approximate[candidates] > -np.inf]
+        scores = self._gather_rows(segments, candidates) @ query_embedding
+        if chunks is not None and len(candidates):
+            scores = chunks.pool(scores[None], query_embedding[None], candidates)[0]
+        order = top_k(scores, k)
+        return candidates[order], scores[order]
     
     def delete_tools(self, tool_names: List[str]) -> Dict[str, Any]:
         """Delete tools by their names"""
-        if not self.tools:
-            return {"deleted_count": 0, "not_found": tool_names, "message": "No tools available to delete"}
-        
-        deleted_count = 0
-        not_found = []
-        initial_count = len(self.tools)
-        
-        # Create a new list without the tools to be deleted
-        remaining_tools = []
-        for tool_data in self.tools:
-            tool_name = tool_data["original"].get("name", "")
-            if tool_name in tool_names:
-                deleted_count += 1
-            else:
-                remaining_tools.append(tool_data)
+        self.refresh()
+        if not self.count:
+            return {
+                "deleted_count": 0,
+                "not_found": tool_names,
+                "remaining_tools": 0,
+                "message": "No tools available to delete",
+            }
         
-        # Check which tool names were not found
-        found_names = set()
-        for tool_data in self.tools:
-            tool_name = tool_data["original"].get("name", "")
-            if tool_name in tool_names:
-                found_names.add(tool_name)
+        with self._write_lock():
+            deleted_count, found_names = self._apply_delete(tool_names)
+            if deleted_count:
+                self.storage.append_delete(tool_names)
+        self._maybe_compact()
         
         not_found = [name for name in tool_names if name not in found_names]
         
-        # Update the tools list
-        self.tools = remaining_tools
-        
-        # Update embeddings matrix
-        self._update_embeddings_matrix()
-        
-        # Save to disk
-        self.save_to_disk()
-        
         return {
             "deleted_count": deleted_count,
             "not_found": not_found,
-            "total_tools_remaining": len(self.tools),
+            "remaining_tools": self.count,
             "message": f"Successfully deleted {deleted_count} tools. {len(not_found)} tools not found."
         }
     
+    def _apply_delete(self, tool_names: List[str]):
+        """
+        Tombstone tools by name via the name index; returns (deleted_count, found_names).
+        Costs O(deleted) until tombstones pass the vacuum threshold.
+        """
+        found_names = set()
+        deleted_ids = []
+        for name in set(tool_names):
+            ids = list(self._name_to_ids.get(name, ()))
+            if not ids:
+                continue
+            found_names.add(name)
+            for tool_id in ids:
+                self._tombstone(self._id_to_row[tool_id])
+            deleted_ids.extend(ids)
+        
+        if not deleted_ids:
+            return 0, found_names
+        if self.index is not None:
+            self.index.remove(deleted_ids)
+        self._maybe_vacuum()
+        self._bump_version()
+        return len(deleted_ids), found_names
+    
+    def _maybe_vacuum(self):
+        if self._tombstones >= max(VACUUM_MIN_TOMBSTONES, len(self.tools) * VACUUM_TOMBSTONE_RATIO) or not self._live_count:
+            self._vacuum()
+    
+    def _vacuum(self):
+        """Drop tombstoned rows, rebuilding the list, matrix and indexes as new objects"""
+        rows = len(self.tools)
+        live_rows = np.flatnonzero(self._live[:rows])
+        tools = [self.tools[row] for row in live_rows.tolist()]
+        lexical = self._lexical
+        new_rows = np.full(rows, -1, dtype=np.int64)
+        new_rows[live_rows] = np.arange(len(live_rows))
+        chunks = self._chunk_vectors()
+        if chunks is not None:
+            keep = np.flatnonzero(self._live[chunks.rows])
+            chunks = (self._gather_rows(chunks.segments, keep), new_rows[chunks.rows[keep]])
+        self._set_rows(tools, self._dense_rows(self._segments(), live_rows) if len(tools) else None, chunks=chunks)
+        if lexical is not None:
+            # Renumber the postings instead of tokenizing every tool again
+            self._lexical = lexical.remap(new_rows)
+    
+    def clear_tools(self):
+        """Remove all tools from the store"""
+        with self._write_lock():
+            self.storage.append_clear()
+            self._apply_clear()
+        self._maybe_compact()
+    
+    def _apply_clear(self):
+        self._set_rows([], None)
+        self._next_id = 0
+        if self.index is not None:
+            self.index.reset()
+        self._bump_version()
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters of the query embedding, search result and tool embedding caches"""
+        return {
+            "query_embeddings": self.query_cache.stats(),
+            "search_results": self.result_cache.stats(),
+            "tool_embeddings": self.embedding_cache.stats(),
+        }
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """Bytes held by the full-precision rows, by the quantized copy that exact search scans and by multi-vector chunks"""
+        snapshot = self._snapshot
+        full = sum(segment.nbytes for segment in snapshot.segments)
+        # Full-precision rows held in process memory rather than mapped from a file
+        resident = sum(segment.nbytes for segment in snapshot.segments if not isinstance(segment, np.memmap))
+        quantized = 0
+        if snapshot.quantized is not None:
+            quantized = sum(
+                codes.nbytes + (0 if scales is None else scales.nbytes)
+                for codes, scales in snapshot.quantized
+            )
+        return {
+            "encoding": self.quantizer.name,
+            "full_precision_bytes": full,
+            "full_precision_resident_bytes": resident,
+            "quantized_bytes": quantized,
+            "rescore_factor": self.rescore_factor if self.quantizer.enabled else 0,
+            "chunk_vectors": snapshot.chunks.count if snapshot.chunks is not None else 0,
+            "chunk_bytes": snapshot.chunks.nbytes if snapshot.chunks is not None else 0,
+        }
+    
+    def _maybe_compact(self):
+        """Start a background compaction once the write-ahead log outgrows the threshold"""
+        with self._lock:
+            # A shared refresh on another thread may be switching the log handle
+            wal_size = self.storage.wal_size()
+        if wal_size >= self.compact_threshold_mb * 1024 * 1024:
+            self.compact(background=True)
+    
+    def compact(self, background: bool = False):
+        """
+        Fold the write-ahead log into a new snapshot.
+        The log is rotated under the lock so writers are only blocked while the
+        current state is captured; the snapshot itself is written outside it
+        and committed under the storage's own lock, which loads and log reads
+        of other threads take too.
+        The ANN index, if any, is saved while the lock is held so that it
+        matches the snapshot generation exactly. When shared, only one
+        process compacts at a time and the others skip.
+        """
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+        if not self.storage.try_lock_compaction():
+            return
+        try:
+            with self._write_lock():
+                # Later writes only append rows and tombstones, which are logged to
+                # the new generation and replayed over this snapshot
+                tools, segments, chunks = list(self.tools), self._segments(), self._chunk_vectors()
+                live = self._live[:len(tools)].copy() if self._tombstones else None
+                generation = self.storage.rotate()
+                if self.index is not None:
+                    try:
+                        self.index.save(self.storage.index_path(generation, self.index_kind))
+                    except Exception as e:
+                        logger.error(f"Saving {self.index_kind} index for generation {generation} failed: {e}")
+        except BaseException:
+            self.storage.unlock_compaction()
+            raise
+        
+        def run():
+            nonlocal tools
+            start = time.perf_counter()
+            try:
+                embeddings = None
+                if segments and (len(segments) > 1 or live is not None):
+                    embeddings = self._dense_rows(segments, None if live is None else np.flatnonzero(live))
+                elif segments:
+                    embeddings = segments[0]
+                chunk_arrays = None
+                if chunks is not None:
+                    vectors, rows = chunks.segments, chunks.rows
+                    chunk_arrays = (vectors[0] if len(vectors) == 1 else np.concatenate(vectors), rows)
+                if live is not None:
+                    tools = [tool_data for tool_data, alive in zip(tools, live) if alive]
+                    if chunk_arrays is not None:
+                        # Chunks of dropped rows go too; the others follow their row to its new position
+                        keep = live[rows]
+                        chunk_arrays = (chunk_arrays[0][keep], (np.cumsum(live) - 1)[rows[keep]])
+                quantized = None
+                if self.quantizer.enabled and embeddings is not None and len(embeddings):
+                    quantized = (self.quantizer.name, *self.quantizer.encode(embeddings))
+                with metrics.stage("snapshot"):
+                    self.storage.write_snapshot(
+                        tools, embeddings, self.model_name, generation, self.stored_backend or self.backend, quantized,
+                        chunk_arrays, self.stored_serialization or self.serializer.signature,
+                    )
+                logger.info(
+                    f"Compacted {len(tools)} tools into snapshot generation {generation} "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+            except Exception as e:
+                logger.error(f"Compaction to generation {generation} failed: {e}")
+            finally:
+                self.storage.unlock_compaction()
+        
+        if background:
+            self._compaction_thread = threading.Thread(target=run, name="tools-store-compaction", daemon=True)
+            self._compaction_thread.start()
+        else:
+            run()
+    
     def save_to_disk(self):
-        """Save tools and embeddings to disk"""
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.tools, f, indent=2)
+        """Write a full snapshot of tools and embeddings (and the ANN index) to disk"""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        self.compact(background=False)
+    
+    @contextmanager
+    def _write_lock(self):
+        """
+        Serialize a mutation with other threads and, when shared, other
+        processes; the in-memory store is brought up to date with the log first
+        so ids and upserts see every earlier write.
+        """
+        with self.storage.write_lock():
+            with self._lock:
+                try:
+                    if self.shared:
+                        self._sync()
+                        self.storage.prepare_append()
+                    yield
+                finally:
+                    self._publish()
+    
+    def refresh(self):
+        """Pick up writes (or a new snapshot) from other processes sharing the store; a no-op otherwise"""
+        if not self.shared:
+            return
+        with self._lock:
+            self._sync()
+            self._publish()
+    
+    def _sync(self):
+        if self.storage.snapshot_changed():
+            start = time.perf_counter()
+            self._load_state()
+            logger.info(
+                f"Re-mapped snapshot generation {self.storage.generation} with {self._live_count} tools "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+            return
+        try:
+            records = self.storage.read_new_records()
+        except FileNotFoundError:
+            # A log was compacted away between the checks; the new snapshot is committed by now
+            self._load_state()
+            return
+        self._replay(records)
     
     def load_from_disk(self):
-        """Load tools and embeddings from disk"""
-        if self.storage_path.exists():
-            try:
-                with open(self.storage_path, 'r') as f:
-                    self.tools = json.load(f)
-                self._update_embeddings_matrix()
-                logger.info(f"Loaded {len(self.tools)} tools from disk")
-            except (json.JSONDecodeError, Exception) as e:
-                logger.error(f"Error loading tools from disk: {e}")
-                self.tools = []
+        """
+        Load the last snapshot from disk and replay the write-ahead log on top of it.
+        An unreadable snapshot or log is raised rather than replaced with an
+        empty store, which the next compaction would commit over the files.
+        """
+        try:
+            with self.storage.write_lock():
+                with self._lock:
+                    needs_compaction = self._load_state()
+                    self._publish()
+        except Exception as e:
+            logger.error(f"Error loading tools from {self.storage_path}: {e}")
+            raise
+        logger.info(f"Loaded {self.count} tools from disk")
+        
+        if needs_compaction:
+            self.compact(background=True)
+    
+    def _load_state(self) -> bool:
+        """Replace the in-memory store with the committed snapshot plus the log; returns whether to compact"""
+        tools, embeddings, meta, records = self.storage.load()
+        stored_model = meta.get("model")
+        if stored_model and stored_model != self.model_name:
+            logger.warning(
+                f"Store was encoded with '{stored_model}' but the active model is '{self.model_name}'"
+            )
+        if meta:
+            # Snapshots written before backends were selectable came from torch
+            self.stored_backend = meta.get("backend", "torch")
+            self.stored_serialization = meta.get("serialization") or DEFAULT_SERIALIZATION
+        needs_compaction = bool(records)
+        quantized = None
+        if embeddings is not None and not meta.get("normalized"):
+            # Snapshots written before embeddings were stored normalized
+            embeddings = normalize_rows(embeddings)
+            needs_compaction = True
+        elif embeddings is not None and self.quantizer.enabled:
+            quantized = self.storage.load_quantized(meta, self.quantizer.name)
+            if quantized is None:
+                # Quantized here and persisted with the next snapshot
+                needs_compaction = True
+        chunks = self.storage.load_chunks(meta) if embeddings is not None else None
+        self._set_rows(tools, embeddings, quantized, chunks)
+        self._next_id = max(self._id_to_row, default=-1) + 1
+        if self.index is not None:
+            # Loaded into a new index; the published snapshot keeps searching the old one until the swap
+            self.index = create_index(self.index_kind)
+            if not self._load_index(meta.get("generation", 0)) and self.tools:
+                # Persist the freshly built index with the next snapshot
+                needs_compaction = True
+        self._replay(records)
+        self._bump_version()
+        if records:
+            logger.info(f"Replayed {len(records)} log records")
+        return needs_compaction
+    
+    def reload(self, only_if_changed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Swap in the snapshot on disk (e.g. regenerated offline) and its log
+        without a restart. The new state is loaded while searches keep reading
+        the current snapshot, then published in one step; writes wait for it.
+        Stored embeddings are used as they are, so nothing is re-encoded.
+        With `only_if_changed`, returns None unless the metadata file changed
+        since it was last loaded. If the files cannot be loaded the error is
+        raised and the current state is kept.
+        """
+        start = time.perf_counter()
+        with self.storage.write_lock():
+            with self._lock:
+                if only_if_changed and not self.storage.snapshot_changed():
+                    return None
+                if not self.storage_path.exists():
+                    if only_if_changed:
+                        # Most likely being replaced; the new file is picked up on a later check
+                        return None
+                    # Nothing was compacted yet, so the log on disk is all loaded already
+                    logger.info(f"No snapshot at {self.storage_path} yet; nothing to reload")
+                    return {
+                        "total_tools": self.count,
+                        "previous_tools": self.count,
+                        "generation": self.storage.generation,
+                        "version": self.version,
+                        "seconds": time.perf_counter() - start,
+                    }
+                if self._compaction_thread is not None:
+                    # Compactions start under the lock, so none can commit over the new snapshot after this
+                    self._compaction_thread.join()
+                previous = self._live_count
+                had_lexical = self._lexical is not None
+                needs_compaction = self._load_state()
+                if had_lexical:
+                    # Built before the swap so the next keyword search does not wait for it
+                    self._lexical_index()
+                self._publish()
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"Reloaded {self.count} tools (previously {previous}) from snapshot generation "
+            f"{self.storage.generation} in {seconds:.2f}s; store version is now {self.version}"
+        )
+        if needs_compaction:
+            self.compact(background=True)
+        if self.model_loaded:
+            # The new snapshot may come from another backend
+            self._compatibility_checked = False
+            self._check_compatibility()
+        self._check_serialization()
+        return {
+            "total_tools": self.count,
+            "previous_tools": previous,
+            "generation": self.storage.generation,
+            "version": self.version,
+            "seconds": seconds,
+        }
+    
+    def start_watching(self, interval: float) -> threading.Thread:
+        """Poll the metadata file every `interval` seconds on a background thread and reload when it changes"""
+        def run():
+            while not self._closed.wait(interval):
+                try:
+                    self.reload(only_if_changed=True)
+                except Exception as e:
+                    # Not retried until the file changes again
+                    logger.error(f"Reloading {self.storage_path} failed, keeping the current tools: {e}")
+        
+        self._watch_thread = threading.Thread(target=run, name="tools-store-watcher", daemon=True)
+        self._watch_thread.start()
+        logger.info(f"Watching {self.storage_path} for changes every {interval}s")
+        return self._watch_thread
+    
+    def close(self):
+        """
+        Release the store: stop watching the file, let a running compaction
+        finish and close the log. Everything written is already on disk, so
+        a new ToolsStore over the same path picks up where this one left off.
+        """
+        self._closed.set()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._lock:
+            self.storage.close()
+            self.storage.close_lock_files()
+    
+    def _replay(self, records: List[Dict[str, Any]]):
+        for record in records:
+            if record["op"] == "add":
+                chunks = None
+                if "chunks" in record:
+                    chunks = (normalize_rows(record["chunks"]), record["chunk_counts"])
+                self._apply_add(
+                    record["tools"], normalize_rows(record["embeddings"]), record.get("ids"), record.get("hashes"), chunks
+                )
+            elif record["op"] == "delete":
+                self._apply_delete(record["names"])
+            elif record["op"] == "clear":
+                self._apply_clear()
+    
+    def _load_index(self, generation: int) -> bool:
+        """Load the persisted ANN index for `generation`, or build it from the snapshot embeddings"""
+        start = time.perf_counter()
+        path = self.storage.index_path(generation, self.index_kind)
+        ids = np.array([tool_data["id"] for tool_data in self.tools], dtype=np.int64)
+        try:
+            if self.index.load(path):
+                # A snapshot copied in from elsewhere can share its generation with a stale local index
+                if np.array_equal(np.sort(self.index.ids()), np.sort(ids)):
+                    logger.info(f"Loaded {self.index_kind} index with {len(self.index)} vectors")
+                    return True
+                logger.warning(f"{self.index_kind} index at {path} does not match the snapshot's tools; rebuilding it")
+        except Exception as e:
+            logger.warning(f"Could not load {self.index_kind} index from {path}: {e}")
+        
+        if len(ids):
+            self.index.build(ids, np.asarray(self.embeddings))
+        else:
+            self.index.reset()
+        logger.info(
+            f"Built {self.index_kind} index over {len(ids)} tools in {time.perf_counter() - start:.2f}s"
+        )
+        return False
+
+
+def configure_default_store(storage_path: str = "tool_embeddings.json", **options):
+    """Set the storage path and ToolsStore options used by get_store() without a path"""
+    default_store_config["storage_path"] = storage_path
+    default_store_config["options"] = options
 
 
-def get_store(storage_path: str = "tool_embeddings.json"):
+def get_store(storage_path: Optional[str] = None, **options):
+    """
+    Return the store for `storage_path`, creating it on first use.
+    Without a path the default store configured via configure_default_store() is used.
+    """
+    if storage_path is None:
+        storage_path = default_store_config["storage_path"]
+        options = {**default_store_config["options"], **options}
     if storage_path not in tools_stores:
-        tools_stores[storage_path] = ToolsStore(storage_path)
+        tools_stores[storage_path] = ToolsStore(storage_path, **options)
     return tools_stores[storage_path]